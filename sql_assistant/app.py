@@ -1,6 +1,5 @@
-from ui.gradio_app import create_gradio_interface
-from config.config import MODEL_CONFIG, FEW_SHOT_CONFIG, PERFORMANCE_CONFIG
-from utils.schema_extractor import get_database_schema
+from config.config import MODEL_CONFIG, FEW_SHOT_CONFIG, PERFORMANCE_CONFIG, STARTUP_CONFIG, METRICS_CONFIG, BATCH_CONFIG, PIPELINE_CONFIG
+import time
 import logging
 
 # Configure logging
@@ -11,34 +10,49 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-def startup_checks():
-    """Perform startup health checks"""
-    logger.info("Performing startup checks...")
+def log_configuration():
+    """Log the settings that matter most for behaviour and latency"""
+    logger.info(f"Model: {MODEL_CONFIG['model_name']}")
+    logger.info(f"Draft model: {MODEL_CONFIG.get('draft_model_name') or 'none'}")
+    logger.info(f"Few-shot enabled: {FEW_SHOT_CONFIG['enabled']}")
+    logger.info(f"Cache enabled: {FEW_SHOT_CONFIG['cache_enabled']}")
+    logger.info(f"Schema optimization: {PERFORMANCE_CONFIG['schema_optimization']}")
+    if BATCH_CONFIG['enabled'] and PIPELINE_CONFIG['inference_workers'] < BATCH_CONFIG['max_batch_size']:
+        logger.warning(f"PIPELINE_CONFIG inference_workers ({PIPELINE_CONFIG['inference_workers']}) is below "
+                       f"BATCH_CONFIG max_batch_size ({BATCH_CONFIG['max_batch_size']}); batches will never fill")
+
+def main():
+    """Start background loading, build the UI meanwhile, and serve once ready"""
+    from startup import startup_manager
+    
+    log_configuration()
+    
+    if METRICS_CONFIG['enabled'] and METRICS_CONFIG['http_enabled']:
+        from utils.metrics import start_metrics_server
+        start_metrics_server()
+    
+    # Schema extraction, model load and warmup run in the background...
+    startup_manager.start()
+    
+    # ...while the (import-heavy) UI is built here
+    start = time.monotonic()
+    from ui.gradio_app import create_gradio_interface
+    interface = create_gradio_interface()
+    startup_manager.record("ui_build", time.monotonic() - start)
+    
+    if STARTUP_CONFIG['wait_for_ready']:
+        logger.info("Waiting for schema extraction and model warmup...")
+        if not startup_manager.wait():
+            status = startup_manager.get_status()
+            logger.error(f"Startup failed: {status['error'] or 'timed out'}. Please fix the issues and try again.")
+            return
     
-    try:
-        # Test database connection
-        schema = get_database_schema()
-        logger.info("Database connection successful")
-        
-        # Log configuration
-        logger.info(f"Model: {MODEL_CONFIG['model_name']}")
-        logger.info(f"Few-shot enabled: {FEW_SHOT_CONFIG['enabled']}")
-        logger.info(f"Cache enabled: {FEW_SHOT_CONFIG['cache_enabled']}")
-        logger.info(f"Schema optimization: {PERFORMANCE_CONFIG['schema_optimization']}")
-        
-        return True
-    except Exception as e:
-        logger.error(f"Startup check failed: {str(e)}")
-        return False
+    logger.info(f"Starting Gradio interface ({startup_manager.format_timings()})")
+    interface.launch(
+        share=False,
+        server_name="0.0.0.0",
+        server_port=7860
+    )
 
 if __name__ == "__main__":
-    if startup_checks():
-        logger.info("Starting Gradio interface...")
-        interface = create_gradio_interface()
-        interface.launch(
-            share=False,
-            server_name="0.0.0.0",
-            server_port=7860
-        )
-    else:
-        logger.error("Startup checks failed. Please fix the issues and try again.")
+    main()
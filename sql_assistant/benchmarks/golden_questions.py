@@ -0,0 +1,56 @@
+# Golden questions for the employee database, with reference SQL that runs on
+# both MySQL and the SQLite stand-in
+GOLDEN_QUESTIONS = [
+    {
+        "question": "How many employees are there?",
+        "sql": "SELECT COUNT(*) FROM employees;",
+    },
+    {
+        "question": "List all department names",
+        "sql": "SELECT dept_name FROM departments;",
+    },
+    {
+        "question": "Count employees by gender",
+        "sql": "SELECT gender, COUNT(*) AS count FROM employees GROUP BY gender;",
+    },
+    {
+        "question": "Which employees were hired after 1995?",
+        "sql": "SELECT first_name, last_name, hire_date FROM employees WHERE hire_date > '1995-12-31';",
+    },
+    {
+        "question": "What are the ten highest salaries?",
+        "sql": "SELECT emp_no, salary FROM salaries ORDER BY salary DESC, emp_no LIMIT 10;",
+    },
+    {
+        "question": "How many distinct job titles are there?",
+        "sql": "SELECT COUNT(DISTINCT title) FROM titles;",
+    },
+    {
+        "question": "What is the average salary by department?",
+        "sql": "SELECT d.dept_name, AVG(s.salary) AS avg_salary FROM departments d JOIN dept_emp de ON d.dept_no = de.dept_no JOIN salaries s ON de.emp_no = s.emp_no GROUP BY d.dept_name;",
+    },
+    {
+        "question": "How many employees work in each department?",
+        "sql": "SELECT d.dept_name, COUNT(*) AS headcount FROM dept_emp de JOIN departments d ON d.dept_no = de.dept_no GROUP BY d.dept_name;",
+    },
+    {
+        "question": "Which department has the most employees?",
+        "sql": "SELECT d.dept_name, COUNT(*) AS headcount FROM dept_emp de JOIN departments d ON d.dept_no = de.dept_no GROUP BY d.dept_name ORDER BY headcount DESC, d.dept_name LIMIT 1;",
+    },
+    {
+        "question": "Who are the current department managers?",
+        "sql": "SELECT e.first_name, e.last_name, d.dept_name FROM dept_manager dm JOIN employees e ON e.emp_no = dm.emp_no JOIN departments d ON d.dept_no = dm.dept_no WHERE dm.to_date = '9999-01-01';",
+    },
+    {
+        "question": "Find employees in the Sales department",
+        "sql": "SELECT e.first_name, e.last_name FROM employees e JOIN dept_emp de ON e.emp_no = de.emp_no JOIN departments d ON de.dept_no = d.dept_no WHERE d.dept_name = 'Sales';",
+    },
+    {
+        "question": "What is the average current salary for each title?",
+        "sql": "SELECT t.title, AVG(s.salary) AS avg_salary FROM titles t JOIN salaries s ON s.emp_no = t.emp_no WHERE t.to_date = '9999-01-01' AND s.to_date = '9999-01-01' GROUP BY t.title;",
+    },
+]
+
+def get_golden_questions():
+    """Return the golden question set"""
+    return GOLDEN_QUESTIONS
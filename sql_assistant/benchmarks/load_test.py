@@ -0,0 +1,266 @@
+"""Load test for the Gradio request path against local stand-ins
+
+Run from the sql_assistant directory:
+
+    python -m benchmarks.load_test --requests 500 --concurrency 50 --rate 20
+    python -m benchmarks.load_test --mode http --concurrency 50          # serves the UI locally
+    python -m benchmarks.load_test --mode http --url http://host:7860/   # an already running app
+
+Requests arrive open-loop (Poisson at --rate per second), or back to back
+when --rate is 0, with at most --concurrency in flight; a request that
+arrives while all slots are busy waits, and that wait is reported as
+client queue delay. In process, each request runs process_query with the
+stub model and the SQLite stand-in; over HTTP it goes through Gradio's
+queue as a browser's would.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List, Tuple
+from config.config import BATCH_CONFIG, PIPELINE_CONFIG, STREAMING_CONFIG
+from benchmarks.golden_questions import get_golden_questions
+from benchmarks.run_benchmarks import stage_summary, summarize
+from benchmarks.stand_ins import EmployeesStandIn, StubGenerationBackend, StubModel, stand_in_pipeline
+from database.result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+def load_question_mix(path: str = None) -> List[Tuple[str, float]]:
+    """(question, weight) pairs from a JSON list of {"question", "weight"}, or the golden set evenly"""
+    if path is None:
+        return [(item["question"], 1.0) for item in get_golden_questions()]
+    with open(path) as f:
+        return [(item["question"], float(item.get("weight", 1.0))) for item in json.load(f)]
+
+def build_schedule(num_requests: int, rate: float, mix: List[Tuple[str, float]], unique_fraction: float = 0.0,
+                   seed: int = 0) -> List[Tuple[float, str]]:
+    """Arrival offsets (seconds) and questions for every request
+
+    A unique_fraction of questions get a distinct suffix, so they miss the
+    query cache and need a generation of their own.
+    """
+    rng = random.Random(seed)
+    questions = [question for question, _ in mix]
+    weights = [weight for _, weight in mix]
+    schedule = []
+    arrival = 0.0
+    for i in range(num_requests):
+        question = rng.choices(questions, weights)[0]
+        if rng.random() < unique_fraction:
+            question = f"{question} (variant {i})"
+        schedule.append((arrival, question))
+        if rate:
+            arrival += rng.expovariate(rate)
+    return schedule
+
+async def run_load(send: Callable[[str], Awaitable[bool]], schedule: List[Tuple[float, str]],
+                   concurrency: int) -> List[Dict]:
+    """Issue requests on schedule with at most concurrency in flight; return per-request timings"""
+    slots = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+
+    async def one(arrival: float, question: str) -> Dict:
+        delay = start + arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        arrived = time.perf_counter()
+        async with slots:
+            sent = time.perf_counter()
+            error = None
+            try:
+                ok = await send(question)
+            except Exception as e:
+                ok, error = False, str(e)
+            done = time.perf_counter()
+        return {"question": question, "arrived": arrived - start, "queue_delay": sent - arrived,
+                "latency": done - sent, "finished": done - start, "ok": ok, "error": error}
+
+    return await asyncio.gather(*(one(arrival, question) for arrival, question in schedule))
+
+def summarize_load(results: List[Dict]) -> Dict:
+    """Throughput, client queue delay and latency percentiles for one run"""
+    completed = [result for result in results if result["ok"]]
+    duration = max(result["finished"] for result in results) if results else 0.0
+    errors = [result["error"] or "request returned an error" for result in results if not result["ok"]]
+    return {
+        "requests": len(results),
+        "completed": len(completed),
+        "failed": len(errors),
+        "sample_errors": sorted(set(errors))[:5],
+        "duration_s": duration,
+        "throughput_rps": len(completed) / duration if duration else 0.0,
+        "client_queue_delay": summarize([result["queue_delay"] for result in results]) if results else None,
+        "latency": summarize([result["latency"] for result in completed]) if completed else None,
+        "response_time": summarize([result["queue_delay"] + result["latency"] for result in completed]) if completed else None,
+    }
+
+@contextmanager
+def _patched(module, **attributes):
+    """Temporarily replace module attributes"""
+    saved = {name: getattr(module, name) for name in attributes}
+    for name, value in attributes.items():
+        setattr(module, name, value)
+    try:
+        yield module
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+class _ReadyStartup:
+    """Startup state for a stand-in app, which has nothing to load"""
+
+    def is_ready(self) -> bool:
+        return True
+
+    def get_status(self) -> Dict:
+        return {"state": "ready", "ready": True, "error": None, "elapsed_seconds": 0.0, "timings": {}}
+
+    def format_timings(self) -> str:
+        return "stand-ins"
+
+@contextmanager
+def stand_in_app(db: EmployeesStandIn, backend: StubGenerationBackend, db_latency: float = 0.0):
+    """The Gradio app module wired to the stub model and the SQLite stand-in
+
+    Generation, coalescing, the pipeline executors, preview and formatting
+    are the real ones; schema extraction, the EXPLAIN cost check and query
+    execution are served by the stand-in, with results cached as usual.
+    """
+    from ui import gradio_app
+
+    # The stand-in never changes, so every table keeps one version
+    result_cache = ResultCache(lambda tables: {table: 0 for table in tables})
+
+    def execute_page(sql: str, page: int, page_size: int):
+        if db_latency:
+            time.sleep(db_latency)
+        rows = db.execute(sql)
+        return rows[page * page_size:(page + 1) * page_size], len(rows) > (page + 1) * page_size
+
+    def fetch_result_page(sql: str, page: int = 0, page_size: int = None):
+        page_size = page_size or STREAMING_CONFIG['page_size']
+        return result_cache.get_or_compute(sql, f"page:{page}:{page_size}",
+                                           lambda: execute_page(sql, page, page_size),
+                                           lambda result: len(repr(result[0])))
+
+    def guard_query(sql: str):
+        return sql, {"estimated_rows": None, "estimated_result_rows": None, "budget": None,
+                     "action": "allowed", "message": "not checked against the stand-in"}
+
+    with stand_in_pipeline(backend, backend.model.count_tokens):
+        with _patched(gradio_app, get_database_schema=lambda: db.schema, guard_query=guard_query,
+                      fetch_result_page=fetch_result_page, startup_manager=_ReadyStartup()):
+            yield gradio_app
+
+def inprocess_sender(gradio_app) -> Callable[[str], Awaitable[bool]]:
+    """Send each question straight to process_query"""
+    async def send(question: str) -> bool:
+        sql, results, _, _ = await gradio_app.process_query(question, True, False)
+        return bool(sql) and not sql.startswith("-- Error") and not results.startswith("Error")
+    return send
+
+def http_sender(url: str, concurrency: int) -> Callable[[str], Awaitable[bool]]:
+    """Send each question through the app's Gradio HTTP API"""
+    from gradio_client import Client
+
+    client = Client(url, verbose=False)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load-client")
+
+    async def send(question: str) -> bool:
+        loop = asyncio.get_running_loop()
+        sql, results, _, _ = await loop.run_in_executor(
+            executor, lambda: client.predict(question, True, False, api_name="/process_query"))
+        return bool(sql) and not sql.startswith("-- Error") and not results.startswith("Error")
+    return send
+
+def run_load_test(mode: str = "inprocess", url: str = None, num_requests: int = 200, concurrency: int = 50,
+                  rate: float = 0.0, mix_path: str = None, unique_fraction: float = 0.2, devices: int = 1,
+                  prefill_ms_per_token: float = 0.05, decode_ms_per_token: float = 20.0, db_latency_ms: float = 2.0,
+                  employees: int = 1000, seed: int = 0) -> Dict:
+    """Run one load test and return JSON-ready results"""
+    schedule = build_schedule(num_requests, rate, load_question_mix(mix_path), unique_fraction, seed)
+    meta = {
+        "mode": mode,
+        "url": url,
+        "requests": num_requests,
+        "concurrency": concurrency,
+        "offered_rate_rps": rate or None,
+        "unique_fraction": unique_fraction,
+        "seed": seed,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+    if mode == "http" and url:
+        # Only client-side numbers are available for a remote server
+        results = asyncio.run(run_load(http_sender(url, concurrency), schedule, concurrency))
+        return {"meta": meta, "summary": summarize_load(results)}
+
+    db = EmployeesStandIn(num_employees=employees, seed=seed)
+    model = StubModel(get_golden_questions(), prefill_ms_per_token / 1000, decode_ms_per_token / 1000)
+    backend = StubGenerationBackend(model, devices)
+    meta.update(devices=devices, prefill_ms_per_token=prefill_ms_per_token, decode_ms_per_token=decode_ms_per_token,
+                db_latency_ms=db_latency_ms, batching=dict(BATCH_CONFIG), pipeline=dict(PIPELINE_CONFIG))
+    try:
+        with stand_in_app(db, backend, db_latency_ms / 1000) as gradio_app:
+            if mode == "http":
+                interface = gradio_app.create_gradio_interface()
+                interface.launch(server_name="127.0.0.1", prevent_thread_lock=True, quiet=True)
+                try:
+                    meta["url"] = interface.local_url
+                    results = asyncio.run(run_load(http_sender(interface.local_url, concurrency), schedule, concurrency))
+                finally:
+                    interface.close()
+            else:
+                results = asyncio.run(run_load(inprocess_sender(gradio_app), schedule, concurrency))
+            stages = stage_summary()
+    finally:
+        db.close()
+
+    return {
+        "meta": meta,
+        "summary": summarize_load(results),
+        # Server-side waits for a pipeline executor thread, per stage
+        "server_queue_delay": {stage: stages.pop(stage) for stage in ("inference_queue", "db-io_queue") if stage in stages},
+        "stages": stages,
+        "batching": backend.get_stats(),
+    }
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the request path against local stand-ins")
+    parser.add_argument("--mode", choices=["inprocess", "http"], default="inprocess")
+    parser.add_argument("--url", help="Gradio app to load over HTTP; by default one is served locally on stand-ins")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50, help="most requests in flight at once (simulated users)")
+    parser.add_argument("--rate", type=float, default=0.0, help="mean arrivals per second; 0 sends as fast as slots free up")
+    parser.add_argument("--mix", help="JSON list of {\"question\", \"weight\"}; defaults to the golden questions")
+    parser.add_argument("--unique-fraction", type=float, default=0.2, help="share of questions made unique to miss the cache")
+    parser.add_argument("--devices", type=int, default=1, help="simulated inference devices, each batching on its own")
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.05)
+    parser.add_argument("--decode-ms-per-token", type=float, default=20.0)
+    parser.add_argument("--db-latency-ms", type=float, default=2.0, help="added to every stand-in query")
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    results = run_load_test(args.mode, args.url, args.requests, args.concurrency, args.rate, args.mix,
+                            args.unique_fraction, args.devices, args.prefill_ms_per_token, args.decode_ms_per_token,
+                            args.db_latency_ms, args.employees, args.seed)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0 if results["summary"]["failed"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
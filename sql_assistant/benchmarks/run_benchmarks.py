@@ -0,0 +1,285 @@
+"""Benchmarks for the NL->SQL pipeline against local stand-ins
+
+Run from the sql_assistant directory:
+
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --model sshleifer/tiny-gpt2 --iterations 50
+    python -m benchmarks.run_benchmarks --baseline results.json   # exit 1 on regressions
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+from config.config import PREVIEW_CONFIG
+from benchmarks.golden_questions import get_golden_questions
+from benchmarks.stand_ins import EmployeesStandIn, StubGenerationBackend, StubModel, load_local_model, stand_in_pipeline
+from utils.example_selector import select_relevant_examples
+from utils.metrics import metrics, nearest_rank, time_stage
+from utils.query_cache import QueryCache
+from utils.query_formatter import format_query_results
+from utils.query_optimizer import SchemaModel, get_schema_model, make_preview_query, optimize_schema_context, validate_sql_syntax
+from utils.statement_scanner import truncate_to_statement
+
+logger = logging.getLogger(__name__)
+
+# Bump when the output layout changes incompatibly
+RESULTS_VERSION = 1
+
+def summarize(samples: List[float]) -> Dict:
+    """Latency statistics in milliseconds for a list of durations in seconds"""
+    ordered = sorted(samples)
+    count = len(ordered)
+
+    def percentile(q):
+        return nearest_rank(ordered, q) * 1000
+
+    total = sum(ordered)
+    return {
+        "iterations": count,
+        "mean_ms": total / count * 1000,
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "min_ms": ordered[0] * 1000,
+        "max_ms": ordered[-1] * 1000,
+        "ops_per_sec": count / total if total else None,
+    }
+
+def measure(fn: Callable[[int], object], iterations: int, warmup: int = None) -> Dict:
+    """Time fn(i) for each iteration after a short warmup"""
+    for i in range(warmup if warmup is not None else max(iterations // 10, 1)):
+        fn(i)
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def micro_benchmarks(sql_generator, db: EmployeesStandIn, iterations: int) -> Dict[str, Dict]:
+    """Time each hot path on its own, cycling through the golden questions"""
+    schema = db.schema
+    golden = get_golden_questions()
+    questions = [item["question"] for item in golden]
+    sqls = [item["sql"] for item in golden]
+    n = len(golden)
+
+    cache = QueryCache(persistent_store=None)
+    for item in golden:
+        cache.set(item["question"], schema, item["sql"])
+    rows_100 = db.execute("SELECT * FROM employees LIMIT 100")
+    rows_1000 = db.execute("SELECT * FROM salaries LIMIT 1000")
+
+    benchmarks = {
+        "query_cache.get_hit": lambda i: cache.get(questions[i % n], schema),
+        "query_cache.get_normalized_hit": lambda i: cache.get(questions[i % n].upper() + "  ", schema),
+        "query_cache.get_miss": lambda i: cache.get(f"Unrelated question number {i}", schema),
+        "query_cache.set": lambda i: cache.set(f"Question {i % 64}", schema, sqls[i % n]),
+        "example_selection": lambda i: select_relevant_examples(questions[i % n]),
+        "schema.parse": lambda i: SchemaModel(schema),
+        "schema.optimize_context": lambda i: optimize_schema_context(schema, questions[i % n]),
+        "schema.ranked_tables": lambda i: get_schema_model(schema).ranked_tables(questions[i % n]),
+        "prompt.build": lambda i: sql_generator.build_prompt_parts(questions[i % n], schema),
+        "validation": lambda i: validate_sql_syntax(sqls[i % n]),
+        "statement_truncation": lambda i: truncate_to_statement(sqls[i % n][len("SELECT"):] + "\n-- Question: next"),
+        "preview_rewrite": lambda i: make_preview_query(sqls[i % n], PREVIEW_CONFIG['row_limit']),
+        "format.100_rows": lambda i: format_query_results(rows_100),
+        "format.1000_rows_paged": lambda i: format_query_results(rows_1000, page=i % 10, page_size=100),
+    }
+    return {name: measure(fn, iterations) for name, fn in benchmarks.items()}
+
+def _same_rows(left: List[Dict], right: List[Dict]) -> bool:
+    """Compare results as multisets of rows, ignoring column names and order"""
+    def key(rows):
+        return sorted(tuple(repr(value) for value in row.values()) for row in rows)
+    return key(left) == key(right)
+
+def answer_question(sql_generator, db: EmployeesStandIn, question: str) -> Dict:
+    """Run one question through generation, preview execution and formatting, as the UI does"""
+    start = time.perf_counter()
+    with time_stage("request"):
+        sql = sql_generator.generate_sql(question, db.schema)
+        error = None
+        if sql.startswith("-- Error"):
+            error = sql
+        else:
+            preview_sql, _ = make_preview_query(sql, PREVIEW_CONFIG['row_limit'])
+            try:
+                with time_stage("execute_query"):
+                    rows = db.execute(preview_sql)
+                with time_stage("format_results"):
+                    format_query_results(rows)
+            except Exception as e:
+                error = str(e)
+    return {"sql": sql, "error": error, "seconds": time.perf_counter() - start}
+
+def end_to_end(sql_generator, db: EmployeesStandIn, repeats: int) -> Dict:
+    """Cold (cache-miss) and warm (cache-hit) latency per golden question, plus accuracy"""
+    golden = get_golden_questions()
+    cold: List[float] = []
+    warm: List[float] = []
+    per_question = {item["question"]: {"cold": [], "warm": []} for item in golden}
+    answers = {}
+
+    for _ in range(repeats):
+        sql_generator.query_cache.clear()
+        for phase, samples in (("cold", cold), ("warm", warm)):
+            for item in golden:
+                result = answer_question(sql_generator, db, item["question"])
+                samples.append(result["seconds"])
+                per_question[item["question"]][phase].append(result["seconds"])
+                answers[item["question"]] = result
+
+    questions = []
+    correct = 0
+    for item in golden:
+        answer = answers[item["question"]]
+        matches = False
+        if answer["error"] is None:
+            try:
+                matches = _same_rows(db.execute(answer["sql"]), db.execute(item["sql"]))
+            except Exception as e:
+                answer["error"] = str(e)
+        correct += matches
+        questions.append({
+            "question": item["question"],
+            "sql": answer["sql"],
+            "correct": matches,
+            "error": answer["error"],
+            "cold_p50_ms": summarize(per_question[item["question"]]["cold"])["p50_ms"],
+            "warm_p50_ms": summarize(per_question[item["question"]]["warm"])["p50_ms"],
+        })
+
+    return {
+        "cold": summarize(cold),
+        "warm": summarize(warm),
+        "accuracy": correct / len(golden),
+        "questions": questions,
+    }
+
+def stage_summary() -> Dict:
+    """Per-stage percentiles recorded by the pipeline's own instrumentation, in milliseconds"""
+    snapshot = metrics.snapshot()
+    stages = {
+        stage: {"count": stats["count"], "p50_ms": stats["p50"] * 1000, "p95_ms": stats["p95"] * 1000, "p99_ms": stats["p99"] * 1000}
+        for stage, stats in snapshot["stages"].items() if stats["count"]
+    }
+    throughput = snapshot["decode_tokens_per_second"]
+    if throughput["count"]:
+        stages["decode_tokens_per_second"] = {key: throughput[key] for key in ("count", "p50", "p95", "p99")}
+    return stages
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run_benchmarks(model: str = "stub", iterations: int = 200, repeats: int = 5, employees: int = 1000,
+                   seed: int = 0, max_new_tokens: int = None) -> Dict:
+    """Run the micro-benchmarks and the end-to-end golden set, returning JSON-ready results
+
+    model is 'stub' for the deterministic stub model, or the name or path of a
+    small causal LM to run in process on the CPU.
+    """
+    db = EmployeesStandIn(num_employees=employees, seed=seed)
+    backend = None
+    count_tokens = None
+    if model == "stub":
+        stub = StubModel(get_golden_questions())
+        backend = StubGenerationBackend(stub, batching=False)
+        count_tokens = stub.count_tokens
+    else:
+        import torch
+        torch.manual_seed(seed)
+        load_local_model(model, max_new_tokens)
+
+    try:
+        with stand_in_pipeline(backend, count_tokens) as sql_generator:
+            micro = micro_benchmarks(sql_generator, db, iterations)
+            # Stage histograms should describe the end-to-end runs only
+            metrics.reset()
+            e2e = end_to_end(sql_generator, db, repeats)
+            stages = stage_summary()
+    finally:
+        db.close()
+
+    return {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "model": model,
+            "iterations": iterations,
+            "repeats": repeats,
+            "employees": employees,
+            "seed": seed,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git_revision": _git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "micro": micro,
+        "end_to_end": e2e,
+        "stages": stages,
+    }
+
+def compare_results(baseline: Dict, current: Dict, tolerance: float = 0.25, noise_floor_ms: float = 0.05) -> List[str]:
+    """Regressions of current against baseline: p50 slower by more than tolerance, or lower accuracy
+
+    Differences under noise_floor_ms are ignored, since sub-microsecond paths
+    jitter by more than any tolerance.
+    """
+    regressions = []
+    pairs = [(f"micro.{name}", stats, current["micro"].get(name)) for name, stats in baseline.get("micro", {}).items()]
+    pairs += [(f"end_to_end.{phase}", baseline["end_to_end"][phase], current["end_to_end"][phase]) for phase in ("cold", "warm")]
+    for name, before, after in pairs:
+        if after is None:
+            continue
+        if after["p50_ms"] > before["p50_ms"] * (1 + tolerance) and after["p50_ms"] - before["p50_ms"] > noise_floor_ms:
+            regressions.append(f"{name}: p50 {before['p50_ms']:.3f} ms -> {after['p50_ms']:.3f} ms")
+    if current["end_to_end"]["accuracy"] < baseline["end_to_end"]["accuracy"]:
+        regressions.append(f"end_to_end.accuracy: {baseline['end_to_end']['accuracy']:.0%} -> {current['end_to_end']['accuracy']:.0%}")
+    return regressions
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the NL->SQL pipeline against local stand-ins")
+    parser.add_argument("--model", default="stub", help="'stub', or the name/path of a small causal LM")
+    parser.add_argument("--iterations", type=int, default=200, help="timed calls per micro-benchmark")
+    parser.add_argument("--repeats", type=int, default=5, help="cold/warm passes over the golden questions")
+    parser.add_argument("--employees", type=int, default=1000, help="synthetic employees in the stand-in database")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-new-tokens", type=int, default=None, help="generation cap for --model runs")
+    parser.add_argument("--output", help="write results here instead of stdout")
+    parser.add_argument("--baseline", help="earlier results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    # Read the baseline first, so --output may overwrite it
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = run_benchmarks(args.model, args.iterations, args.repeats, args.employees, args.seed, args.max_new_tokens)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if baseline is not None:
+        regressions = compare_results(baseline, results, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+import os
+import re
+import random
+import sqlite3
+import threading
+import time
+import itertools
+import logging
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+from config.config import BATCH_CONFIG, MODEL_CONFIG
+from models.batch_scheduler import BatchScheduler
+from utils.few_shot_examples import get_examples
+
+logger = logging.getLogger(__name__)
+
+# employees.sql and the load_*.dump files live at the repository root
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIRST_NAMES = ["Georgi", "Bezalel", "Parto", "Chirstian", "Kyoichi", "Anneke", "Tzvetan", "Saniya",
+               "Sumant", "Duangkaew", "Mary", "Patricio", "Eberhardt", "Berni", "Guoxiang", "Kazuhito"]
+LAST_NAMES = ["Facello", "Simmel", "Bamford", "Koblick", "Maliniak", "Preusig", "Zielinski", "Kalloufi",
+              "Peac", "Piveteau", "Sluis", "Bridgland", "Terkki", "Genin", "Nooteboom", "Cappelletti"]
+TITLES = ["Engineer", "Senior Engineer", "Staff", "Senior Staff", "Assistant Engineer", "Technique Leader", "Manager"]
+CURRENT = "9999-01-01"
+
+def _matching_paren(text: str, start: int) -> int:
+    """Index of the parenthesis closing the one at start"""
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == "(":
+            depth += 1
+        elif text[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError("Unbalanced parentheses in CREATE TABLE")
+
+def _split_top_level(text: str) -> List[str]:
+    """Split a column list on commas that aren't inside parentheses"""
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current.append(char)
+    parts.append("".join(current).strip())
+    return [part for part in parts if part]
+
+def parse_mysql_schema(ddl: str) -> Dict[str, Dict]:
+    """Parse CREATE TABLE statements into the structure schema_extractor builds
+
+    Column types are normalised to what information_schema reports (e.g.
+    'varchar(14)', "enum('M','F')"), so the rendered schema matches production.
+    """
+    tables: Dict[str, Dict] = {}
+    for match in re.finditer(r"CREATE TABLE\s+`?(\w+)`?\s*\(", ddl, re.IGNORECASE):
+        end = _matching_paren(ddl, match.end() - 1)
+        info = {"columns": [], "primary_key": [], "foreign_keys": []}
+        for definition in _split_top_level(ddl[match.end():end]):
+            upper = definition.upper()
+            if upper.startswith("PRIMARY KEY"):
+                info["primary_key"] = re.findall(r"\w+", definition[definition.index("("):])
+            elif upper.startswith("FOREIGN KEY"):
+                column, ref_table, ref_column = re.match(
+                    r"FOREIGN KEY\s*\((\w+)\)\s*REFERENCES\s+(\w+)\s*\((\w+)\)", definition, re.IGNORECASE).groups()
+                info["foreign_keys"].append([column, ref_table, ref_column])
+            elif not upper.startswith(("UNIQUE", "KEY", "INDEX", "CONSTRAINT")):
+                name, rest = definition.split(None, 1)
+                data_type = re.split(r"\s+(?:NOT\s+NULL|NULL|DEFAULT|AUTO_INCREMENT)\b", rest, flags=re.IGNORECASE)[0]
+                data_type = re.sub(r"\s+", "", data_type)
+                data_type = re.sub(r"^(\w+)", lambda m: m.group(1).lower(), data_type)
+                info["columns"].append([name, data_type])
+        tables[match.group(1)] = info
+    return dict(sorted(tables.items()))
+
+def render_schema_text(tables: Dict[str, Dict]) -> str:
+    """Render tables as CREATE TABLE statements, as schema_extractor.render_schema does"""
+    schema = []
+    for table, info in tables.items():
+        definitions = [f"{column} {data_type}" for column, data_type in info["columns"]]
+        if info["primary_key"]:
+            definitions.append(f"PRIMARY KEY ({', '.join(info['primary_key'])})")
+        for column, ref_table, ref_column in info["foreign_keys"]:
+            definitions.append(f"FOREIGN KEY ({column}) REFERENCES {ref_table}({ref_column})")
+        schema.append(f"CREATE TABLE {table} (\n  " + ",\n  ".join(definitions) + "\n);")
+    return "\n\n".join(schema)
+
+def _sqlite_type(data_type: str) -> str:
+    return "INTEGER" if data_type.startswith(("int", "bigint", "smallint", "tinyint")) else "TEXT"
+
+def _mysql_year(value):
+    return int(value[:4]) if value else None
+
+def _mysql_month(value):
+    return int(value[5:7]) if value else None
+
+def _mysql_concat(*values):
+    return None if any(value is None for value in values) else "".join(str(value) for value in values)
+
+class EmployeesStandIn:
+    """SQLite copy of the employees database for benchmarks and load tests
+
+    The schema comes from employees.sql and the departments and managers from
+    the bundled .dump files; employees, department assignments, titles and
+    salaries are generated deterministically from the seed. Each thread gets
+    its own connection to one shared in-memory database.
+    """
+
+    _ids = itertools.count()
+
+    def __init__(self, num_employees: int = 1000, seed: int = 0, data_dir: str = None):
+        self.data_dir = data_dir or DATA_DIR
+        self.num_employees = num_employees
+        self.seed = seed
+        self._uri = f"file:employees_stand_in_{os.getpid()}_{next(self._ids)}?mode=memory&cache=shared"
+        self._local = threading.local()
+        # The in-memory database lives as long as one connection to it is open
+        self._anchor = self._connect()
+
+        with open(os.path.join(self.data_dir, "employees.sql")) as f:
+            self.tables = parse_mysql_schema(f.read())
+        self.schema = render_schema_text(self.tables)
+        self._load()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        # A few MySQL functions the model tends to use
+        connection.create_function("YEAR", 1, _mysql_year, deterministic=True)
+        connection.create_function("MONTH", 1, _mysql_month, deterministic=True)
+        connection.create_function("CONCAT", -1, _mysql_concat, deterministic=True)
+        return connection
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    def _load(self):
+        """Create the tables, load the bundled dumps and generate the rest"""
+        connection = self._anchor
+        for table, info in self.tables.items():
+            columns = [f"{column} {_sqlite_type(data_type)}" for column, data_type in info["columns"]]
+            if info["primary_key"]:
+                columns.append(f"PRIMARY KEY ({', '.join(info['primary_key'])})")
+            connection.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+
+        for dump in sorted(os.listdir(self.data_dir)):
+            if dump.startswith("load_") and dump.endswith(".dump"):
+                with open(os.path.join(self.data_dir, dump)) as f:
+                    connection.executescript(f.read())
+
+        managers = [row[0] for row in connection.execute("SELECT DISTINCT emp_no FROM dept_manager")]
+        departments = [row[0] for row in connection.execute("SELECT dept_no FROM departments ORDER BY dept_no")]
+        self._generate(connection, managers, departments)
+        connection.commit()
+        counts = {table: connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in self.tables}
+        logger.info(f"Loaded employees stand-in: {counts}")
+
+    def _generate(self, connection: sqlite3.Connection, managers: List[int], departments: List[str]):
+        """Synthetic employees with department, title and salary histories"""
+        rng = random.Random(self.seed)
+        employee_ids = list(range(10001, 10001 + self.num_employees)) + managers
+        employees, dept_emp, titles, salaries = [], [], [], []
+        for emp_no in employee_ids:
+            hire = date(1985, 1, 1) + timedelta(days=rng.randrange(15 * 365))
+            birth = hire - timedelta(days=rng.randrange(20 * 365, 45 * 365))
+            employees.append((emp_no, birth.isoformat(), rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                              rng.choice("MF"), hire.isoformat()))
+
+            left = hire + timedelta(days=rng.randrange(365, 12 * 365)) if rng.random() < 0.2 else None
+            end = left.isoformat() if left else CURRENT
+            dept_emp.append((emp_no, rng.choice(departments), hire.isoformat(), end))
+            titles.append((emp_no, rng.choice(TITLES), hire.isoformat(), end))
+
+            salary = rng.randrange(40000, 90000)
+            start = hire
+            while True:
+                next_start = start + timedelta(days=365)
+                current = next_start >= (left or date(2002, 8, 1))
+                salaries.append((emp_no, salary, start.isoformat(), end if current else next_start.isoformat()))
+                if current:
+                    break
+                salary += rng.randrange(0, 4000)
+                start = next_start
+
+        connection.executemany("INSERT INTO employees VALUES (?, ?, ?, ?, ?, ?)", employees)
+        connection.executemany("INSERT INTO dept_emp VALUES (?, ?, ?, ?)", dept_emp)
+        connection.executemany("INSERT INTO titles VALUES (?, ?, ?, ?)", titles)
+        connection.executemany("INSERT INTO salaries VALUES (?, ?, ?, ?)", salaries)
+
+    def execute(self, sql: str) -> List[Dict]:
+        """Run a query and return its rows as dicts, like the MySQL dictionary cursor"""
+        cursor = self._connection().execute(sql)
+        try:
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def close(self):
+        """Release the shared in-memory database"""
+        self._anchor.close()
+
+def _question_key(question: str) -> str:
+    return " ".join(re.findall(r"\w+", question.lower()))
+
+class StubModel:
+    """Deterministic stand-in for the SQL model
+
+    Known questions (golden and few-shot) are answered with their reference
+    SQL; anything else gets a fixed query. Optional per-token delays model
+    prefill and decode cost, so queueing behaves as it would with a GPU.
+    """
+
+    def __init__(self, answers: List[Dict] = None, prefill_seconds_per_token: float = 0.0,
+                 decode_seconds_per_token: float = 0.0, default_sql: str = "SELECT COUNT(*) FROM employees;"):
+        self.answers = {_question_key(item["question"]): item["sql"] for item in get_examples() + (answers or [])}
+        self.prefill_seconds_per_token = prefill_seconds_per_token
+        self.decode_seconds_per_token = decode_seconds_per_token
+        self.default_sql = default_sql
+
+    def count_tokens(self, text: str) -> int:
+        """Approximate token count: words and punctuation marks"""
+        return len(re.findall(r"\w+|[^\w\s]", text))
+
+    def answer(self, prompt_parts: Tuple[str, str]) -> str:
+        """Reference SQL for the prompt's question"""
+        match = re.search(r"-- Question: (.*)\n", prompt_parts[1])
+        return self.answers.get(_question_key(match.group(1)) if match else "", self.default_sql)
+
+    def generate_batch(self, batch: List[Tuple[str, str]]) -> List[str]:
+        """Text continuing each prompt's trailing SELECT
+
+        A batch costs the prefill of all its prompts plus the decode steps of
+        its longest answer, as a padded generate call does.
+        """
+        answers = [self.answer(prompt_parts) for prompt_parts in batch]
+        delay = (self.prefill_seconds_per_token * sum(self.count_tokens(prefix + suffix) for prefix, suffix in batch) +
+                 self.decode_seconds_per_token * max(self.count_tokens(sql) for sql in answers))
+        if delay:
+            time.sleep(delay)
+        return [sql[len("SELECT"):] for sql in answers]
+
+class StubGenerationBackend:
+    """Generation backend running a StubModel on a fixed number of simulated devices
+
+    Each device has its own batch scheduler, as each inference worker does;
+    with batching off it takes one prompt at a time.
+    """
+
+    def __init__(self, model: StubModel, devices: int = 1, batching: bool = None):
+        self.model = model
+        batching = BATCH_CONFIG['enabled'] if batching is None else batching
+        self.schedulers = [BatchScheduler(model.generate_batch, max_batch_size=None if batching else 1)
+                           for _ in range(devices)]
+        self._next = itertools.cycle(self.schedulers)
+        self._lock = threading.Lock()
+
+    def submit(self, prompt_parts: Tuple[str, str]) -> Future:
+        """Queue one prompt on the next device, as the worker pool's submit does"""
+        with self._lock:
+            scheduler = next(self._next)
+        return scheduler.submit(prompt_parts)
+
+    def get_stats(self) -> Dict:
+        """Batching statistics summed over the simulated devices"""
+        per_device = [scheduler.get_stats() for scheduler in self.schedulers]
+        batches = sum(stats["batches"] for stats in per_device)
+        requests = sum(stats["batched_requests"] for stats in per_device)
+        return {
+            "devices": len(self.schedulers),
+            "batches": batches,
+            "batched_requests": requests,
+            "avg_batch_size": requests / batches if batches else 0.0,
+            "max_observed_batch_size": max(stats["max_observed_batch_size"] for stats in per_device),
+        }
+
+def load_local_model(model_name: str, max_new_tokens: int = None):
+    """Load a small causal LM in process on the CPU in place of the production model"""
+    from models import sql_generator
+
+    MODEL_CONFIG.update(model_name=model_name, device='cpu', use_8bit=False, torch_dtype='float32', draft_model_name=None)
+    if max_new_tokens:
+        MODEL_CONFIG['max_new_tokens'] = max_new_tokens
+    model, _ = sql_generator.get_model()
+
+    # Small models often have shorter contexts than the production model
+    positions = getattr(model.config, "max_position_embeddings", None) or getattr(model.config, "n_positions", None)
+    if positions and positions < MODEL_CONFIG['max_input_length'] + MODEL_CONFIG['max_new_tokens']:
+        MODEL_CONFIG['max_input_length'] = positions - MODEL_CONFIG['max_new_tokens']
+        sql_generator.prompt_budget.max_tokens = MODEL_CONFIG['max_input_length']
+    return model
+
+@contextmanager
+def stand_in_pipeline(backend=None, count_tokens=None):
+    """Route the real generation pipeline through stand-ins, restoring it afterwards
+
+    The query cache is replaced with a fresh in-memory one, so runs neither
+    read nor write the on-disk cache. backend=None keeps generation in
+    process (e.g. with a model from load_local_model).
+    """
+    from models import sql_generator
+    from utils.metrics import metrics
+    from utils.prompt_budget import TokenCounter
+    from utils.query_cache import QueryCache
+
+    saved = (sql_generator.query_cache, sql_generator.prompt_budget.counter, sql_generator.get_generation_backend())
+    sql_generator.query_cache = QueryCache(persistent_store=None)
+    if count_tokens is not None:
+        sql_generator.prompt_budget.counter = TokenCounter(count_tokens)
+    sql_generator.set_generation_backend(backend)
+    metrics.reset()
+    try:
+        yield sql_generator
+    finally:
+        sql_generator.query_cache, sql_generator.prompt_budget.counter = saved[0], saved[1]
+        sql_generator.set_generation_backend(saved[2])
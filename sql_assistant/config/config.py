@@ -1,3 +1,5 @@
+import os
+
 # Database configuration
 DB_CONFIG = {
     'host': 'localhost',
@@ -6,15 +8,89 @@ DB_CONFIG = {
     'database': 'employees'
 }
 
+# Connection pool configuration
+POOL_CONFIG = {
+    'enabled': True,
+    'pool_size': 5,                # Maximum number of open connections
+    'checkout_timeout': 10.0,      # Seconds to wait for a free connection
+    'health_check': True,          # Ping connections before handing them out
+    'idle_timeout': 300.0,         # Close connections idle longer than this (seconds)
+    'reap_interval': 60.0,         # How often the reaper looks for idle connections
+}
+
 # Model configuration with optimizations
 MODEL_CONFIG = {
     'model_name': 'NumbersStation/nsql-6B',
     'use_8bit': True,  # Enable 8-bit quantization for memory efficiency
     'device': 'auto',
+    'torch_dtype': 'float16',  # Weight dtype; 'float32' for CPU-only runs
     'max_new_tokens': 200,  # Limit new tokens instead of total length
+    'max_input_length': 2048,  # Longest prompt (in tokens) passed to the model
     'temperature': 0.1,     # Lower temperature for more deterministic output
     'top_p': 0.9,          # Slightly lower top_p for better accuracy
     'use_cache': True,      # Enable KV cache for faster generation
+    'draft_model_name': None,  # Small model sharing the tokenizer (e.g. 'NumbersStation/nsql-350M') for speculative decoding
+    'draft_num_tokens': 5,  # Tokens the draft model proposes per verification step
+}
+
+# Token budget for assembling prompts; prompt plus generated tokens must fit the model's context
+PROMPT_BUDGET_CONFIG = {
+    'enabled': True,
+    'max_prompt_tokens': MODEL_CONFIG['max_input_length'] - MODEL_CONFIG['max_new_tokens'],
+    'margin_tokens': 16,                # Slack for tokens gained or lost where fragments are joined
+    'token_cache_size': 4096,           # Fragments whose token counts are remembered
+}
+
+# Streaming result fetching
+STREAMING_CONFIG = {
+    'chunk_size': 500,                  # Rows fetched per round trip
+    'max_rows': 10000,                  # Stop reading a result after this many rows
+    'max_bytes': 16 * 1024 * 1024,      # ...or after roughly this many bytes of row data
+    'page_size': 50,                    # Rows shown per page in the UI
+}
+
+# Preview mode: show a LIMITed sample first, fetch the full result on request
+PREVIEW_CONFIG = {
+    'enabled': True,
+    'row_limit': 100,                   # LIMIT added to non-aggregate queries for the preview
+}
+
+# Cache of executed query results, invalidated when a table they read changes
+RESULT_CACHE_CONFIG = {
+    'enabled': True,
+    'max_entries': 256,
+    'max_bytes': 64 * 1024 * 1024,      # Approximate memory held by cached rows
+    'ttl_seconds': 600,
+    'invalidation': 'update_time',      # 'update_time' (information_schema.TABLES) or 'checksum' (CHECKSUM TABLE)
+    'version_check_interval_seconds': 1.0,  # Table versions are re-polled at most this often
+}
+
+# Pre-execution cost gate for generated SQL
+COST_GUARD_CONFIG = {
+    'enabled': True,
+    'max_estimated_rows': 10_000_000,   # EXPLAIN rows-examined budget per query
+    'downscope_limit': 1000,            # LIMIT applied to over-budget non-aggregate queries
+    'max_execution_time_ms': 15000,     # Server-side MAX_EXECUTION_TIME for every SELECT
+}
+
+# Extracted schema cache, kept in process and on disk
+SCHEMA_CACHE_CONFIG = {
+    'enabled': True,
+    'path': os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'schema_cache.json'),
+    'revalidate_interval_seconds': 30,  # How long to trust the cached schema before re-checking its fingerprint
+}
+
+# Micro-batching of concurrent generation requests
+BATCH_CONFIG = {
+    'enabled': True,
+    'max_batch_size': 8,    # Largest number of prompts padded into one generate call
+    'max_wait_ms': 20,      # How long the first request waits for others to join its batch
+}
+
+# Reuse of the key/value cache for the shared schema/examples prompt prefix
+PREFIX_CACHE_CONFIG = {
+    'enabled': True,
+    'max_entries': 8,       # Each entry holds a full KV cache on the model device
 }
 
 # Few-shot prompting configuration
@@ -22,8 +98,71 @@ FEW_SHOT_CONFIG = {
     'enabled': True,
     'num_examples': 3,
     'use_semantic_similarity': False,  # Set to True if you install sentence-transformers
+    'embedding_model': 'all-MiniLM-L6-v2',
+    'embedding_cache_path': os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'example_embeddings.npz'),
+    'embedding_save_delay_seconds': 5.0,  # Batch saves of examples added at runtime
     'cache_enabled': True,
-    'max_cache_size': 100
+    'max_cache_size': 100,
+    'cache_ttl_seconds': 3600,   # Expire cached SQL after this many seconds (None to disable)
+    'max_cache_bytes': None,     # Optional memory bound for the cache in bytes
+    'normalized_cache_lookup': True,   # Match questions that differ only in case/punctuation/spacing
+    'similarity_cache_lookup': False,  # Match near-duplicates (same content words, similar wording)
+    'similarity_threshold': 0.9,       # Minimum cosine similarity for a near-duplicate hit
+}
+
+# On-disk tier behind the query cache so generated SQL survives restarts
+PERSISTENT_CACHE_CONFIG = {
+    'enabled': True,
+    'path': os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'query_cache.sqlite3'),
+    'flush_interval_seconds': 1.0,  # Write-behind delay for new entries
+    'ttl_seconds': None,            # Persisted entries only go stale when the schema changes
+    'stale_schema_seconds': 7 * 24 * 3600,  # How long entries for other schema versions are kept
+    'max_entries': 100000,          # Oldest entries beyond this are dropped on flush
+}
+
+# Coalescing of identical concurrent requests
+SINGLE_FLIGHT_CONFIG = {
+    'generation': True,                 # Identical questions in flight share one generation
+    'execution': True,                  # Identical queries in flight share one execution
+}
+
+# Async request pipeline and Gradio queue
+PIPELINE_CONFIG = {
+    'inference_workers': 8,             # Threads waiting on generation; >= batch size so requests can batch
+    'db_workers': 8,                    # Threads for EXPLAIN, query execution and result formatting
+    'queue_concurrency_limit': 16,      # Gradio events processed at once
+    'queue_max_size': 64,               # Requests waiting beyond that are turned away
+}
+
+# Out-of-process inference workers, each holding its own copy of the model
+WORKER_POOL_CONFIG = {
+    'enabled': False,
+    'num_workers': 2,
+    'devices': None,                    # e.g. ['0', '1']: CUDA_VISIBLE_DEVICES per worker, round-robin
+    'max_restarts': 5,                  # Per worker, before it is left down
+    'restart_backoff_seconds': 2.0,
+    'max_attempts': 2,                  # Dispatches per request before a worker crash fails it
+    'health_check_interval_seconds': 0.5,
+    'request_timeout_seconds': 300,     # A worker holding a request longer is treated as hung and restarted
+    'ready_timeout_seconds': 1800,
+    'socket_path': None,                # e.g. '/tmp/sql_assistant_inference.sock' to share workers with batch jobs
+    'rpc_authkey': os.environ.get('SQL_ASSISTANT_RPC_KEY', '').encode() or None,  # Required with socket_path
+}
+
+# Background startup: schema extraction, model load and warmup
+STARTUP_CONFIG = {
+    'warmup': True,                     # Run a short generate once the model is loaded
+    'wait_for_ready': True,             # Start serving only after startup finishes
+    'ready_timeout_seconds': 1800,
+}
+
+# Per-stage latency histograms and the Prometheus scrape endpoint
+METRICS_CONFIG = {
+    'enabled': True,
+    'window_size': 2048,                # Recent samples per stage used for p50/p95/p99
+    'http_enabled': True,
+    'http_host': '127.0.0.1',           # Unauthenticated; only widen behind a firewall or proxy
+    'http_port': 9876,                  # Serves /metrics in Prometheus text format
 }
 
 # Performance optimization settings
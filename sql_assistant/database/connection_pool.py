@@ -0,0 +1,211 @@
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+from config.config import POOL_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Driver error classes, matched by name so the pool stays driver-agnostic, that
+# mean the connection itself is unusable (mysql.connector raises ProgrammingError
+# or DatabaseError for bad SQL, which leaves the connection fine)
+CONNECTION_ERROR_NAMES = ("InterfaceError", "OperationalError")
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+def is_connection_error(error: BaseException) -> bool:
+    """Whether an error raised while a connection was in use means it is broken"""
+    if not isinstance(error, Exception) or isinstance(error, (ConnectionError, EOFError)):
+        # Interrupted mid-query (or the socket went away): the protocol state is unknown
+        return True
+    return any(cls.__name__ in CONNECTION_ERROR_NAMES for cls in type(error).__mro__)
+
+class ConnectionPool:
+    """Bounded pool of reusable database connections"""
+
+    def __init__(self, connection_factory: Callable, pool_size: int = None,
+                 checkout_timeout: float = None, health_check: bool = None,
+                 idle_timeout: float = None, reap_interval: float = None):
+        self.connection_factory = connection_factory
+        self.pool_size = pool_size or POOL_CONFIG['pool_size']
+        self.checkout_timeout = checkout_timeout if checkout_timeout is not None else POOL_CONFIG['checkout_timeout']
+        self.health_check = health_check if health_check is not None else POOL_CONFIG['health_check']
+        self.idle_timeout = idle_timeout if idle_timeout is not None else POOL_CONFIG['idle_timeout']
+        self.reap_interval = reap_interval if reap_interval is not None else POOL_CONFIG['reap_interval']
+
+        self._idle: List[tuple] = []  # (connection, released_at), most recently used last
+        self._open_count = 0
+        self._condition = threading.Condition()
+        self._last_reap = time.monotonic()
+
+        # Metrics
+        self._checkouts = 0
+        self._waits = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._reaped = 0
+        self._failed_health_checks = 0
+
+    def _is_healthy(self, connection) -> bool:
+        """Check that a pooled connection is still usable"""
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled connection failed health check: {e}")
+            return False
+
+    def _close(self, connection):
+        """Close a connection, ignoring errors from already-dead sockets"""
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _reap_idle_locked(self, now: float) -> List:
+        """Remove idle connections past the idle timeout; caller holds the lock"""
+        if not self.idle_timeout or now - self._last_reap < self.reap_interval:
+            return []
+        self._last_reap = now
+
+        expired = [conn for conn, released_at in self._idle if now - released_at > self.idle_timeout]
+        if expired:
+            self._idle = [(conn, released_at) for conn, released_at in self._idle
+                          if now - released_at <= self.idle_timeout]
+            self._open_count -= len(expired)
+            self._reaped += len(expired)
+            self._condition.notify(len(expired))
+        return expired
+
+    def acquire(self):
+        """Check out a connection, waiting up to checkout_timeout for one to free up"""
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        waited = False
+
+        while True:
+            connection = None
+            create = False
+            with self._condition:
+                expired = self._reap_idle_locked(time.monotonic())
+                while not self._idle and self._open_count >= self.pool_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"No database connection available after {self.checkout_timeout}s "
+                            f"(pool size {self.pool_size})"
+                        )
+                    waited = True
+                    self._condition.wait(remaining)
+
+                if self._idle:
+                    connection, _ = self._idle.pop()
+                else:
+                    self._open_count += 1
+                    create = True
+
+            for stale in expired:
+                self._close(stale)
+
+            if create:
+                try:
+                    connection = self.connection_factory()
+                except Exception:
+                    with self._condition:
+                        self._open_count -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self._created += 1
+            elif self.health_check and not self._is_healthy(connection):
+                self._close(connection)
+                with self._condition:
+                    self._open_count -= 1
+                    self._failed_health_checks += 1
+                    self._condition.notify()
+                continue
+
+            wait_time = time.monotonic() - start
+            with self._condition:
+                self._checkouts += 1
+                if waited:
+                    self._waits += 1
+                self._total_wait_time += wait_time
+                self._max_wait_time = max(self._max_wait_time, wait_time)
+            return connection
+
+    def release(self, connection, discard: bool = False):
+        """Return a connection to the pool, or close it if discard is set"""
+        if not discard and getattr(connection, 'unread_result', False):
+            # Draining an abandoned result set could mean reading millions of rows;
+            # dropping the connection is cheaper
+            discard = True
+
+        if not discard:
+            try:
+                # Leave no open transaction behind for the next user
+                connection.rollback()
+            except Exception as e:
+                logger.warning(f"Discarding connection that failed to reset: {e}")
+                discard = True
+
+        with self._condition:
+            if discard:
+                self._open_count -= 1
+                self._discarded += 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+        if discard:
+            self._close(connection)
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks out a connection and always returns it"""
+        connection = self.acquire()
+        discard = False
+        try:
+            yield connection
+        except BaseException as e:
+            # Bad SQL leaves the connection usable; only a broken one is dropped
+            discard = is_connection_error(e) or not self._is_healthy(connection)
+            raise
+        finally:
+            self.release(connection, discard=discard)
+
+    def close_all(self):
+        """Close every idle connection in the pool"""
+        with self._condition:
+            idle = [conn for conn, _ in self._idle]
+            self._idle = []
+            self._open_count -= len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            self._close(connection)
+        logger.info(f"Closed {len(idle)} pooled connections")
+
+    def get_stats(self) -> Dict:
+        """Get pool usage and wait-time metrics"""
+        with self._condition:
+            return {
+                "pool_size": self.pool_size,
+                "open_connections": self._open_count,
+                "idle_connections": len(self._idle),
+                "in_use_connections": self._open_count - len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "avg_wait_ms": (self._total_wait_time / self._checkouts * 1000) if self._checkouts else 0.0,
+                "max_wait_ms": self._max_wait_time * 1000,
+                "created": self._created,
+                "discarded": self._discarded,
+                "reaped": self._reaped,
+                "failed_health_checks": self._failed_health_checks,
+            }
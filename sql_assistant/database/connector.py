@@ -1,36 +1,7 @@
 import mysql.connector
-
-# Establish connection
-conn = mysql.connector.connect(
-    host='localhost',
-    user='root',
-    password='forget@7',  
-    database='employees'
-)
-
-cursor = conn.cursor()
-
-
-query = query = """
-SELECT e.emp_no, e.first_name, e.last_name, d.dept_name
-FROM employees e
-JOIN dept_emp de ON e.emp_no = de.emp_no
-JOIN departments d ON de.dept_no = d.dept_no
-WHERE d.dept_no = 'd005'
-LIMIT 10;
-"""
-cursor.execute(query)
-
-
-for row in cursor.fetchall():
-    print(row)
-
-
-cursor.close()
-conn.close()
-
-
-from config.config import DB_CONFIG
+from contextlib import contextmanager
+from config.config import DB_CONFIG, POOL_CONFIG
+from database.connection_pool import ConnectionPool
 
 def get_connection():
     """Create and return a database connection"""
@@ -40,3 +11,27 @@ def get_connection():
     except mysql.connector.Error as err:
         print(f"Database connection error: {err}")
         raise
+
+
+# Shared pool used by query execution and schema extraction
+connection_pool = ConnectionPool(get_connection)
+
+@contextmanager
+def pooled_connection():
+    """Check out a connection from the shared pool, or a fresh one if pooling is disabled"""
+    if not POOL_CONFIG['enabled']:
+        connection = get_connection()
+        try:
+            yield connection
+        finally:
+            connection.close()
+        return
+
+    with connection_pool.connection() as connection:
+        yield connection
+
+def get_pool_stats() -> dict:
+    """Get connection pool statistics"""
+    stats = connection_pool.get_stats()
+    stats["pool_enabled"] = POOL_CONFIG['enabled']
+    return stats
@@ -0,0 +1,93 @@
+import re
+import logging
+from typing import Dict, List, Tuple
+from config.config import COST_GUARD_CONFIG
+from database.connector import pooled_connection
+from database.query_executor import result_cache
+from utils.query_optimizer import (add_limit_clause, has_top_level_order_by, is_aggregate_query,
+                                   outer_select_position)
+
+logger = logging.getLogger(__name__)
+
+def explain_query(query: str) -> List[Dict]:
+    """Run a tabular EXPLAIN and return its plan rows"""
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(f"EXPLAIN {query.strip().rstrip(';')}")
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+def estimate_from_plan(plan: List[Dict]) -> Tuple[int, int]:
+    """Estimate (rows examined, rows returned) from EXPLAIN's per-table row counts
+
+    Tables sharing a select id are joined in nested-loop order, so each one is
+    probed once per row surviving the tables before it (rows * filtered%).
+    Separate select ids (subqueries, unions) are added together; the rows
+    returned are those surviving the outermost select.
+    """
+    totals: Dict = {}
+    for step in plan:
+        select_id = step.get("id")
+        rows = float(step.get("rows") or 1)
+        filtered = float(step.get("filtered") or 100.0) / 100.0
+        examined, fanout = totals.get(select_id, (0.0, 1.0))
+        totals[select_id] = (examined + fanout * rows, fanout * max(rows * filtered, 1.0))
+    if not totals:
+        return 0, 0
+    outer_id = plan[0].get("id")
+    return int(sum(examined for examined, _ in totals.values())), int(totals[outer_id][1])
+
+def add_execution_time_hint(query: str, max_execution_time_ms: int) -> str:
+    """Add a MAX_EXECUTION_TIME optimizer hint so the server aborts runaway SELECTs
+
+    The hint is only honoured on the outer query block, so it goes after the
+    SELECT that follows any WITH clause or leading parenthesis.
+    """
+    if not max_execution_time_ms or re.search(r'MAX_EXECUTION_TIME', query, re.IGNORECASE):
+        return query
+    position = outer_select_position(query)
+    if position is None:
+        logger.warning("No outer SELECT found, query runs without an execution time limit")
+        return query
+    position += len("SELECT")
+    return f"{query[:position]} /*+ MAX_EXECUTION_TIME({int(max_execution_time_ms)}) */{query[position:]}"
+
+def guard_query(query: str) -> Tuple[str, Dict]:
+    """Check a generated query against the row budget before it runs
+
+    Returns the SQL to execute (None if rejected) and a cost report. Queries over
+    budget are down-scoped with a LIMIT when they neither aggregate nor sort;
+    otherwise they are rejected.
+    """
+    max_rows = COST_GUARD_CONFIG['max_estimated_rows']
+    report = {"estimated_rows": None, "estimated_result_rows": None, "budget": max_rows,
+              "action": "allowed", "message": ""}
+
+    if not COST_GUARD_CONFIG['enabled']:
+        return query, report
+
+    try:
+        # Plans only change with the data, so repeat queries skip the EXPLAIN round trip
+        estimated, result_rows = result_cache.get_or_compute(
+            query, "explain", lambda: estimate_from_plan(explain_query(query)), lambda estimate: 0)
+    except Exception as e:
+        report.update(action="rejected", message=f"EXPLAIN failed: {e}")
+        return None, report
+
+    report.update(estimated_rows=estimated, estimated_result_rows=result_rows)
+    guarded_sql = query
+    if estimated > max_rows:
+        if is_aggregate_query(query) or has_top_level_order_by(query):
+            report.update(action="rejected",
+                          message=f"Estimated {estimated:,} rows examined exceeds the budget of {max_rows:,}")
+            logger.warning(f"Rejected query over cost budget: {report['message']}")
+            return None, report
+        guarded_sql = add_limit_clause(query, COST_GUARD_CONFIG['downscope_limit'])
+        report.update(action="downscoped",
+                      message=f"Estimated {estimated:,} rows examined exceeds the budget; limited to "
+                              f"{COST_GUARD_CONFIG['downscope_limit']:,} rows")
+        logger.info(f"Down-scoped query over cost budget: {report['message']}")
+
+    return add_execution_time_hint(guarded_sql, COST_GUARD_CONFIG['max_execution_time_ms']), report
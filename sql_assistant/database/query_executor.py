@@ -1,19 +1,183 @@
-from database.connector import get_connection
+import logging
+from contextlib import closing
+from typing import Dict, Iterator, List, Tuple
+from config.config import RESULT_CACHE_CONFIG, SINGLE_FLIGHT_CONFIG, STREAMING_CONFIG
+from database.connector import pooled_connection
+from database.result_cache import ResultCache, normalize_sql
+from utils.metrics import time_stage
+from utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Rough per-row bookkeeping cost of a row dict
+ROW_OVERHEAD_BYTES = 64
+
+def _estimate_row_bytes(row: Dict) -> int:
+    """Approximate the memory held by one fetched row"""
+    size = ROW_OVERHEAD_BYTES
+    for value in row.values():
+        size += len(value) if isinstance(value, (str, bytes, bytearray)) else 8
+    return size
+
+def _close_cursor(cursor):
+    """Close a cursor that may still have unread rows
+
+    The connector refuses to close a cursor mid-result; the pool drops such
+    connections on release, so the error can be ignored here.
+    """
+    try:
+        cursor.close()
+    except Exception:
+        pass
+
+def _rows_bytes(rows) -> int:
+    """Approximate memory held by a list of fetched rows"""
+    return sum(_estimate_row_bytes(row) for row in rows) if isinstance(rows, list) else 0
+
+def fetch_table_versions(tables: List[str]) -> Dict:
+    """Read a change token for each table: its last update time, or its checksum
+
+    The token is None when it can't be trusted to change: views have no
+    UPDATE_TIME or checksum, and UPDATE_TIME only has one-second resolution, so
+    a table updated within the current second may change again unnoticed.
+    """
+    if not tables:
+        return {}
+    placeholders = ", ".join(["%s"] * len(tables))
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            if RESULT_CACHE_CONFIG['invalidation'] == 'checksum':
+                # CHECKSUM TABLE reads every row, but sees changes UPDATE_TIME can miss
+                cursor.execute(
+                    "SELECT TABLE_NAME FROM information_schema.TABLES "
+                    f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders})", tuple(tables))
+                existing = [row[0] for row in cursor.fetchall()]
+                if not existing:
+                    return {}
+                cursor.execute("CHECKSUM TABLE " + ", ".join(f"`{table}`" for table in existing))
+                return {name.split('.')[-1].lower(): checksum for name, checksum in cursor.fetchall()}
+
+            try:
+                # MySQL 8 otherwise serves UPDATE_TIME from a cache that can be a day old
+                cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+            except Exception:
+                pass
+            cursor.execute(
+                "SELECT TABLE_NAME, UPDATE_TIME, NOW() FROM information_schema.TABLES "
+                f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders})", tuple(tables))
+            return {name.lower(): update_time if update_time is not None and update_time < now else None
+                    for name, update_time, now in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+# Executed results, keyed by normalized SQL and invalidated by table changes
+result_cache = ResultCache(fetch_table_versions)
+
+# Identical queries arriving together share one execution
+execution_flight = SingleFlight("execution")
+
+def _cached_execution(query, variant: str, compute_fn, size_fn):
+    """Serve a result from the cache, coalescing concurrent misses for the same query"""
+    if not SINGLE_FLIGHT_CONFIG['execution']:
+        return result_cache.get_or_compute(query, variant, compute_fn, size_fn)
+    return execution_flight.do((normalize_sql(query), variant),
+                               lambda: result_cache.get_or_compute(query, variant, compute_fn, size_fn))
+
+def execute_query_stream(query, chunk_size=None, max_rows=None, max_bytes=None) -> Iterator[List[Dict]]:
+    """Execute a SQL query and yield its rows in chunks
+
+    Rows are read from an unbuffered cursor, so only one chunk is held at a
+    time. Reading stops once max_rows rows or about max_bytes bytes have been
+    yielded; the rest of the result is abandoned with its connection.
+    """
+    chunk_size = chunk_size or STREAMING_CONFIG['chunk_size']
+    max_rows = max_rows if max_rows is not None else STREAMING_CONFIG['max_rows']
+    max_bytes = max_bytes if max_bytes is not None else STREAMING_CONFIG['max_bytes']
+
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True, buffered=False)
+        try:
+            cursor.execute(query)
+            rows_sent = 0
+            bytes_sent = 0
+            while True:
+                fetch_size = chunk_size if not max_rows else min(chunk_size, max_rows - rows_sent)
+                rows = cursor.fetchmany(fetch_size) if fetch_size > 0 else []
+                if not rows:
+                    break
+
+                if max_bytes:
+                    for i, row in enumerate(rows):
+                        bytes_sent += _estimate_row_bytes(row)
+                        if bytes_sent > max_bytes:
+                            rows = rows[:i + 1]
+                            break
+
+                rows_sent += len(rows)
+                yield rows
+
+                if (max_rows and rows_sent >= max_rows) or (max_bytes and bytes_sent > max_bytes):
+                    logger.warning(f"Result truncated after {rows_sent} rows (~{bytes_sent} bytes)")
+                    break
+        finally:
+            _close_cursor(cursor)
+
+def _fetch_all(query) -> List[Dict]:
+    """Read a whole (capped) result into a list"""
+    results = []
+    for rows in execute_query_stream(query):
+        results.extend(rows)
+    return results
 
 def execute_query(query, fetch_all=True):
     """Execute a SQL query and return results"""
-    connection = get_connection()
-    cursor = connection.cursor(dictionary=True)
-    
     try:
-        cursor.execute(query)
-        if fetch_all:
-            results = cursor.fetchall()
-        else:
-            results = cursor.fetchone()
-        return results
+        with time_stage("execute_query"):
+            if fetch_all:
+                return _cached_execution(query, "all", lambda: _fetch_all(query), _rows_bytes)
+            
+            with closing(execute_query_stream(query, chunk_size=1, max_rows=1)) as stream:
+                for rows in stream:
+                    return rows[0]
+            return None
     except Exception as e:
         return {"error": str(e)}
-    finally:
-        cursor.close()
-        connection.close()
+
+def fetch_result_page(query, page: int = 0, page_size: int = None) -> Tuple[List[Dict], bool]:
+    """Fetch one page of a query's results and whether more rows follow
+
+    Earlier pages are streamed past rather than kept, so memory stays at one
+    page; paging is bounded by the configured row and byte caps. Pages are
+    served from the result cache while the tables they read are unchanged.
+    """
+    page_size = page_size or STREAMING_CONFIG['page_size']
+    with time_stage("execute_query"):
+        return _cached_execution(query, f"page:{page}:{page_size}",
+                                 lambda: _stream_page(query, page, page_size),
+                                 lambda result: _rows_bytes(result[0]))
+
+def _stream_page(query, page: int, page_size: int) -> Tuple[List[Dict], bool]:
+    """Stream past earlier rows and collect one page"""
+    start = page * page_size
+    end = start + page_size
+
+    page_rows: List[Dict] = []
+    seen = 0
+    # One extra row tells us whether a next page exists
+    stream = execute_query_stream(query, chunk_size=min(STREAMING_CONFIG['chunk_size'], end + 1))
+    with closing(stream):
+        for rows in stream:
+            chunk_start = seen
+            seen += len(rows)
+            if seen > start:
+                page_rows.extend(rows[max(start - chunk_start, 0):end - chunk_start])
+            if seen > end:
+                return page_rows, True
+    return page_rows, False
+
+def get_result_cache_stats() -> Dict:
+    """Get executed-result cache statistics, including coalesced executions"""
+    stats = result_cache.get_stats()
+    stats["executions_coalesced"] = execution_flight.get_stats()["coalesced"]
+    return stats
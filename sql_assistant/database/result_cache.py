@@ -0,0 +1,217 @@
+import re
+import hashlib
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from config.config import RESULT_CACHE_CONFIG
+from utils.query_optimizer import extract_query_tables
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry bookkeeping cost (entry object, key, table list)
+ENTRY_OVERHEAD_BYTES = 300
+
+_STRING_LITERAL = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")")
+
+def normalize_sql(sql_query: str) -> str:
+    """Canonical form of a query: lowercased, single-spaced, no trailing semicolon
+
+    String literals are kept verbatim so queries differing only in a value stay distinct.
+    """
+    parts = _STRING_LITERAL.split(sql_query.strip().rstrip(';'))
+    for i in range(0, len(parts), 2):
+        parts[i] = ' '.join(parts[i].split()).lower()
+    return ''.join(parts).strip()
+
+class _ResultEntry:
+    __slots__ = ("value", "tables", "versions", "expires_at", "size")
+
+    def __init__(self, value, tables: Tuple[str, ...], versions: Dict, expires_at: Optional[float], size: int):
+        self.value = value
+        self.tables = tables
+        self.versions = versions
+        self.expires_at = expires_at
+        self.size = size
+
+class ResultCache:
+    """LRU cache of query results, dropped when a table the query reads changes
+
+    version_fetcher maps a list of table names to a version token per table
+    (last update time or checksum), or None when the table has no version that
+    reliably changes with its data; queries reading such a table are not cached.
+    Versions are polled at most once per version_check_interval, so a hit within
+    the interval costs no round trip and results can be that much out of date.
+    """
+
+    def __init__(self, version_fetcher: Callable[[List[str]], Dict], max_entries: int = None,
+                 max_bytes: int = None, ttl_seconds: float = None, version_check_interval: float = None):
+        self.version_fetcher = version_fetcher
+        self.max_entries = max_entries or RESULT_CACHE_CONFIG['max_entries']
+        self.max_bytes = max_bytes if max_bytes is not None else RESULT_CACHE_CONFIG['max_bytes']
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else RESULT_CACHE_CONFIG['ttl_seconds']
+        self.version_check_interval = (version_check_interval if version_check_interval is not None
+                                       else RESULT_CACHE_CONFIG['version_check_interval_seconds'])
+
+        # Ordered oldest-to-newest access, so LRU eviction is popitem(last=False)
+        self.cache: "OrderedDict[str, _ResultEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+        # Last polled version of each table and when it was polled
+        self._table_versions: Dict[str, Tuple[object, float]] = {}
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._version_polls = 0
+
+    def _generate_key(self, sql_query: str, variant: str) -> str:
+        """Generate a cache key from the normalized query and the result shape requested"""
+        return hashlib.md5(f"{normalize_sql(sql_query)}|{variant}".encode()).hexdigest()
+
+    def table_versions(self, tables: Tuple[str, ...]) -> Dict:
+        """Current version of each table, polling only those not checked recently"""
+        now = time.monotonic()
+        with self._lock:
+            stale = [table for table in tables
+                     if table not in self._table_versions or
+                     now - self._table_versions[table][1] >= self.version_check_interval]
+
+        if stale:
+            fetched = self.version_fetcher(stale)
+            with self._lock:
+                self._version_polls += 1
+                for table in stale:
+                    self._table_versions[table] = (fetched.get(table), now)
+
+        with self._lock:
+            return {table: self._table_versions[table][0] for table in tables}
+
+    def _remove(self, key: str):
+        """Drop an entry and its size accounting; caller holds the lock"""
+        entry = self.cache.pop(key)
+        self._bytes -= entry.size
+
+    def _evict_if_needed(self):
+        """Evict least recently used entries until within count and byte bounds"""
+        while self.cache and (len(self.cache) > self.max_entries or
+                              (self.max_bytes and self._bytes > self.max_bytes)):
+            self._remove(next(iter(self.cache)))
+            self._evictions += 1
+
+    def get(self, sql_query: str, variant: str = "") -> Optional[object]:
+        """Return a cached result if it is unexpired and its tables are unchanged"""
+        if not RESULT_CACHE_CONFIG['enabled']:
+            return None
+
+        key = self._generate_key(sql_query, variant)
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+
+        try:
+            current = self.table_versions(entry.tables)
+        except Exception as e:
+            logger.warning(f"Could not check table versions, bypassing result cache: {e}")
+            with self._lock:
+                self._misses += 1
+            return None
+
+        with self._lock:
+            if current != entry.versions:
+                if self.cache.get(key) is entry:
+                    self._remove(key)
+                self._invalidations += 1
+                self._misses += 1
+                logger.info(f"Invalidated cached result; tables changed: {', '.join(entry.tables)}")
+                return None
+            if key in self.cache:
+                self.cache.move_to_end(key)
+            self._hits += 1
+        return entry.value
+
+    def put(self, sql_query: str, variant: str, value, size: int, versions: Dict):
+        """Cache a result along with the table versions it was computed against"""
+        if not RESULT_CACHE_CONFIG['enabled']:
+            return
+
+        key = self._generate_key(sql_query, variant)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        size += ENTRY_OVERHEAD_BYTES
+        if self.max_bytes and size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self.cache:
+                self._remove(key)
+            self.cache[key] = _ResultEntry(value, tuple(sorted(versions)), versions, expires_at, size)
+            self._bytes += size
+            self._evict_if_needed()
+
+    def get_or_compute(self, sql_query: str, variant: str, compute_fn: Callable, size_fn: Callable):
+        """Return the cached result, or compute and cache it
+
+        Table versions are read before computing, so a write racing with the
+        query leaves the entry stale-marked rather than silently current.
+        """
+        cached = self.get(sql_query, variant)
+        if cached is not None or not RESULT_CACHE_CONFIG['enabled']:
+            return cached if cached is not None else compute_fn()
+
+        tables = tuple(extract_query_tables(sql_query))
+        if not tables:
+            # Nothing to invalidate it by (e.g. SELECT NOW(), or tables the parser missed)
+            return compute_fn()
+        try:
+            versions = self.table_versions(tables)
+        except Exception as e:
+            logger.warning(f"Could not read table versions, result not cached: {e}")
+            return compute_fn()
+        if any(version is None for version in versions.values()):
+            logger.debug(f"No usable version for some of {', '.join(tables)}, result not cached")
+            return compute_fn()
+
+        value = compute_fn()
+        self.put(sql_query, variant, value, size_fn(value), versions)
+        return value
+
+    def clear(self):
+        """Clear all cached results and polled table versions"""
+        with self._lock:
+            self.cache.clear()
+            self._bytes = 0
+            self._table_versions.clear()
+        logger.info("Result cache cleared")
+
+    def size(self) -> int:
+        """Get current number of cached results"""
+        with self._lock:
+            return len(self.cache)
+
+    def get_stats(self) -> Dict:
+        """Get result cache statistics"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "result_cache_size": len(self.cache),
+                "result_cache_max_entries": self.max_entries,
+                "result_cache_bytes": self._bytes,
+                "result_cache_hits": self._hits,
+                "result_cache_misses": self._misses,
+                "result_cache_hit_rate": self._hits / lookups if lookups else 0.0,
+                "result_cache_invalidations": self._invalidations,
+                "result_cache_evictions": self._evictions,
+                "result_cache_expirations": self._expirations,
+                "result_cache_version_polls": self._version_polls,
+            }
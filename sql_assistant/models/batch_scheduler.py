@@ -0,0 +1,92 @@
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+from config.config import BATCH_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class BatchScheduler:
+    """Collect requests arriving within a short window and run them as one batch"""
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: int = None,
+                 max_wait_ms: float = None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size or BATCH_CONFIG['max_batch_size']
+        self.max_wait_ms = max_wait_ms if max_wait_ms is not None else BATCH_CONFIG['max_wait_ms']
+
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._batches = 0
+        self._requests = 0
+        self._max_observed_batch = 0
+
+    def _ensure_worker(self):
+        """Start the background worker on first use"""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="sql-batch-scheduler", daemon=True)
+                self._worker.start()
+
+    def submit(self, item: Any) -> Future:
+        """Queue an item for the next batch and return a future for its result"""
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((item, future))
+        return future
+
+    def _collect_batch(self) -> List[tuple]:
+        """Block for the first request, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Worker loop: run each collected batch and resolve its futures"""
+        while True:
+            batch = self._collect_batch()
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+
+            with self._lock:
+                self._batches += 1
+                self._requests += len(batch)
+                self._max_observed_batch = max(self._max_observed_batch, len(batch))
+
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"Batch function returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                logger.error(f"Batch of {len(items)} failed: {str(e)}")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+    def get_stats(self) -> Dict:
+        """Get batching statistics"""
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "batched_requests": self._requests,
+                "avg_batch_size": (self._requests / self._batches) if self._batches else 0.0,
+                "max_observed_batch_size": self._max_observed_batch,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+            }
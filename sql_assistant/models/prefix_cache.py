@@ -0,0 +1,83 @@
+import copy
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+from config.config import PREFIX_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class PrefixCache:
+    """Bounded LRU of precomputed key/value caches for shared prompt prefixes"""
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or PREFIX_CACHE_CONFIG['max_entries']
+        self._entries: "OrderedDict[str, Tuple[Any, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._cached_tokens_reused = 0
+
+    def _generate_key(self, prefix: str) -> str:
+        """Generate a cache key from the prefix text"""
+        return hashlib.sha1(prefix.encode()).hexdigest()
+
+    def get_or_compute(self, prefix: str, compute_fn: Callable[[str], Tuple[Any, Any]]) -> Tuple[Any, Any]:
+        """Return (prefix_ids, past_key_values) for a prefix, computing it on a miss
+
+        The returned key/value cache is a private copy, since generate() extends
+        the cache it is given in place.
+        """
+        key = self._generate_key(prefix)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                self._cached_tokens_reused += entry[0].shape[-1]
+
+        if entry is None:
+            # Compute outside the lock; a concurrent miss on the same prefix just
+            # computes it twice, which is cheaper than serializing every prefill
+            entry = compute_fn(prefix)
+            with self._lock:
+                self._misses += 1
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+                    logger.info("Evicted least recently used prefix cache entry")
+
+        prefix_ids, past_key_values = entry
+        return prefix_ids, copy.deepcopy(past_key_values)
+
+    def clear(self):
+        """Drop every cached prefix"""
+        with self._lock:
+            self._entries.clear()
+        logger.info("Prefix cache cleared")
+
+    def size(self) -> int:
+        """Get current number of cached prefixes"""
+        with self._lock:
+            return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        """Get prefix cache statistics"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "prefix_cache_size": len(self._entries),
+                "prefix_cache_max_entries": self.max_entries,
+                "prefix_cache_hits": self._hits,
+                "prefix_cache_misses": self._misses,
+                "prefix_cache_evictions": self._evictions,
+                "prefix_cache_hit_rate": (self._hits / lookups) if lookups else 0.0,
+                "prefix_tokens_reused": self._cached_tokens_reused,
+            }
@@ -1,17 +1,28 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
-from config.config import MODEL_CONFIG, FEW_SHOT_CONFIG, PERFORMANCE_CONFIG
+import re
+import threading
+import time
+from typing import List, Optional, Tuple
+from config.config import MODEL_CONFIG, FEW_SHOT_CONFIG, PERFORMANCE_CONFIG, BATCH_CONFIG, PREFIX_CACHE_CONFIG, SINGLE_FLIGHT_CONFIG, PROMPT_BUDGET_CONFIG
+from models.batch_scheduler import BatchScheduler
+from models.prefix_cache import PrefixCache
 from utils.example_selector import select_relevant_examples
-from utils.query_optimizer import optimize_schema_context, validate_sql_syntax
+from utils.metrics import metrics, time_stage
+from utils.prompt_budget import PromptBudget, TokenCounter
+from utils.query_optimizer import get_schema_model, optimize_schema_context, validate_sql_syntax
 from utils.query_cache import query_cache
+from utils.single_flight import SingleFlight
+from utils.statement_scanner import SQLStatementScanner, truncate_to_statement
 import logging
 
-# Set up logging
-logging.basicConfig(level=getattr(logging, PERFORMANCE_CONFIG['logging_level']))
+# torch and transformers are imported inside the functions that use them, so importing
+# this module (e.g. to build the UI or read stats) doesn't pay for them
 logger = logging.getLogger(__name__)
 
 def load_model():
     """Load model and tokenizer with proper quantization config"""
+    import torch
+    from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
+    
     logger.info(f"Loading model: {MODEL_CONFIG['model_name']}...")
     try:
         tokenizer = AutoTokenizer.from_pretrained(MODEL_CONFIG['model_name'])
@@ -20,9 +31,14 @@ def load_model():
         if tokenizer.pad_token is None:
             tokenizer.pad_token = tokenizer.eos_token
         
+        # Decoder-only models must be left-padded for batched generation
+        tokenizer.padding_side = "left"
+        # If a prompt ever overflows, lose the start of the schema rather than the question
+        tokenizer.truncation_side = "left"
+        
         model_kwargs = {
             'device_map': MODEL_CONFIG['device'],
-            'torch_dtype': torch.float16,
+            'torch_dtype': getattr(torch, MODEL_CONFIG['torch_dtype']),
         }
         
         # Use new BitsAndBytesConfig instead of deprecated load_in_8bit
@@ -64,7 +80,7 @@ def load_model():
             # Fallback: load without quantization
             fallback_kwargs = {
                 'device_map': MODEL_CONFIG['device'],
-                'torch_dtype': torch.float16,
+                'torch_dtype': getattr(torch, MODEL_CONFIG['torch_dtype']),
             }
             model = AutoModelForCausalLM.from_pretrained(
                 MODEL_CONFIG['model_name'],
@@ -90,124 +106,601 @@ def get_model():
         model, tokenizer = load_model()
     return model, tokenizer
 
-# Rest of your functions with lazy loading...
-def generate_sql(question: str, schema: str, use_few_shot: bool = None) -> str:
-    """Generate SQL query from natural language question"""
+# Optional draft model for speculative (assisted) decoding
+draft_model = None
+_draft_model_failed = False
+
+def load_draft_model():
+    """Load the small draft model that proposes tokens for the main model to verify"""
+    import torch
+    from transformers import AutoModelForCausalLM
+    
+    logger.info(f"Loading draft model: {MODEL_CONFIG['draft_model_name']}...")
+    model = AutoModelForCausalLM.from_pretrained(
+        MODEL_CONFIG['draft_model_name'],
+        device_map=MODEL_CONFIG['device'],
+        torch_dtype=getattr(torch, MODEL_CONFIG['torch_dtype']),
+    )
+    model.generation_config.num_assistant_tokens = MODEL_CONFIG.get('draft_num_tokens', 5)
+    logger.info("Draft model loaded successfully")
+    return model
+
+def get_draft_model():
+    """Lazy loading of the draft model; None when speculative decoding is off or unavailable"""
+    global draft_model, _draft_model_failed
+    if not MODEL_CONFIG.get('draft_model_name') or _draft_model_failed:
+        return None
+    if draft_model is None:
+        try:
+            draft_model = load_draft_model()
+        except Exception as e:
+            # Fall back to standard decoding rather than failing every request
+            logger.warning(f"Draft model unavailable, using standard decoding: {e}")
+            _draft_model_failed = True
+            return None
+    return draft_model
+
+def get_tokenizer():
+    """The model's tokenizer, loaded on its own when the model isn't (e.g. with out-of-process workers)"""
+    if tokenizer is not None:
+        return tokenizer
+    global _budget_tokenizer
+    if _budget_tokenizer is None:
+        from transformers import AutoTokenizer
+        _budget_tokenizer = AutoTokenizer.from_pretrained(MODEL_CONFIG['model_name'])
+    return _budget_tokenizer
+
+_budget_tokenizer = None
+
+def count_tokens(text: str) -> int:
+    """Number of model tokens in a prompt fragment"""
+    return len(get_tokenizer()(text, add_special_tokens=False)["input_ids"])
+
+# Token counts for schema tables and examples are cached, so budgeting is cheap after the first request
+prompt_budget = PromptBudget(TokenCounter(count_tokens))
+
+class _ForwardCounter:
+    """Count a module's forward passes while attached"""
+    
+    def __init__(self, module):
+        self.calls = 0
+        self._handle = module.register_forward_hook(self._hook)
+    
+    def _hook(self, module, inputs, outputs):
+        self.calls += 1
+    
+    def remove(self):
+        self._handle.remove()
+
+def assisted_generate(model, assistant_model, input_ids, attention_mask, **generation_kwargs):
+    """Generate with draft-model speculation; returns (ids, tokens proposed, tokens accepted)
+
+    Each main-model forward verifies a run of draft tokens and adds one token of
+    its own, so accepted = new tokens - main forwards. Every draft forward
+    proposes one token.
+    """
+    import torch
+    
+    main_counter = _ForwardCounter(model)
+    draft_counter = _ForwardCounter(assistant_model)
     try:
-        # Get model and tokenizer (lazy loading)
-        model, tokenizer = get_model()
-        
-        # Use configuration default if not specified
-        if use_few_shot is None:
-            use_few_shot = FEW_SHOT_CONFIG['enabled']
-        
-        # Check cache first
-        cached_result = query_cache.get(question, schema)
-        if cached_result:
-            return cached_result
-        
-        # Optimize schema if enabled
+        with torch.no_grad():
+            generated_ids = model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                assistant_model=assistant_model,
+                **generation_kwargs
+            )
+    finally:
+        main_counter.remove()
+        draft_counter.remove()
+    new_tokens = generated_ids.shape[1] - input_ids.shape[1]
+    return generated_ids, draft_counter.calls, max(new_tokens - main_counter.calls, 0)
+
+class SQLStatementStoppingCriteria:
+    """Stop each sequence once its first SQL statement is complete
+
+    Implements transformers' StoppingCriteria call protocol without subclassing
+    it, so the class can be defined before transformers is imported.
+    """
+    
+    def __init__(self, tokenizer, prompt_length: int, batch_size: int):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.scanners = [SQLStatementScanner() for _ in range(batch_size)]
+        self.tokens_used = [0] * batch_size
+        self.done = [False] * batch_size
+        self._processed = prompt_length
+        # The first call comes right after prefill and the first sampled token,
+        # which splits the generate call into its prefill and decode phases
+        self.started_at = time.perf_counter()
+        self.first_call_at = None
+        self.last_call_at = None
+    
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+        self.last_call_at = time.perf_counter()
+        if self.first_call_at is None:
+            self.first_call_at = self.last_call_at
+        new_tokens = input_ids[:, self._processed:]
+        self._processed = input_ids.shape[1]
+        for i, scanner in enumerate(self.scanners):
+            if self.done[i]:
+                continue
+            self.tokens_used[i] += new_tokens.shape[1]
+            text = self.tokenizer.decode(new_tokens[i], skip_special_tokens=True)
+            if scanner.feed(text) is not None:
+                self.done[i] = True
+        return torch.tensor(self.done, dtype=torch.bool, device=input_ids.device)
+
+# Decode-length statistics for early stopping
+generation_stats = {
+    "requests": 0,
+    "tokens_generated": 0,
+    "tokens_saved": 0,
+    "early_stops": 0,
+    "speculative_requests": 0,
+    "draft_tokens_proposed": 0,
+    "draft_tokens_accepted": 0,
+}
+_generation_stats_lock = threading.Lock()
+
+def _record_generation(stopping_criteria: SQLStatementStoppingCriteria):
+    """Record how many decode steps each sequence needed versus the token cap"""
+    max_new_tokens = MODEL_CONFIG['max_new_tokens']
+    with _generation_stats_lock:
+        for tokens_used, stopped in zip(stopping_criteria.tokens_used, stopping_criteria.done):
+            tokens_saved = max(max_new_tokens - tokens_used, 0)
+            generation_stats["requests"] += 1
+            generation_stats["tokens_generated"] += tokens_used
+            generation_stats["tokens_saved"] += tokens_saved
+            if stopped:
+                generation_stats["early_stops"] += 1
+            logger.info(f"Generated {tokens_used} tokens, saved {tokens_saved} of {max_new_tokens}")
+    
+    if stopping_criteria.first_call_at is not None:
+        metrics.observe("prefill", stopping_criteria.first_call_at - stopping_criteria.started_at)
+        # Tokens after each sequence's first are the decode phase's output
+        decode_tokens = sum(max(tokens_used - 1, 0) for tokens_used in stopping_criteria.tokens_used)
+        metrics.observe_decode(decode_tokens, stopping_criteria.last_call_at - stopping_criteria.first_call_at)
+
+def _record_speculation(proposed: int, accepted: int):
+    """Record how many draft tokens the main model accepted"""
+    with _generation_stats_lock:
+        generation_stats["speculative_requests"] += 1
+        generation_stats["draft_tokens_proposed"] += proposed
+        generation_stats["draft_tokens_accepted"] += accepted
+    logger.info(f"Draft model proposed {proposed} tokens, {accepted} accepted")
+
+def build_prompt_parts(question: str, schema: str, use_few_shot: bool = None) -> Tuple[str, str]:
+    """Build the generation prompt as (shared prefix, question suffix)"""
+    # Use configuration default if not specified
+    if use_few_shot is None:
+        use_few_shot = FEW_SHOT_CONFIG['enabled']
+    
+    if PROMPT_BUDGET_CONFIG['enabled']:
+        return _build_budgeted_prompt_parts(question, schema, use_few_shot)
+    
+    # Optimize schema if enabled
+    with time_stage("schema_context"):
         if PERFORMANCE_CONFIG['schema_optimization']:
             optimized_schema = optimize_schema_context(schema, question)
         else:
             optimized_schema = schema
-        
-        # Create prompt based on configuration
-        if use_few_shot:
+    
+    # Create prompt based on configuration
+    if use_few_shot:
+        with time_stage("example_selection"):
             examples = select_relevant_examples(question)
-            prompt = create_few_shot_prompt(question, optimized_schema, examples)
-            logger.info(f"Using few-shot prompting with {len(examples)} examples")
-        else:
-            prompt = create_standard_prompt(question, optimized_schema)
-            logger.info("Using standard prompting")
-        
-        # Tokenize with proper handling
+        prefix = create_few_shot_prefix(optimized_schema, examples)
+        logger.info(f"Using few-shot prompting with {len(examples)} examples")
+    else:
+        prefix = create_standard_prefix(optimized_schema)
+        logger.info("Using standard prompting")
+    
+    return prefix, create_question_suffix(question)
+
+def _build_budgeted_prompt_parts(question: str, schema: str, use_few_shot: bool) -> Tuple[str, str]:
+    """Fit the most relevant tables, then examples, into the prompt token budget
+
+    The question suffix is always kept in full; tables and examples that don't
+    fit are left out rather than having the prompt truncated blindly. The
+    matched tables and the tables joining them are offered as one unit, and a
+    table on its own is only added next to one already kept, so the schema in
+    the prompt always stays joinable.
+    """
+    with time_stage("schema_context"):
+        schema_model = get_schema_model(schema)
+        ranked = schema_model.ranked_tables(question)
+        if PERFORMANCE_CONFIG['schema_optimization']:
+            relevant = schema_model.relevant_tables(question)
+            ranked = [name for name in ranked if name in relevant]
+    with time_stage("example_selection"):
+        examples = select_relevant_examples(question) if use_few_shot else []
+    
+    suffix = create_question_suffix(question)
+    template = create_few_shot_prefix("", []) if use_few_shot else create_standard_prefix("")
+    joined = [name for name in ranked if name in schema_model.join_tables(question)]
+    units = ([joined] if len(joined) > 1 else []) + [[name] for name in ranked]
+    components = ["\n\n".join(schema_model.tables[name].block for name in unit) for unit in units]
+    components += [format_example(example) for example in examples]
+    
+    def keep_if(kept: List[int], i: int) -> bool:
+        if i >= len(units):
+            return True
+        kept_tables = {name for j in kept if j < len(units) for name in units[j]}
+        if len(units[i]) > 1 or not kept_tables:
+            return True
+        name = units[i][0]
+        return name not in kept_tables and bool(schema_model.graph[name] & kept_tables)
+    
+    with time_stage("prompt_budget"):
+        kept, prompt_tokens = prompt_budget.fit([template, suffix], components, keep_if)
+    
+    tables = {name for i in kept if i < len(units) for name in units[i]}
+    kept_examples = [examples[i - len(units)] for i in kept if i >= len(units)]
+    schema_text = schema_model.render(tables)
+    logger.info(f"Prompt of ~{prompt_tokens} tokens: tables {sorted(tables)}, {len(kept_examples)}/{len(examples)} examples")
+    
+    if use_few_shot:
+        return create_few_shot_prefix(schema_text, kept_examples), suffix
+    return create_standard_prefix(schema_text), suffix
+
+def build_prompt(question: str, schema: str, use_few_shot: bool = None) -> str:
+    """Build the full generation prompt for a question"""
+    prefix, suffix = build_prompt_parts(question, schema, use_few_shot)
+    return prefix + suffix
+
+def _generation_kwargs(tokenizer, stopping_criteria: SQLStatementStoppingCriteria) -> dict:
+    """Sampling parameters shared by every generate call"""
+    from transformers import StoppingCriteriaList
+    return {
+        'stopping_criteria': StoppingCriteriaList([stopping_criteria]),
+        'max_new_tokens': MODEL_CONFIG['max_new_tokens'],
+        'temperature': MODEL_CONFIG['temperature'],
+        'top_p': MODEL_CONFIG['top_p'],
+        'do_sample': True,
+        'pad_token_id': tokenizer.pad_token_id,
+        'use_cache': MODEL_CONFIG.get('use_cache', True),
+    }
+
+def _compute_prefix_cache(prefix: str):
+    """Run the prefill for a prompt prefix and keep its key/value cache"""
+    import torch
+    model, tokenizer = get_model()
+    with time_stage("tokenization"):
+        prefix_ids = tokenizer(prefix, return_tensors="pt")["input_ids"].to(model.device)
+    if prefix_ids.shape[1] >= MODEL_CONFIG['max_input_length']:
+        # Nothing useful to cache; remember that so the next request skips straight to truncation
+        return prefix_ids, None
+    with torch.no_grad():
+        outputs = model(input_ids=prefix_ids, use_cache=True)
+    logger.info(f"Computed prefix cache for {prefix_ids.shape[1]} prompt tokens")
+    return prefix_ids, outputs.past_key_values
+
+def _generate_with_prefix_cache(prefix: str, suffix: str) -> str:
+    """Generate for one prompt, prefilling only the tokens after the cached prefix"""
+    import torch
+    model, tokenizer = get_model()
+    
+    prefix_ids, past_key_values = prefix_cache.get_or_compute(prefix, _compute_prefix_cache)
+    if past_key_values is None:
+        return _generate_texts([(prefix, suffix)], use_prefix_cache=False)[0]
+    
+    # Prefixes end on a line boundary, so tokenizing the two halves separately
+    # produces the same ids as tokenizing the whole prompt
+    with time_stage("tokenization"):
+        suffix_ids = tokenizer(suffix, return_tensors="pt", add_special_tokens=False)["input_ids"].to(model.device)
+    input_ids = torch.cat([prefix_ids, suffix_ids], dim=1)
+    
+    if input_ids.shape[1] > MODEL_CONFIG['max_input_length']:
+        # Too long to reuse the cache untruncated; fall back to the plain path
+        return _generate_texts([(prefix, suffix)], use_prefix_cache=False)[0]
+    
+    stopping_criteria = SQLStatementStoppingCriteria(tokenizer, input_ids.shape[1], 1)
+    with torch.no_grad():
+        generated_ids = model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            past_key_values=past_key_values,
+            **_generation_kwargs(tokenizer, stopping_criteria)
+        )
+    _record_generation(stopping_criteria)
+    
+    return tokenizer.decode(generated_ids[0][input_ids.shape[1]:], skip_special_tokens=True)
+
+def _generate_speculative(prefix: str, suffix: str, assistant_model) -> str:
+    """Generate for one prompt with a draft model proposing tokens"""
+    model, tokenizer = get_model()
+    with time_stage("tokenization"):
+        inputs = tokenizer(
+            prefix + suffix,
+            return_tensors="pt",
+            truncation=True,
+            max_length=MODEL_CONFIG['max_input_length']
+        )
+        inputs = {k: v.to(model.device) for k, v in inputs.items()}
+    
+    prompt_length = inputs["input_ids"].shape[1]
+    stopping_criteria = SQLStatementStoppingCriteria(tokenizer, prompt_length, 1)
+    generated_ids, proposed, accepted = assisted_generate(
+        model, assistant_model, inputs["input_ids"], inputs["attention_mask"],
+        **_generation_kwargs(tokenizer, stopping_criteria)
+    )
+    _record_generation(stopping_criteria)
+    _record_speculation(proposed, accepted)
+    
+    return tokenizer.decode(generated_ids[0][prompt_length:], skip_special_tokens=True)
+
+def _generate_texts(prompt_parts: List[Tuple[str, str]], use_prefix_cache: bool = None) -> List[str]:
+    """Run one padded, batched generate call and decode the new text for each prompt"""
+    import torch
+    if use_prefix_cache is None:
+        use_prefix_cache = PREFIX_CACHE_CONFIG['enabled']
+    
+    # Assisted generation handles one sequence at a time; it replaces the prefix-cache path
+    # because the draft model would need a matching cache of its own
+    if len(prompt_parts) == 1:
+        assistant_model = get_draft_model()
+        if assistant_model is not None:
+            prefix, suffix = prompt_parts[0]
+            return [_generate_speculative(prefix, suffix, assistant_model)]
+    
+    # A lone request can reuse its prefix's KV cache; mixed-prefix batches are prefilled in full
+    if use_prefix_cache and len(prompt_parts) == 1:
+        prefix, suffix = prompt_parts[0]
+        return [_generate_with_prefix_cache(prefix, suffix)]
+    
+    model, tokenizer = get_model()
+    prompts = [prefix + suffix for prefix, suffix in prompt_parts]
+    
+    # Tokenize with proper handling; prompts are left-padded so generation lines up
+    with time_stage("tokenization"):
         inputs = tokenizer(
-            prompt, 
+            prompts, 
             return_tensors="pt", 
+            padding=True,
             truncation=True, 
-            max_length=2048
+            max_length=MODEL_CONFIG['max_input_length']
         )
         inputs = {k: v.to(model.device) for k, v in inputs.items()}
-        
-        logger.info(f"Generating SQL for question: {question}")
-        
-        # Generate with optimized parameters
-        with torch.no_grad():
-            generated_ids = model.generate(
-                input_ids=inputs["input_ids"],
-                attention_mask=inputs["attention_mask"],
-                max_new_tokens=MODEL_CONFIG['max_new_tokens'],
-                temperature=MODEL_CONFIG['temperature'],
-                top_p=MODEL_CONFIG['top_p'],
-                do_sample=True,
-                pad_token_id=tokenizer.eos_token_id,
-                use_cache=MODEL_CONFIG.get('use_cache', True)
-            )
-        
-        # Decode only the new tokens
-        new_tokens = generated_ids[0][inputs["input_ids"].shape[1]:]
-        generated_text = tokenizer.decode(new_tokens, skip_special_tokens=True)
-        
-        # Clean up the generated SQL
-        sql_query = "SELECT" + generated_text.split("SELECT")[-1] if "SELECT" in generated_text else "SELECT " + generated_text
-        
-        # Validate SQL if enabled
-        if PERFORMANCE_CONFIG['query_validation']:
+    
+    # Generate with optimized parameters, stopping each sequence at the end of its statement
+    prompt_length = inputs["input_ids"].shape[1]
+    stopping_criteria = SQLStatementStoppingCriteria(tokenizer, prompt_length, len(prompts))
+    with torch.no_grad():
+        generated_ids = model.generate(
+            input_ids=inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            **_generation_kwargs(tokenizer, stopping_criteria)
+        )
+    _record_generation(stopping_criteria)
+    
+    # Decode only the new tokens
+    return tokenizer.batch_decode(generated_ids[:, prompt_length:], skip_special_tokens=True)
+
+# Shared schema/examples prefixes keep their prefill here between requests
+prefix_cache = PrefixCache()
+
+# Concurrent generate_sql calls share forward passes through this scheduler
+batch_scheduler = BatchScheduler(_generate_texts)
+
+# Identical questions arriving together share one generation
+generation_flight = SingleFlight("generation")
+
+# Where generation runs: None means in this process; otherwise any object with
+# submit(prompt_parts) -> Future, such as an out-of-process worker pool
+_generation_backend = None
+
+def set_generation_backend(backend):
+    """Route generation through another executor, or back in-process with None"""
+    global _generation_backend
+    _generation_backend = backend
+    logger.info(f"Generation backend: {type(backend).__name__ if backend is not None else 'in-process'}")
+
+def get_generation_backend():
+    """The executor generation is routed through, or None when it runs in-process"""
+    return _generation_backend
+
+def _postprocess_sql(question: str, schema: str, generated_text: str) -> str:
+    """Clean up and validate generated SQL, caching it only when valid"""
+    # Keep only the first statement; the prompt already ends with SELECT
+    statement = truncate_to_statement(generated_text).strip()
+    sql_query = statement if re.match(r'SELECT\b', statement, re.IGNORECASE) else "SELECT " + statement
+    
+    # Validate SQL if enabled
+    if PERFORMANCE_CONFIG['query_validation']:
+        with time_stage("validation"):
             is_valid, validated_sql = validate_sql_syntax(sql_query)
-            if not is_valid:
-                logger.warning(f"Generated invalid SQL: {validated_sql}")
-                error_sql = f"-- Error: {validated_sql}\n{sql_query}"
-                query_cache.set(question, schema, error_sql)
-                return error_sql
-            sql_query = validated_sql
+        if not is_valid:
+            logger.warning(f"Generated invalid SQL: {validated_sql}")
+            # Not cached: a failed generation should be retried, not replayed
+            return f"-- Error: {validated_sql}\n{sql_query}"
+        sql_query = validated_sql
+    
+    # Cache the result
+    query_cache.set(question, schema, sql_query)
+    return sql_query
+
+def _generate_uncached(question: str, schema: str, use_few_shot: bool = None) -> str:
+    """Run the model for a question that missed the cache"""
+    prompt_parts = build_prompt_parts(question, schema, use_few_shot)
+    
+    logger.info(f"Generating SQL for question: {question}")
+    
+    # Includes any wait for a batch slot or worker, unlike the model-side stages
+    with time_stage("generation"):
+        if _generation_backend is not None:
+            generated_text = _generation_backend.submit(prompt_parts).result()
+        elif BATCH_CONFIG['enabled']:
+            generated_text = batch_scheduler.submit(prompt_parts).result()
+        else:
+            generated_text = _generate_texts([prompt_parts])[0]
+    
+    sql_query = _postprocess_sql(question, schema, generated_text)
+    
+    logger.info(f"Successfully generated SQL")
+    return sql_query
+
+def generate_sql(question: str, schema: str, use_few_shot: bool = None) -> str:
+    """Generate SQL query from natural language question"""
+    try:
+        # Check cache first
+        with time_stage("cache_lookup"):
+            cached_result = query_cache.get(question, schema)
+        if cached_result:
+            return cached_result
         
-        # Cache the result
-        query_cache.set(question, schema, sql_query)
+        if not SINGLE_FLIGHT_CONFIG['generation']:
+            return _generate_uncached(question, schema, use_few_shot)
         
-        logger.info(f"Successfully generated SQL")
-        return sql_query
+        # Concurrent misses for the same question wait on the first one's generation
+        key = (query_cache.cache_key(question, schema), use_few_shot)
+        return generation_flight.do(key, lambda: _generate_uncached(question, schema, use_few_shot))
         
     except Exception as e:
         logger.error(f"Error in SQL generation: {str(e)}")
         error_msg = f"-- Error generating SQL: {str(e)}"
         return error_msg
 
+def generate_sql_batch(questions: List[str], schema: str, use_few_shot: bool = None) -> List[str]:
+    """Generate SQL for many questions, sharing batched forward passes"""
+    results: List[Optional[str]] = [None] * len(questions)
+    pending = []
+    
+    for i, question in enumerate(questions):
+        cached_result = query_cache.get(question, schema)
+        if cached_result:
+            results[i] = cached_result
+        else:
+            pending.append(i)
+    
+    logger.info(f"Generating SQL for {len(pending)} of {len(questions)} questions in batches")
+    
+    if _generation_backend is not None:
+        # Hand everything to the backend at once and let it spread the load
+        futures = [(i, _generation_backend.submit(build_prompt_parts(questions[i], schema, use_few_shot)))
+                   for i in pending]
+        for i, future in futures:
+            try:
+                results[i] = _postprocess_sql(questions[i], schema, future.result())
+            except Exception as e:
+                logger.error(f"Error in batched SQL generation: {str(e)}")
+                results[i] = f"-- Error generating SQL: {str(e)}"
+        return results
+    
+    max_batch_size = BATCH_CONFIG['max_batch_size']
+    for start in range(0, len(pending), max_batch_size):
+        chunk = pending[start:start + max_batch_size]
+        try:
+            prompt_parts = [build_prompt_parts(questions[i], schema, use_few_shot) for i in chunk]
+            generated_texts = _generate_texts(prompt_parts)
+            for i, generated_text in zip(chunk, generated_texts):
+                results[i] = _postprocess_sql(questions[i], schema, generated_text)
+        except Exception as e:
+            logger.error(f"Error in batched SQL generation: {str(e)}")
+            for i in chunk:
+                results[i] = f"-- Error generating SQL: {str(e)}"
+    
+    return results
+
 # Add the missing helper functions
-def create_few_shot_prompt(question: str, schema: str, examples: list) -> str:
-    """Create a prompt with few-shot examples"""
-    prompt = f"{schema}\n\n"
-    prompt += "-- Here are some example questions and their corresponding SQL queries:\n\n"
+def create_few_shot_prefix(schema: str, examples: list) -> str:
+    """Create the shared prompt prefix with schema and few-shot examples"""
+    prefix = f"{schema}\n\n"
+    prefix += "-- Here are some example questions and their corresponding SQL queries:\n\n"
     
     for example in examples:
-        prompt += f"-- Question: {example['question']}\n"
-        prompt += f"{example['sql']}\n\n"
-    
-    prompt += f"-- Using valid MySQL, answer the following question for the tables provided above.\n"
-    prompt += f"-- Question: {question}\n"
-    prompt += "SELECT"
+        prefix += format_example(example)
     
-    return prompt
+    prefix += f"-- Using valid MySQL, answer the following question for the tables provided above.\n"
+    return prefix
+
+def format_example(example: dict) -> str:
+    """Render one few-shot example as it appears in the prompt"""
+    return f"-- Question: {example['question']}\n{example['sql']}\n\n"
+
+def create_standard_prefix(schema: str) -> str:
+    """Create the shared prompt prefix with only the schema"""
+    return f"""{schema}
+
+-- Using valid MySQL, answer the following question for the tables provided above.
+"""
+
+def create_question_suffix(question: str) -> str:
+    """Create the per-request part of the prompt"""
+    return f"-- Question: {question}\nSELECT"
+
+def create_few_shot_prompt(question: str, schema: str, examples: list) -> str:
+    """Create a prompt with few-shot examples"""
+    return create_few_shot_prefix(schema, examples) + create_question_suffix(question)
 
 def create_standard_prompt(question: str, schema: str) -> str:
     """Create a standard prompt without examples"""
-    prompt = f"""{schema}
+    return create_standard_prefix(schema) + create_question_suffix(question)
 
--- Using valid MySQL, answer the following question for the tables provided above.
--- Question: {question}
-SELECT"""
-    return prompt
+def warmup_model(schema: str = None, max_new_tokens: int = 8):
+    """Load the model(s) and run one short generate so the first request doesn't pay for it"""
+    import torch
+    
+    model, tokenizer = get_model()
+    assistant_model = get_draft_model()
+    
+    prompt = create_standard_prefix(schema or "CREATE TABLE t (\n  id int\n);") + create_question_suffix("How many rows are there?")
+    inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=MODEL_CONFIG['max_input_length'])
+    inputs = {k: v.to(model.device) for k, v in inputs.items()}
+    with torch.no_grad():
+        model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False, pad_token_id=tokenizer.pad_token_id)
+        if assistant_model is not None:
+            assistant_model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False,
+                                     pad_token_id=tokenizer.pad_token_id)
+    logger.info(f"Model warmed up on a {inputs['input_ids'].shape[1]}-token prompt")
 
 def get_cache_stats() -> dict:
     """Get cache statistics"""
-    return {
-        "cache_size": query_cache.size(),
-        "max_size": query_cache.max_size,
-        "cache_enabled": FEW_SHOT_CONFIG['cache_enabled']
-    }
+    stats = query_cache.get_stats()
+    stats["cache_enabled"] = FEW_SHOT_CONFIG['cache_enabled']
+    return stats
+
+def get_batch_stats() -> dict:
+    """Get micro-batching statistics"""
+    stats = batch_scheduler.get_stats()
+    stats["batching_enabled"] = BATCH_CONFIG['enabled']
+    return stats
+
+def get_generation_stats() -> dict:
+    """Get decode-length statistics, including tokens saved by early stopping"""
+    with _generation_stats_lock:
+        stats = dict(generation_stats)
+    requests = stats["requests"]
+    stats["avg_tokens_generated"] = (stats["tokens_generated"] / requests) if requests else 0.0
+    stats["avg_tokens_saved"] = (stats["tokens_saved"] / requests) if requests else 0.0
+    proposed = stats["draft_tokens_proposed"]
+    stats["draft_acceptance_rate"] = (stats["draft_tokens_accepted"] / proposed) if proposed else 0.0
+    stats["speculative_decoding_enabled"] = bool(MODEL_CONFIG.get('draft_model_name')) and not _draft_model_failed
+    return stats
+
+def get_prefix_cache_stats() -> dict:
+    """Get prompt-prefix KV cache statistics"""
+    stats = prefix_cache.get_stats()
+    stats["prefix_cache_enabled"] = PREFIX_CACHE_CONFIG['enabled']
+    return stats
+
+def get_coalescing_stats() -> dict:
+    """Get single-flight statistics; each coalesced call is a generation saved"""
+    stats = generation_flight.get_stats()
+    stats["generations_saved"] = stats["coalesced"]
+    return stats
+
+def get_prompt_budget_stats() -> dict:
+    """Get prompt size and token-count cache statistics"""
+    stats = prompt_budget.get_stats()
+    stats["prompt_budget_enabled"] = PROMPT_BUDGET_CONFIG['enabled']
+    return stats
 
 def clear_cache():
     """Clear the query cache"""
     query_cache.clear()
+    prefix_cache.clear()
 
 
@@ -0,0 +1,573 @@
+import os
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future
+from functools import partial
+from multiprocessing.connection import Client, Listener, wait
+from typing import Callable, Dict, List, Optional
+from config.config import BATCH_CONFIG, PERFORMANCE_CONFIG, WORKER_POOL_CONFIG
+from models.sql_generator import set_generation_backend
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class WorkerCrashedError(Exception):
+    """Raised for a request whose worker process died or hung on every attempt"""
+
+def inference_worker_main(worker_key, request_queue, result_connection, device: Optional[str] = None):
+    """Worker process entry point: load and warm up a model, then answer generation requests
+
+    Requests go through this process's own batch scheduler, so each worker still
+    batches the requests it is given. The worker exits if its parent goes away.
+    """
+    if device is not None:
+        # Must happen before torch is first imported in this process
+        os.environ['CUDA_VISIBLE_DEVICES'] = device
+    logging.basicConfig(
+        level=getattr(logging, PERFORMANCE_CONFIG['logging_level']),
+        format=f'%(asctime)s - worker {worker_key[0]} - %(name)s - %(levelname)s - %(message)s'
+    )
+    from models.sql_generator import _generate_texts, batch_scheduler, warmup_model
+
+    # Replies come from batch-scheduler callbacks as well as this thread
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            result_connection.send(message)
+
+    try:
+        warmup_model()
+    except Exception as e:
+        send(("failed", worker_key, str(e)))
+        return
+    send(("ready", worker_key, os.getpid()))
+
+    # Model-side stage timings (tokenization, prefill, decode) are shipped to the parent
+    metrics.start_forwarding()
+    metrics.drain_forwarded()
+
+    def reply(request_id, future):
+        error = future.exception()
+        if error is None:
+            send(("result", worker_key, request_id, True, future.result()))
+        else:
+            send(("result", worker_key, request_id, False, str(error)))
+        samples = metrics.drain_forwarded()
+        if samples:
+            send(("metrics", worker_key, samples))
+
+    parent_pid = os.getppid()
+    while True:
+        try:
+            message = request_queue.get(timeout=1.0)
+        except queue.Empty:
+            if os.getppid() != parent_pid:
+                return
+            continue
+        if message is None:
+            return
+
+        request_id, prompt_parts = message
+        if BATCH_CONFIG['enabled']:
+            batch_scheduler.submit(prompt_parts).add_done_callback(partial(reply, request_id))
+            continue
+        future = Future()
+        try:
+            future.set_result(_generate_texts([prompt_parts])[0])
+        except Exception as e:
+            future.set_exception(e)
+        reply(request_id, future)
+
+class _WorkerHandle:
+    """Parent-side bookkeeping for one worker slot across restarts"""
+
+    def __init__(self, slot: int, device: Optional[str]):
+        self.slot = slot
+        self.device = device
+        self.incarnation = 0
+        self.process = None
+        self.request_queue = None
+        self.result_connection = None
+        self.state = "stopped"  # starting, ready, dead, gave up, stopped
+        self.pid = None
+        self.error = None
+        self.in_flight = set()
+        self.completed = 0
+        self.restarts = 0
+        self.restart_at = 0.0
+        self.ready_at = 0.0
+
+    @property
+    def key(self) -> tuple:
+        return (self.slot, self.incarnation)
+
+class _PendingRequest:
+    __slots__ = ("future", "prompt_parts", "attempts", "dispatched_at")
+
+    def __init__(self, future: Future, prompt_parts):
+        self.future = future
+        self.prompt_parts = prompt_parts
+        self.attempts = 0
+        self.dispatched_at = 0.0
+
+class InferenceWorkerPool:
+    """N worker processes, each holding a model, with load-aware dispatch and restarts
+
+    submit() sends a prompt to the ready worker with the fewest requests in flight.
+    A monitor thread restarts workers that die and re-dispatches their in-flight
+    requests (up to max_attempts per request). A worker that leaves a request
+    unanswered for request_timeout seconds after it was ready counts as hung:
+    it is killed and handled the same way.
+    """
+
+    def __init__(self, num_workers: int = None, worker_main: Callable = inference_worker_main,
+                 max_restarts: int = None, restart_backoff: float = None, max_attempts: int = None,
+                 health_check_interval: float = None, devices: List[str] = None, request_timeout: float = None):
+        self.num_workers = num_workers or WORKER_POOL_CONFIG['num_workers']
+        self.worker_main = worker_main
+        self.max_restarts = max_restarts if max_restarts is not None else WORKER_POOL_CONFIG['max_restarts']
+        self.restart_backoff = (restart_backoff if restart_backoff is not None
+                                else WORKER_POOL_CONFIG['restart_backoff_seconds'])
+        self.max_attempts = max_attempts or WORKER_POOL_CONFIG['max_attempts']
+        self.health_check_interval = (health_check_interval if health_check_interval is not None
+                                      else WORKER_POOL_CONFIG['health_check_interval_seconds'])
+        self.request_timeout = (request_timeout if request_timeout is not None
+                                else WORKER_POOL_CONFIG.get('request_timeout_seconds'))
+        devices = devices if devices is not None else WORKER_POOL_CONFIG.get('devices')
+
+        # spawn, not fork: CUDA cannot be re-initialised in a forked child
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = [_WorkerHandle(slot, devices[slot % len(devices)] if devices else None)
+                         for slot in range(self.num_workers)]
+        self._requests: Dict[int, _PendingRequest] = {}
+        self._backlog = deque()
+        self._ids = itertools.count()
+        self._condition = threading.Condition()
+        self._running = False
+        self._threads: List[threading.Thread] = []
+
+        # Metrics
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._redispatched = 0
+        self._crashes = 0
+        self._hangs = 0
+
+    def start(self):
+        """Spawn the workers and the result-collector and monitor threads"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            for worker in self._workers:
+                self._spawn_locked(worker)
+
+        for target, name in ((self._collect_results, "inference-results"), (self._monitor, "inference-monitor")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.num_workers} inference worker processes")
+
+    def _spawn_locked(self, worker: _WorkerHandle):
+        """Start a new process for a worker slot; caller holds the lock"""
+        worker.incarnation += 1
+        # A pipe per worker rather than one shared queue: a worker killed mid-write
+        # would otherwise leave the shared queue's lock held and silence every worker
+        reader, writer = self._context.Pipe(duplex=False)
+        worker.request_queue = self._context.Queue()
+        worker.result_connection = reader
+        worker.process = self._context.Process(
+            target=self.worker_main,
+            args=(worker.key, worker.request_queue, writer, worker.device),
+            name=f"inference-worker-{worker.slot}",
+            daemon=True,
+        )
+        worker.process.start()
+        writer.close()
+        worker.pid = worker.process.pid
+        worker.state = "starting"
+        worker.error = None
+
+    def _pick_worker_locked(self) -> Optional[_WorkerHandle]:
+        """Least-loaded worker, preferring ready ones over ones still loading; caller holds the lock"""
+        candidates = [worker for worker in self._workers if worker.state in ("ready", "starting")]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda worker: (worker.state != "ready", len(worker.in_flight), worker.slot))
+
+    def _dispatch_locked(self, request_id: int):
+        """Send a request to a worker, or hold it until one is available; caller holds the lock"""
+        worker = self._pick_worker_locked()
+        if worker is None:
+            self._backlog.append(request_id)
+            return
+        request = self._requests[request_id]
+        request.attempts += 1
+        request.dispatched_at = time.monotonic()
+        worker.in_flight.add(request_id)
+        worker.request_queue.put((request_id, request.prompt_parts))
+
+    def submit(self, prompt_parts) -> Future:
+        """Queue a (prefix, suffix) prompt for generation and return a future for its text"""
+        future = Future()
+        with self._condition:
+            if not self._running:
+                raise RuntimeError("Inference worker pool is not running")
+            request_id = next(self._ids)
+            self._requests[request_id] = _PendingRequest(future, prompt_parts)
+            self._submitted += 1
+            self._dispatch_locked(request_id)
+        return future
+
+    def _collect_results(self):
+        """Resolve futures from worker replies and track worker readiness"""
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                connections = {worker.result_connection: worker for worker in self._workers
+                               if worker.result_connection is not None}
+            for connection in wait(list(connections), timeout=0.1):
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    # The worker exited; the monitor handles its requests and restart
+                    with self._condition:
+                        worker = connections[connection]
+                        if worker.result_connection is connection:
+                            worker.result_connection = None
+                    connection.close()
+                    continue
+                self._handle_message(message)
+
+    def _handle_message(self, message: tuple):
+        """Apply one worker message: readiness, startup failure, a generation result or timings"""
+        kind, key = message[0], message[1]
+        if kind == "metrics":
+            metrics.merge(message[2])
+            return
+        request = None
+        with self._condition:
+            worker = self._workers[key[0]]
+            current = worker.incarnation == key[1]
+            if kind == "ready" and current:
+                worker.state = "ready"
+                worker.ready_at = time.monotonic()
+                logger.info(f"Inference worker {worker.slot} ready (pid {message[2]})")
+                while self._backlog:
+                    self._dispatch_locked(self._backlog.popleft())
+                self._condition.notify_all()
+            elif kind == "failed" and current:
+                worker.error = message[2]
+                logger.error(f"Inference worker {worker.slot} failed to start: {message[2]}")
+            elif kind == "result":
+                request_id, ok, payload = message[2:]
+                worker.in_flight.discard(request_id)
+                worker.completed += 1
+                request = self._requests.pop(request_id, None)
+                if request is not None:
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+
+        # A re-dispatched request may be answered twice; the second reply is dropped
+        if request is not None:
+            if ok:
+                request.future.set_result(payload)
+            else:
+                request.future.set_exception(RuntimeError(payload))
+
+    def _monitor(self):
+        """Detect dead or hung workers, re-dispatch their requests and restart them"""
+        while True:
+            time.sleep(self.health_check_interval)
+            failed: List[_PendingRequest] = []
+            with self._condition:
+                if not self._running:
+                    return
+                now = time.monotonic()
+                for worker in self._workers:
+                    if worker.state in ("starting", "ready") and not worker.process.is_alive():
+                        failed.extend(self._handle_crash_locked(worker, now))
+                    elif worker.state == "ready" and self._is_hung_locked(worker, now):
+                        self._hangs += 1
+                        logger.error(f"Inference worker {worker.slot} (pid {worker.pid}) left a request unanswered "
+                                     f"for over {self.request_timeout}s; killing it")
+                        worker.process.kill()
+                        failed.extend(self._handle_crash_locked(worker, now))
+
+                for worker in self._workers:
+                    if worker.state == "dead" and now >= worker.restart_at:
+                        if worker.restarts >= self.max_restarts:
+                            worker.state = "gave up"
+                            logger.error(f"Inference worker {worker.slot} exceeded {self.max_restarts} restarts; not restarting")
+                            continue
+                        worker.restarts += 1
+                        logger.warning(f"Restarting inference worker {worker.slot} (restart {worker.restarts})")
+                        self._spawn_locked(worker)
+
+                # With every worker given up, queued requests would wait forever
+                if all(worker.state == "gave up" for worker in self._workers):
+                    while self._backlog:
+                        request = self._requests.pop(self._backlog.popleft(), None)
+                        if request is not None:
+                            self._failed += 1
+                            failed.append(request)
+                    self._condition.notify_all()
+
+            for request in failed:
+                request.future.set_exception(WorkerCrashedError("Inference worker died or hung while generating"))
+
+    def _is_hung_locked(self, worker: _WorkerHandle, now: float) -> bool:
+        """Whether a ready worker has held a request past the request timeout; caller holds the lock"""
+        if not self.request_timeout:
+            return False
+        for request_id in worker.in_flight:
+            request = self._requests.get(request_id)
+            # Time spent waiting for the model to load does not count
+            if request is not None and now - max(request.dispatched_at, worker.ready_at) > self.request_timeout:
+                return True
+        return False
+
+    def _handle_crash_locked(self, worker: _WorkerHandle, now: float) -> List[_PendingRequest]:
+        """Mark a worker dead and re-dispatch or fail its requests; caller holds the lock"""
+        self._crashes += 1
+        if not worker.process.is_alive():
+            logger.error(f"Inference worker {worker.slot} (pid {worker.pid}) died with exit code {worker.process.exitcode}")
+        worker.state = "dead"
+        worker.restart_at = now + self.restart_backoff
+        orphaned, worker.in_flight = worker.in_flight, set()
+
+        failed = []
+        for request_id in sorted(orphaned):
+            request = self._requests.get(request_id)
+            if request is None:
+                continue
+            if request.attempts < self.max_attempts:
+                self._redispatched += 1
+                self._dispatch_locked(request_id)
+            else:
+                del self._requests[request_id]
+                self._failed += 1
+                failed.append(request)
+        return failed
+
+    def wait_until_ready(self, timeout: float = None) -> bool:
+        """Block until at least one worker is ready; False if none can become ready"""
+        timeout = timeout if timeout is not None else WORKER_POOL_CONFIG['ready_timeout_seconds']
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not any(worker.state == "ready" for worker in self._workers):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or all(worker.state == "gave up" for worker in self._workers):
+                    return False
+                self._condition.wait(min(remaining, 1.0))
+            return True
+
+    def shutdown(self, timeout: float = 5.0):
+        """Stop every worker and fail requests still outstanding"""
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            workers = list(self._workers)
+            pending = list(self._requests.values())
+            self._requests.clear()
+            self._backlog.clear()
+
+        for worker in workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.request_queue.put(None)
+        for worker in workers:
+            if worker.process is not None:
+                worker.process.join(timeout)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+            worker.state = "stopped"
+
+        for request in pending:
+            request.future.set_exception(RuntimeError("Inference worker pool shut down"))
+        logger.info("Inference worker pool shut down")
+
+    def get_stats(self) -> Dict:
+        """Get per-worker load and state, plus pool-wide request counts"""
+        with self._condition:
+            return {
+                "workers": [{
+                    "slot": worker.slot,
+                    "pid": worker.pid,
+                    "state": worker.state,
+                    "in_flight": len(worker.in_flight),
+                    "completed": worker.completed,
+                    "restarts": worker.restarts,
+                } for worker in self._workers],
+                "ready_workers": sum(worker.state == "ready" for worker in self._workers),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "in_flight": len(self._requests),
+                "backlog": len(self._backlog),
+                "redispatched": self._redispatched,
+                "crashes": self._crashes,
+                "hangs": self._hangs,
+            }
+
+class InferenceRPCServer:
+    """Serve a generation backend over a Unix socket so other processes share its capacity
+
+    Requests are unpickled, so clients must authenticate with authkey and the
+    socket is only accessible to its owner.
+    """
+
+    def __init__(self, backend, path: str, authkey: bytes = None):
+        self.backend = backend
+        self.path = path
+        self.authkey = authkey
+        self._listener = None
+
+    def start(self):
+        """Listen on the socket and serve each client connection on its own thread"""
+        if not self.authkey:
+            raise ValueError("An authkey is required to serve inference over RPC")
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._listener = Listener(self.path, family="AF_UNIX", authkey=self.authkey)
+        os.chmod(self.path, 0o600)
+        threading.Thread(target=self._accept, name="inference-rpc", daemon=True).start()
+        logger.info(f"Serving inference over {self.path}")
+
+    def _accept(self):
+        """Accept client connections until the listener is closed"""
+        while True:
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                return
+            except Exception as e:
+                logger.warning(f"Rejected inference RPC client: {e}")
+                continue
+            threading.Thread(target=self._serve, args=(connection,), name="inference-rpc-client", daemon=True).start()
+
+    def _serve(self, connection):
+        """Forward a client's requests to the backend and send replies as they complete"""
+        send_lock = threading.Lock()
+
+        def reply(request_id, future):
+            error = future.exception()
+            message = (request_id, True, future.result()) if error is None else (request_id, False, str(error))
+            with send_lock:
+                try:
+                    connection.send(message)
+                except (OSError, EOFError):
+                    pass
+
+        try:
+            while True:
+                request_id, prompt_parts = connection.recv()
+                try:
+                    self.backend.submit(prompt_parts).add_done_callback(partial(reply, request_id))
+                except Exception as e:
+                    with send_lock:
+                        connection.send((request_id, False, str(e)))
+        except (EOFError, OSError):
+            pass
+        finally:
+            connection.close()
+
+    def close(self):
+        """Stop accepting clients and remove the socket"""
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+class RemoteGenerationBackend:
+    """Client of an InferenceRPCServer, usable wherever a worker pool is
+
+    Batch jobs can call set_generation_backend(RemoteGenerationBackend(path))
+    to share the serving process's workers instead of loading their own model.
+    """
+
+    def __init__(self, path: str = None, authkey: bytes = None):
+        path = path or WORKER_POOL_CONFIG['socket_path']
+        authkey = authkey if authkey is not None else WORKER_POOL_CONFIG.get('rpc_authkey')
+        self._connection = Client(path, family="AF_UNIX", authkey=authkey)
+        self._pending: Dict[int, Future] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        threading.Thread(target=self._read_replies, name="inference-rpc-reader", daemon=True).start()
+
+    def submit(self, prompt_parts) -> Future:
+        """Send a (prefix, suffix) prompt to the server and return a future for its text"""
+        future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+            try:
+                self._connection.send((request_id, prompt_parts))
+            except Exception:
+                # Nothing will ever answer it
+                del self._pending[request_id]
+                raise
+        return future
+
+    def _read_replies(self):
+        """Resolve futures as replies arrive; fail them all if the server goes away"""
+        try:
+            while True:
+                request_id, ok, payload = self._connection.recv()
+                with self._lock:
+                    future = self._pending.pop(request_id, None)
+                if future is None:
+                    continue
+                if ok:
+                    future.set_result(payload)
+                else:
+                    future.set_exception(RuntimeError(payload))
+        except (EOFError, OSError):
+            with self._lock:
+                pending, self._pending = list(self._pending.values()), {}
+            for future in pending:
+                future.set_exception(ConnectionError("Inference server connection closed"))
+
+    def close(self):
+        """Close the connection to the server"""
+        self._connection.close()
+
+# Process-wide pool and RPC server, created by start_inference_workers
+worker_pool: Optional[InferenceWorkerPool] = None
+rpc_server: Optional[InferenceRPCServer] = None
+
+def start_inference_workers(wait: bool = True) -> InferenceWorkerPool:
+    """Start the worker pool, route generate_sql through it, and serve it over RPC if configured"""
+    global worker_pool, rpc_server
+    if worker_pool is None:
+        worker_pool = InferenceWorkerPool()
+        worker_pool.start()
+        if WORKER_POOL_CONFIG['socket_path'] and not WORKER_POOL_CONFIG.get('rpc_authkey'):
+            logger.error("Not serving inference over RPC: set SQL_ASSISTANT_RPC_KEY to enable socket_path")
+        elif WORKER_POOL_CONFIG['socket_path']:
+            rpc_server = InferenceRPCServer(worker_pool, WORKER_POOL_CONFIG['socket_path'],
+                                            WORKER_POOL_CONFIG.get('rpc_authkey'))
+            rpc_server.start()
+
+    if wait and not worker_pool.wait_until_ready():
+        raise RuntimeError("No inference worker became ready")
+    set_generation_backend(worker_pool)
+    return worker_pool
+
+def get_worker_pool_stats() -> Dict:
+    """Get worker pool statistics, or an empty summary when workers are not in use"""
+    if worker_pool is None:
+        return {"workers": [], "ready_workers": 0, "submitted": 0, "completed": 0, "failed": 0,
+                "in_flight": 0, "backlog": 0, "redispatched": 0, "crashes": 0, "hangs": 0}
+    return worker_pool.get_stats()
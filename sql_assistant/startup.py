@@ -0,0 +1,112 @@
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from config.config import STARTUP_CONFIG, WORKER_POOL_CONFIG
+from models.sql_generator import get_model, warmup_model
+from models.worker_pool import start_inference_workers
+from utils.schema_extractor import get_database_schema
+
+logger = logging.getLogger(__name__)
+
+class StartupManager:
+    """Extract the schema and load and warm up the model in the background, tracking readiness"""
+
+    def __init__(self):
+        self.state = "not started"
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self._ready = threading.Event()
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at: Optional[float] = None
+
+    def start(self):
+        """Begin startup in a background thread; safe to call more than once"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._started_at = time.monotonic()
+            self.state = "starting"
+            self._thread = threading.Thread(target=self._run, name="startup", daemon=True)
+            self._thread.start()
+
+    def _timed(self, stage: str, fn: Callable, *args):
+        """Run one startup stage and record how long it took"""
+        start = time.monotonic()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.timings[stage] = time.monotonic() - start
+
+    def _run(self):
+        """Schema extraction and model load run in parallel, then the warmup
+
+        With worker processes enabled the model is loaded and warmed up in each
+        worker instead, and startup waits for the first one to be ready.
+        """
+        use_workers = WORKER_POOL_CONFIG['enabled']
+        try:
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup") as executor:
+                schema_future = executor.submit(self._timed, "schema", get_database_schema)
+                if use_workers:
+                    model_future = executor.submit(self._timed, "worker_start", start_inference_workers)
+                else:
+                    model_future = executor.submit(self._timed, "model_load", get_model)
+                schema = schema_future.result()
+                model_future.result()
+
+            if STARTUP_CONFIG['warmup'] and not use_workers:
+                with self._lock:
+                    self.state = "warming up"
+                self._timed("warmup", warmup_model, schema)
+
+            with self._lock:
+                self.state = "ready"
+            self._ready.set()
+        except Exception as e:
+            logger.error(f"Startup failed: {str(e)}")
+            with self._lock:
+                self.state = "failed"
+                self.error = str(e)
+        finally:
+            with self._lock:
+                self.timings["total"] = time.monotonic() - self._started_at
+            self._finished.set()
+            logger.info(f"Startup {self.state}: {self.format_timings()}")
+
+    def record(self, stage: str, seconds: float):
+        """Add a stage timed elsewhere (e.g. building the UI) to the breakdown"""
+        with self._lock:
+            self.timings[stage] = seconds
+
+    def is_ready(self) -> bool:
+        """Whether requests will now see normal first-request latency"""
+        return self._ready.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until startup finishes; True if it succeeded"""
+        self._finished.wait(timeout if timeout is not None else STARTUP_CONFIG['ready_timeout_seconds'])
+        return self.is_ready()
+
+    def format_timings(self) -> str:
+        """Startup timing breakdown, e.g. 'schema 0.4s, model_load 41.2s, ...'"""
+        with self._lock:
+            return ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in self.timings.items())
+
+    def get_status(self) -> Dict:
+        """Current startup state, error and stage timings"""
+        with self._lock:
+            elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+            return {
+                "state": self.state,
+                "ready": self._ready.is_set(),
+                "error": self.error,
+                "elapsed_seconds": elapsed,
+                "timings": dict(self.timings),
+            }
+
+startup_manager = StartupManager()
@@ -0,0 +1,48 @@
+import threading
+import unittest
+from models.batch_scheduler import BatchScheduler
+
+class TestBatchScheduler(unittest.TestCase):
+
+    def test_concurrent_requests_share_a_batch(self):
+        batches = []
+
+        def batch_fn(items):
+            batches.append(list(items))
+            return [item.upper() for item in items]
+
+        scheduler = BatchScheduler(batch_fn, max_batch_size=4, max_wait_ms=200)
+        results = {}
+        barrier = threading.Barrier(3)
+
+        def worker(text):
+            barrier.wait()
+            results[text] = scheduler.submit(text).result(timeout=5)
+
+        threads = [threading.Thread(target=worker, args=(text,)) for text in ("a", "b", "c")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {"a": "A", "b": "B", "c": "C"})
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(scheduler.get_stats()["max_observed_batch_size"], 3)
+
+    def test_batch_size_is_capped(self):
+        scheduler = BatchScheduler(lambda items: items, max_batch_size=2, max_wait_ms=50)
+        futures = [scheduler.submit(i) for i in range(5)]
+        self.assertEqual([future.result(timeout=5) for future in futures], list(range(5)))
+        self.assertLessEqual(scheduler.get_stats()["max_observed_batch_size"], 2)
+
+    def test_errors_reach_every_caller(self):
+        def batch_fn(items):
+            raise ValueError("out of memory")
+
+        scheduler = BatchScheduler(batch_fn, max_batch_size=2, max_wait_ms=0)
+        future = scheduler.submit("q")
+        with self.assertRaises(ValueError):
+            future.result(timeout=5)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from benchmarks.golden_questions import get_golden_questions
+from benchmarks.run_benchmarks import compare_results, run_benchmarks, summarize
+from benchmarks.stand_ins import EmployeesStandIn, parse_mysql_schema
+from models import sql_generator
+
+class TestStandIns(unittest.TestCase):
+
+    def test_schema_matches_information_schema_types(self):
+        tables = parse_mysql_schema("CREATE TABLE t (\n  id INT NOT NULL,\n  g ENUM ('M','F') NOT NULL,\n"
+                                    "  PRIMARY KEY (id),\n  FOREIGN KEY (id) REFERENCES u (id) ON DELETE CASCADE\n);")
+        self.assertEqual(tables["t"], {"columns": [["id", "int"], ["g", "enum('M','F')"]],
+                                       "primary_key": ["id"], "foreign_keys": [["id", "u", "id"]]})
+
+    def test_golden_questions_run_on_the_stand_in(self):
+        db = EmployeesStandIn(num_employees=50)
+        try:
+            self.assertEqual(db.execute("SELECT COUNT(*) AS n FROM departments")[0]["n"], 9)
+            for item in get_golden_questions():
+                self.assertTrue(db.execute(item["sql"]), item["question"])
+        finally:
+            db.close()
+
+class TestBenchmarkRun(unittest.TestCase):
+
+    def test_summary_percentiles_are_nearest_rank(self):
+        stats = summarize([ms / 1000 for ms in range(100, 0, -1)])
+        self.assertEqual((stats["p50_ms"], stats["p95_ms"], stats["p99_ms"]), (50.0, 95.0, 99.0))
+
+    def test_stub_run_restores_pipeline(self):
+        cache = sql_generator.query_cache
+        results = run_benchmarks(iterations=3, repeats=1, employees=50)
+        self.assertIs(sql_generator.query_cache, cache)
+        self.assertIsNone(sql_generator.get_generation_backend())
+        self.assertEqual(results["end_to_end"]["accuracy"], 1.0)
+        self.assertIn("prompt.build", results["micro"])
+        self.assertEqual(results["stages"]["generation"]["count"], len(get_golden_questions()))
+
+        slower = {"micro": {}, "end_to_end": dict(results["end_to_end"], accuracy=0.5,
+                                                   cold=dict(results["end_to_end"]["cold"], p50_ms=1000.0))}
+        self.assertEqual(len(compare_results(results, slower)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import threading
+import time
+import unittest
+from database.connection_pool import ConnectionPool, PoolTimeoutError
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+        self.unread_result = False
+
+    def ping(self, reconnect=False):
+        if not self.healthy:
+            raise ConnectionError("server has gone away")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+# Named like mysql.connector's error classes
+class ProgrammingError(Exception):
+    pass
+
+class OperationalError(Exception):
+    pass
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.created = []
+
+        def factory():
+            connection = FakeConnection()
+            self.created.append(connection)
+            return connection
+
+        self.factory = factory
+
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(self.factory, pool_size=2, checkout_timeout=1)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(len(self.created), 1)
+
+    def test_checkout_waits_for_release(self):
+        pool = ConnectionPool(self.factory, pool_size=1, checkout_timeout=2)
+        held = pool.acquire()
+        threading.Timer(0.05, pool.release, args=(held,)).start()
+        connection = pool.acquire()
+        self.assertIs(connection, held)
+        stats = pool.get_stats()
+        self.assertEqual(stats["waits"], 1)
+        self.assertGreater(stats["max_wait_ms"], 0)
+
+    def test_checkout_timeout(self):
+        pool = ConnectionPool(self.factory, pool_size=1, checkout_timeout=0.05)
+        pool.acquire()
+        with self.assertRaises(PoolTimeoutError):
+            pool.acquire()
+        self.assertEqual(pool.get_stats()["timeouts"], 1)
+
+    def test_unhealthy_connection_is_replaced(self):
+        pool = ConnectionPool(self.factory, pool_size=1, checkout_timeout=1, health_check=True)
+        with pool.connection() as connection:
+            pass
+        connection.healthy = False
+        with pool.connection() as replacement:
+            self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.get_stats()["failed_health_checks"], 1)
+
+    def test_connection_kept_after_query_error(self):
+        pool = ConnectionPool(self.factory, pool_size=1, checkout_timeout=1)
+        with self.assertRaises(ProgrammingError):
+            with pool.connection() as connection:
+                raise ProgrammingError("1064: You have an error in your SQL syntax")
+        self.assertFalse(connection.closed)
+        with pool.connection() as reused:
+            self.assertIs(reused, connection)
+
+    def test_connection_discarded_on_connection_error(self):
+        pool = ConnectionPool(self.factory, pool_size=1, checkout_timeout=1)
+        with self.assertRaises(OperationalError):
+            with pool.connection() as connection:
+                raise OperationalError("2013: Lost connection to MySQL server during query")
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.get_stats()["open_connections"], 0)
+
+    def test_connection_discarded_when_ping_fails_after_error(self):
+        pool = ConnectionPool(self.factory, pool_size=1, checkout_timeout=1)
+        with self.assertRaises(RuntimeError):
+            with pool.connection() as connection:
+                connection.healthy = False
+                raise RuntimeError("query failed")
+        self.assertTrue(connection.closed)
+
+    def test_connection_with_unread_rows_is_dropped(self):
+        pool = ConnectionPool(self.factory, pool_size=1, checkout_timeout=1)
+        with pool.connection() as connection:
+            connection.unread_result = True
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.get_stats()["discarded"], 1)
+
+    def test_idle_connections_are_reaped(self):
+        pool = ConnectionPool(self.factory, pool_size=2, checkout_timeout=1,
+                              idle_timeout=0.01, reap_interval=0)
+        with pool.connection() as connection:
+            pass
+        time.sleep(0.02)
+        with pool.connection() as fresh:
+            self.assertIsNot(fresh, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.get_stats()["reaped"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
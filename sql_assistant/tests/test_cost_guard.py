@@ -0,0 +1,31 @@
+import importlib.util
+import unittest
+
+HAS_MYSQL = importlib.util.find_spec("mysql") is not None
+
+@unittest.skipUnless(HAS_MYSQL, "mysql-connector-python is required")
+class TestExecutionTimeHint(unittest.TestCase):
+
+    def setUp(self):
+        from database.cost_guard import add_execution_time_hint
+        self.hint = lambda query: add_execution_time_hint(query, 5000)
+
+    def test_hint_follows_the_leading_select(self):
+        self.assertEqual(self.hint("SELECT * FROM employees"),
+                         "SELECT /*+ MAX_EXECUTION_TIME(5000) */ * FROM employees")
+
+    def test_hint_follows_the_outer_select_of_a_with_query(self):
+        self.assertEqual(self.hint("WITH t AS (SELECT emp_no FROM salaries) SELECT COUNT(*) FROM t"),
+                         "WITH t AS (SELECT emp_no FROM salaries) SELECT /*+ MAX_EXECUTION_TIME(5000) */ COUNT(*) FROM t")
+
+    def test_hint_goes_inside_a_leading_parenthesis(self):
+        self.assertEqual(self.hint("(SELECT emp_no FROM dept_emp) UNION (SELECT emp_no FROM titles)"),
+                         "(SELECT /*+ MAX_EXECUTION_TIME(5000) */ emp_no FROM dept_emp) UNION (SELECT emp_no FROM titles)")
+
+    def test_existing_hint_and_non_select_are_left_alone(self):
+        query = "SELECT /*+ MAX_EXECUTION_TIME(100) */ * FROM employees"
+        self.assertEqual(self.hint(query), query)
+        self.assertEqual(self.hint("SHOW TABLES"), "SHOW TABLES")
+
+if __name__ == "__main__":
+    unittest.main()
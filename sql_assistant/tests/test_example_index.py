@@ -0,0 +1,136 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from utils.example_index import BM25ExampleIndex, ExampleEmbeddingIndex
+from utils.few_shot_examples import EMPLOYEE_DB_EXAMPLES
+
+class TestBM25ExampleIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.examples = [dict(example) for example in EMPLOYEE_DB_EXAMPLES[:8]]
+        self.index = BM25ExampleIndex()
+        self.index.ensure_built(self.examples)
+
+    def question_at(self, indices):
+        return [self.examples[i]["question"] for i in indices]
+
+    def test_best_match_ranks_first(self):
+        top = self.question_at(self.index.top_k("What is the average salary in each department?", 3))
+        self.assertEqual(top[0], "What is the average salary by department?")
+
+    def test_keyword_prefix_bonus(self):
+        top = self.question_at(self.index.top_k("Who are the managers?", 1))
+        self.assertEqual(top, ["Find all managers"])
+
+    def test_unmatched_examples_fill_remaining_slots(self):
+        self.assertEqual(self.index.top_k("zzz", 3), [0, 1, 2])
+
+    def test_incremental_add(self):
+        example = {"question": "List employee titles", "sql": "SELECT title FROM titles;", "keywords": ["title", "titles"]}
+        self.examples.append(example)
+        self.index.add(example, len(self.examples) - 1)
+        self.assertEqual(self.index.top_k("Which titles exist?", 1), [len(self.examples) - 1])
+
+    def test_add_after_ensure_built_is_ignored(self):
+        example = {"question": "List employee titles", "sql": "SELECT title FROM titles;", "keywords": ["title"]}
+        self.examples.append(example)
+        self.index.ensure_built(self.examples)
+        self.index.add(example, len(self.examples) - 1)
+        self.assertEqual(self.index.size(), len(self.examples))
+
+    def test_large_library_skips_postings_of_common_terms(self):
+        index = BM25ExampleIndex()
+        library = [{"question": f"Question {i} about table_{i % 500} column_{i % 97}",
+                    "keywords": [f"table_{i % 500}"]} for i in range(5000)]
+        index.ensure_built(library)
+        walked = []
+
+        class WatchedPostings(dict):
+            def __init__(self, term, postings):
+                super().__init__(postings)
+                self.term = term
+
+            def items(self):
+                walked.append(self.term)
+                return super().items()
+
+        for term in ("question", "about", "table_42", "column_7"):
+            index._postings[term] = WatchedPostings(term, index._postings[term])
+        top = index.top_k("question about table_42 column_7", 3)
+        self.assertEqual(sorted(walked), ["column_7", "table_42"])
+        self.assertTrue(all(i % 500 == 42 for i in top))
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+class FakeEncoder:
+    """Normalized bag-of-stems vectors, standing in for a sentence-transformers model"""
+
+    STEMS = ["employ", "salar", "department", "manager", "hire", "average", "title"]
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, normalize_embeddings=True, convert_to_numpy=True):
+        import numpy as np
+        self.calls.append(list(texts))
+        vectors = np.array([[float(stem in text.lower()) for stem in self.STEMS] + [0.1] for text in texts])
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+@unittest.skipUnless(HAS_NUMPY, "numpy is required")
+class TestExampleEmbeddingIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.examples = [
+            {"question": "How many employees are there?"},
+            {"question": "What is the average salary by department?"},
+            {"question": "Find all managers"},
+            {"question": "Which employees were hired after 2000?"},
+        ]
+        self.cache_path = os.path.join(tempfile.mkdtemp(), "example_embeddings.npz")
+        self.index = self.make_index()
+        self.index.ensure_built(self.examples)
+
+    def make_index(self):
+        index = ExampleEmbeddingIndex(model_name="fake", cache_path=self.cache_path)
+        index._model = FakeEncoder()
+        index.save_delay = 60
+        return index
+
+    def saved_questions(self):
+        import numpy as np
+        with np.load(self.cache_path) as saved:
+            return [str(q) for q in saved["questions"]]
+
+    def test_best_match_ranks_first(self):
+        self.assertEqual(self.index.top_k("Average salary in each department", 2)[0], 1)
+        self.assertEqual(self.index.top_k("Who was hired most recently?", 1), [3])
+
+    def test_saved_embeddings_are_reused(self):
+        index = self.make_index()
+        index.ensure_built(self.examples)
+        self.assertEqual(index._model.calls, [])
+        self.assertEqual(index.top_k("Find the managers", 1), [2])
+
+    def test_saved_embeddings_for_other_examples_are_ignored(self):
+        index = self.make_index()
+        index.ensure_built([{"question": "List job titles"}] + self.examples)
+        self.assertEqual(len(index._model.calls[0]), len(self.examples) + 1)
+
+    def test_add_after_ensure_built_is_ignored(self):
+        example = {"question": "List job titles"}
+        self.examples.append(example)
+        self.index.ensure_built(self.examples)
+        self.index.add(example, len(self.examples) - 1)
+        self.assertEqual(self.index.size(), len(self.examples))
+        self.assertEqual(self.index.top_k("Which titles exist?", 1), [len(self.examples) - 1])
+
+    def test_added_examples_are_saved_on_flush(self):
+        self.examples.append({"question": "List job titles"})
+        self.index.add(self.examples[-1], len(self.examples) - 1)
+        self.assertEqual(len(self.saved_questions()), len(self.examples) - 1)
+        self.index.flush()
+        self.assertEqual(self.saved_questions()[-1], "List job titles")
+
+if __name__ == "__main__":
+    unittest.main()
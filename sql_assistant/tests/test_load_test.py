@@ -0,0 +1,36 @@
+import asyncio
+import unittest
+from benchmarks.load_test import build_schedule, run_load, summarize_load
+
+class TestLoadTest(unittest.TestCase):
+
+    def test_schedule_is_reproducible(self):
+        mix = [("How many employees are there?", 3.0), ("List all department names", 1.0)]
+        schedule = build_schedule(50, 10.0, mix, unique_fraction=0.5, seed=7)
+        self.assertEqual(schedule, build_schedule(50, 10.0, mix, unique_fraction=0.5, seed=7))
+        self.assertEqual(schedule[0][0], 0.0)
+        self.assertTrue(all(a <= b for (a, _), (b, _) in zip(schedule, schedule[1:])))
+        self.assertTrue(any("(variant" in question for _, question in schedule))
+
+    def test_concurrency_limit_queues_requests(self):
+        in_flight = []
+        peak = []
+
+        async def send(question):
+            in_flight.append(question)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.02)
+            in_flight.remove(question)
+            return question != "fail"
+
+        schedule = [(0.0, f"q{i}") for i in range(5)] + [(0.0, "fail")]
+        results = asyncio.run(run_load(send, schedule, concurrency=2))
+        summary = summarize_load(results)
+
+        self.assertEqual(max(peak), 2)
+        self.assertEqual((summary["completed"], summary["failed"]), (5, 1))
+        self.assertGreater(summary["client_queue_delay"]["max_ms"], 30)
+        self.assertGreater(summary["throughput_rps"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import urllib.request
+from utils.metrics import MetricsRegistry, start_metrics_server, stop_metrics_server, metrics
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_percentiles_and_buckets(self):
+        registry = MetricsRegistry(window_size=100)
+        for ms in range(1, 101):
+            registry.observe("execute_query", ms / 1000)
+        stats = registry.snapshot()["stages"]["execute_query"]
+        self.assertEqual(stats["count"], 100)
+        self.assertAlmostEqual(stats["p50"], 0.05)
+        self.assertAlmostEqual(stats["p95"], 0.095)
+        self.assertAlmostEqual(stats["p99"], 0.099)
+        self.assertIn((0.05, 50), stats["buckets"])
+        self.assertEqual(stats["buckets"][-1], (float("inf"), 100))
+
+    def test_prometheus_text(self):
+        registry = MetricsRegistry()
+        with registry.time_stage("cache_lookup"):
+            pass
+        registry.observe_decode(40, 2.0)
+        text = registry.render_prometheus()
+        self.assertIn('sql_assistant_stage_duration_seconds_bucket{stage="cache_lookup",le="+Inf"} 1', text)
+        self.assertIn('sql_assistant_stage_duration_seconds_count{stage="decode"} 1', text)
+        self.assertIn('sql_assistant_decode_tokens_per_second_bucket{le="20.0"} 1', text)
+
+    def test_forwarded_samples_merge_into_another_registry(self):
+        worker, parent = MetricsRegistry(), MetricsRegistry()
+        worker.start_forwarding()
+        worker.observe_decode(10, 0.5)
+        parent.merge(worker.drain_forwarded())
+        self.assertEqual(worker.drain_forwarded(), [])
+        snapshot = parent.snapshot()
+        self.assertEqual(snapshot["stages"]["decode"]["count"], 1)
+        self.assertEqual(snapshot["decode_tokens_per_second"]["p50"], 20.0)
+
+    def test_http_endpoint(self):
+        server = start_metrics_server("127.0.0.1", 0)
+        self.assertIsNotNone(server)
+        try:
+            metrics.observe("validation", 0.002)
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode()
+            self.assertIn('stage="validation"', body)
+        finally:
+            stop_metrics_server()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+import time
+import unittest
+from ui.pipeline import PipelineStage
+
+class TestPipelineStage(unittest.TestCase):
+
+    def test_stages_overlap(self):
+        inference = PipelineStage("test-inference", 1)
+        db = PipelineStage("test-db", 1)
+        release = threading.Event()
+
+        async def scenario():
+            slow_query = asyncio.ensure_future(db.run(release.wait, 2))
+            await asyncio.sleep(0.01)
+            # Generation for another user completes while the query is still running
+            result = await asyncio.wait_for(inference.run(lambda: "SELECT 1;"), 1)
+            self.assertFalse(slow_query.done())
+            release.set()
+            await slow_query
+            return result
+
+        self.assertEqual(asyncio.run(scenario()), "SELECT 1;")
+        inference.shutdown()
+        db.shutdown()
+
+    def test_stats_track_queue_wait_and_failures(self):
+        stage = PipelineStage("test-stats", 1)
+
+        async def scenario():
+            slow = stage.run(time.sleep, 0.05)
+            failing = stage.run(lambda: 1 / 0)
+            return await asyncio.gather(slow, failing, return_exceptions=True)
+
+        _, error = asyncio.run(scenario())
+        self.assertIsInstance(error, ZeroDivisionError)
+        stats = stage.get_stats()
+        self.assertEqual((stats["completed"], stats["failed"], stats["queued"]), (2, 1, 0))
+        self.assertGreater(stats["avg_queue_wait_ms"], 0)
+        stage.shutdown()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import importlib.util
+import re
+import unittest
+from models.prefix_cache import PrefixCache
+
+HAS_TORCH = (importlib.util.find_spec("torch") is not None and
+             importlib.util.find_spec("transformers") is not None)
+
+class FakeIds:
+    def __init__(self, length):
+        self.shape = (1, length)
+
+class TestPrefixCache(unittest.TestCase):
+
+    def setUp(self):
+        self.computed = []
+
+    def compute(self, prefix):
+        self.computed.append(prefix)
+        return FakeIds(len(prefix.split())), {"layers": [[prefix]]}
+
+    def test_hits_reuse_the_computed_entry(self):
+        cache = PrefixCache(max_entries=2)
+        cache.get_or_compute("schema and examples", self.compute)
+        prefix_ids, _ = cache.get_or_compute("schema and examples", self.compute)
+        self.assertEqual(self.computed, ["schema and examples"])
+        self.assertEqual(prefix_ids.shape, (1, 3))
+        stats = cache.get_stats()
+        self.assertEqual((stats["prefix_cache_hits"], stats["prefix_cache_misses"]), (1, 1))
+        self.assertEqual(stats["prefix_tokens_reused"], 3)
+        self.assertEqual(stats["prefix_cache_hit_rate"], 0.5)
+
+    def test_least_recently_used_prefix_is_evicted(self):
+        cache = PrefixCache(max_entries=2)
+        cache.get_or_compute("a", self.compute)
+        cache.get_or_compute("b", self.compute)
+        cache.get_or_compute("a", self.compute)
+        cache.get_or_compute("c", self.compute)
+        self.assertEqual(cache.size(), 2)
+        self.assertEqual(cache.get_stats()["prefix_cache_evictions"], 1)
+        cache.get_or_compute("a", self.compute)
+        cache.get_or_compute("b", self.compute)
+        self.assertEqual(self.computed, ["a", "b", "c", "b"])
+
+    def test_callers_get_a_private_copy(self):
+        cache = PrefixCache(max_entries=2)
+        _, past_key_values = cache.get_or_compute("prefix", self.compute)
+        # generate() extends the cache it is given in place
+        past_key_values["layers"][0].append("generated")
+        _, again = cache.get_or_compute("prefix", self.compute)
+        self.assertEqual(again, {"layers": [["prefix"]]})
+
+    def test_clear(self):
+        cache = PrefixCache(max_entries=2)
+        cache.get_or_compute("a", self.compute)
+        cache.clear()
+        self.assertEqual(cache.size(), 0)
+        cache.get_or_compute("a", self.compute)
+        self.assertEqual(self.computed, ["a", "a"])
+
+PREFIX = "CREATE TABLE employees ( emp_no int , salary int ) ;\n\n-- Using valid MySQL , answer the question .\n"
+SUFFIX = "-- Question : how many employees earn more than average ?\nSELECT"
+
+@unittest.skipUnless(HAS_TORCH, "torch and transformers are required")
+class TestPrefixCachedGeneration(unittest.TestCase):
+
+    def setUp(self):
+        import torch
+        from tokenizers import Tokenizer
+        from tokenizers.models import WordLevel
+        from tokenizers.pre_tokenizers import Whitespace
+        from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+        from models import sql_generator
+
+        # Whitespace pre-tokenization, so the prefix and suffix tokenize independently
+        words = sorted(set(re.findall(r"\w+|[^\w\s]+", PREFIX + SUFFIX)))
+        vocab = {"[PAD]": 0, "[UNK]": 1, **{word: i + 2 for i, word in enumerate(words)}}
+        backend = Tokenizer(WordLevel(vocab, unk_token="[UNK]"))
+        backend.pre_tokenizer = Whitespace()
+        tokenizer = PreTrainedTokenizerFast(tokenizer_object=backend, unk_token="[UNK]", pad_token="[PAD]")
+
+        torch.manual_seed(0)
+        model = GPT2LMHeadModel(GPT2Config(vocab_size=len(vocab), n_positions=128, n_embd=16, n_layer=2, n_head=2,
+                                           bos_token_id=1, eos_token_id=1)).eval()
+
+        self.sql_generator = sql_generator
+        self.saved = {name: getattr(sql_generator, name) for name in ("model", "tokenizer", "prefix_cache", "_generation_kwargs")}
+        self.saved_max_new_tokens = sql_generator.MODEL_CONFIG['max_new_tokens']
+
+        def greedy_kwargs(tokenizer, stopping_criteria):
+            kwargs = self.saved["_generation_kwargs"](tokenizer, stopping_criteria)
+            kwargs.pop('temperature')
+            kwargs.pop('top_p')
+            kwargs['do_sample'] = False
+            return kwargs
+
+        sql_generator.model = model
+        sql_generator.tokenizer = tokenizer
+        sql_generator.prefix_cache = PrefixCache(max_entries=2)
+        sql_generator._generation_kwargs = greedy_kwargs
+        sql_generator.MODEL_CONFIG['max_new_tokens'] = 12
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(self.sql_generator, name, value)
+        self.sql_generator.MODEL_CONFIG['max_new_tokens'] = self.saved_max_new_tokens
+
+    def test_prefix_cached_output_matches_full_prompt(self):
+        full = self.sql_generator._generate_texts([(PREFIX, SUFFIX)], use_prefix_cache=False)[0]
+        cold = self.sql_generator._generate_with_prefix_cache(PREFIX, SUFFIX)
+        warm = self.sql_generator._generate_with_prefix_cache(PREFIX, SUFFIX)
+        self.assertEqual(cold, full)
+        self.assertEqual(warm, full)
+        stats = self.sql_generator.prefix_cache.get_stats()
+        self.assertEqual((stats["prefix_cache_hits"], stats["prefix_cache_misses"]), (1, 1))
+
+if __name__ == "__main__":
+    unittest.main()
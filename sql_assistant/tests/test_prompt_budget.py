@@ -0,0 +1,119 @@
+import unittest
+from config.config import PROMPT_BUDGET_CONFIG
+from models import sql_generator
+from utils.prompt_budget import PromptBudget, TokenCounter
+
+SCHEMA = """CREATE TABLE employees (
+  emp_no int,
+  birth_date date,
+  first_name varchar(14),
+  last_name varchar(16),
+  gender enum('M','F'),
+  hire_date date,
+  PRIMARY KEY (emp_no)
+);
+
+CREATE TABLE departments (
+  dept_no char(4),
+  dept_name varchar(40),
+  PRIMARY KEY (dept_no)
+);
+
+CREATE TABLE dept_emp (
+  emp_no int,
+  dept_no char(4),
+  from_date date,
+  to_date date,
+  PRIMARY KEY (emp_no, dept_no),
+  FOREIGN KEY (emp_no) REFERENCES employees(emp_no),
+  FOREIGN KEY (dept_no) REFERENCES departments(dept_no)
+);
+
+CREATE TABLE salaries (
+  emp_no int,
+  salary int,
+  from_date date,
+  to_date date,
+  PRIMARY KEY (emp_no, from_date),
+  FOREIGN KEY (emp_no) REFERENCES employees(emp_no)
+);"""
+
+class TestPromptBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+        def count_words(text):
+            self.calls.append(text)
+            return len(text.split())
+
+        self.budget = PromptBudget(TokenCounter(count_words, max_entries=16), max_tokens=10, margin_tokens=0)
+
+    def test_large_item_does_not_crowd_out_smaller_ones(self):
+        kept, used = self.budget.fit(["question here"], ["a b c", "d e f g h i", "j k"])
+        self.assertEqual(kept, [0, 2])
+        self.assertEqual(used, 7)
+        self.assertEqual(self.budget.get_stats()["components_dropped"], 1)
+
+    def test_required_items_are_kept_over_budget(self):
+        kept, used = self.budget.fit(["one two three four five six seven eight nine ten eleven"], ["a"])
+        self.assertEqual(kept, [])
+        self.assertEqual(used, 11)
+        self.assertEqual(self.budget.get_stats()["prompts_over_budget"], 1)
+
+    def test_counts_are_memoised(self):
+        self.budget.fit(["q"], ["a b", "c"])
+        self.budget.fit(["q"], ["a b", "c"])
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(self.budget.counter.get_stats()["token_cache_hit_rate"], 0.5)
+
+# Counted in words: template 24 + suffix 11; tables ranked departments 12, salaries 22,
+# employees 20, dept_emp 27, where salaries joins departments only through employees
+# and dept_emp; then examples of 34, 32 and 27
+class TestBudgetedPrompt(unittest.TestCase):
+
+    QUESTION = "What is the average salary in each department?"
+
+    def setUp(self):
+        self.saved_budget = sql_generator.prompt_budget
+        self.saved_enabled = PROMPT_BUDGET_CONFIG['enabled']
+        PROMPT_BUDGET_CONFIG['enabled'] = True
+
+    def tearDown(self):
+        sql_generator.prompt_budget = self.saved_budget
+        PROMPT_BUDGET_CONFIG['enabled'] = self.saved_enabled
+
+    def build(self, max_tokens):
+        sql_generator.prompt_budget = PromptBudget(TokenCounter(lambda text: len(text.split())),
+                                                   max_tokens=max_tokens, margin_tokens=0)
+        prefix, suffix = sql_generator.build_prompt_parts(self.QUESTION, SCHEMA, use_few_shot=True)
+        self.assertEqual(suffix, f"-- Question: {self.QUESTION}\nSELECT")
+        tables = [name for name in ("departments", "salaries", "employees", "dept_emp")
+                  if f"CREATE TABLE {name} (" in prefix]
+        return prefix, tables
+
+    def test_join_path_is_kept_with_the_matched_tables(self):
+        prefix, tables = self.build(116)
+        self.assertEqual(tables, ["departments", "salaries", "employees", "dept_emp"])
+        self.assertNotIn("-- Question: What is the average salary by department?", prefix)
+        self.assertTrue(prefix.endswith("-- Using valid MySQL, answer the following question for the tables provided above.\n"))
+
+    def test_tables_are_never_kept_without_their_join_path(self):
+        # The full join doesn't fit; salaries alone would be disconnected from departments
+        prefix, tables = self.build(100)
+        self.assertEqual(tables, ["departments", "dept_emp"])
+        self.assertNotIn("-- Question: Find", prefix)
+
+    def test_examples_fill_the_remaining_budget_in_rank_order(self):
+        prefix, tables = self.build(150)
+        self.assertEqual(tables, ["departments", "salaries", "employees", "dept_emp"])
+        self.assertIn("-- Question: What is the average salary by department?\n", prefix)
+        self.assertNotIn("-- Question: Find", prefix)
+
+    def test_question_is_kept_when_nothing_else_fits(self):
+        prefix, tables = self.build(10)
+        self.assertEqual(tables, [])
+        self.assertEqual(sql_generator.prompt_budget.get_stats()["prompts_over_budget"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
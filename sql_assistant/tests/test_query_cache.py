@@ -0,0 +1,185 @@
+import os
+import tempfile
+import time
+import unittest
+from config.config import FEW_SHOT_CONFIG
+from utils.persistent_cache import PersistentQueryStore
+from utils.query_cache import QueryCache
+
+SCHEMA = "CREATE TABLE employees (\n  emp_no int\n);"
+
+class TestQueryCache(unittest.TestCase):
+
+    def test_hit_and_miss_counters(self):
+        cache = QueryCache(max_size=10, ttl_seconds=0)
+        self.assertIsNone(cache.get("How many employees?", SCHEMA))
+        cache.set("How many employees?", SCHEMA, "SELECT COUNT(*) FROM employees;")
+        self.assertEqual(cache.get("How many employees?", SCHEMA), "SELECT COUNT(*) FROM employees;")
+        stats = cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = QueryCache(max_size=2, ttl_seconds=0)
+        cache.set("a", SCHEMA, "SELECT 1 FROM a;")
+        cache.set("b", SCHEMA, "SELECT 1 FROM b;")
+        cache.get("a", SCHEMA)
+        cache.set("c", SCHEMA, "SELECT 1 FROM c;")
+        self.assertIsNone(cache.get("b", SCHEMA))
+        self.assertIsNotNone(cache.get("a", SCHEMA))
+        self.assertEqual(cache.get_stats()["evictions"], 1)
+
+    def test_entries_expire_after_ttl(self):
+        cache = QueryCache(max_size=10, ttl_seconds=0.01)
+        cache.set("a", SCHEMA, "SELECT 1 FROM a;")
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("a", SCHEMA))
+        self.assertEqual(cache.get_stats()["expirations"], 1)
+        self.assertEqual(cache.size(), 0)
+
+    def test_byte_bound_evicts(self):
+        cache = QueryCache(max_size=100, ttl_seconds=0, max_bytes=1000)
+        for i in range(10):
+            cache.set(f"q{i}", SCHEMA, "SELECT " + "x" * 200 + " FROM t;")
+        stats = cache.get_stats()
+        self.assertLessEqual(stats["cache_bytes"], 1000)
+        self.assertGreater(stats["evictions"], 0)
+
+    def test_schema_change_misses(self):
+        cache = QueryCache(max_size=10, ttl_seconds=0)
+        cache.set("a", SCHEMA, "SELECT 1 FROM a;")
+        self.assertIsNone(cache.get("a", SCHEMA + "\n\nCREATE TABLE t (\n  id int\n);"))
+
+    def test_normalized_question_hits(self):
+        cache = QueryCache(max_size=10, ttl_seconds=0)
+        cache.set("How many employees are there?", SCHEMA, "SELECT COUNT(*) FROM employees;")
+        self.assertEqual(cache.get("how many  employees are there", SCHEMA), "SELECT COUNT(*) FROM employees;")
+        self.assertEqual(cache.get_stats()["normalized_hits"], 1)
+
+    def test_operators_and_signs_are_part_of_the_normalized_question(self):
+        cache = QueryCache(max_size=10, ttl_seconds=0)
+        cache.set("How many salaries are > 60000?", SCHEMA, "SELECT COUNT(*) FROM salaries WHERE salary > 60000;")
+        cache.set("Which values are not equal to 5?", SCHEMA, "SELECT * FROM t WHERE v <> 5;")
+        self.assertIsNone(cache.get("How many salaries are < 60000?", SCHEMA))
+        self.assertIsNone(cache.get("Which values are not equal to -5?", SCHEMA))
+        self.assertIsNotNone(cache.get("how many salaries are >60000", SCHEMA))
+
+    def test_evicted_questions_leave_the_secondary_indexes(self):
+        cache = QueryCache(max_size=1, ttl_seconds=0)
+        cache.set("List all departments", SCHEMA, "SELECT dept_name FROM departments;")
+        cache.set("Count employees by gender", SCHEMA, "SELECT gender, COUNT(*) FROM employees GROUP BY gender;")
+        self.assertIsNone(cache.get("list all departments!", SCHEMA))
+
+class TestNearDuplicateLookup(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = FEW_SHOT_CONFIG['similarity_cache_lookup']
+        FEW_SHOT_CONFIG['similarity_cache_lookup'] = True
+        self.cache = QueryCache(max_size=10, ttl_seconds=0)
+
+    def tearDown(self):
+        FEW_SHOT_CONFIG['similarity_cache_lookup'] = self.saved
+
+    def test_off_by_default(self):
+        FEW_SHOT_CONFIG['similarity_cache_lookup'] = self.saved
+        self.cache.set("Show all employees hired after 2000", SCHEMA, "SELECT * FROM employees;")
+        self.assertIsNone(self.cache.get("Show all the employees hired after 2000", SCHEMA))
+
+    def test_near_duplicate_question_hits(self):
+        self.cache.similarity_threshold = 0.8
+        self.cache.set("Show all employees hired after 2000", SCHEMA, "SELECT * FROM employees;")
+        self.assertIsNotNone(self.cache.get("Show all the employees hired after 2000", SCHEMA))
+        self.assertIsNone(self.cache.get("Show all employees hired after 2010", SCHEMA))
+        stats = self.cache.get_stats()
+        self.assertEqual((stats["similar_hits"], stats["misses"]), (1, 1))
+
+    def test_questions_with_opposite_meaning_miss(self):
+        self.cache.similarity_threshold = 0.5
+        pairs = [
+            ("List employees who are managers", "List employees who are not managers"),
+            ("How many male employees are in each department", "How many female employees are in each department"),
+            ("List employees ordered by hire date ascending", "List employees ordered by hire date descending"),
+            ("Find employees earning more than the average", "Find employees earning less than the average"),
+        ]
+        for cached, asked in pairs:
+            self.cache.set(cached, SCHEMA, "SELECT * FROM employees;")
+            self.assertIsNone(self.cache.get(asked, SCHEMA), asked)
+        self.assertEqual(self.cache.get_stats()["similar_hits"], 0)
+
+class TestPersistentQueryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_entries_survive_restart(self):
+        store = PersistentQueryStore(self.path, flush_interval=60)
+        QueryCache(max_size=10, persistent_store=store).set("a", SCHEMA, "SELECT 1 FROM a;")
+        store.close()
+
+        restarted = QueryCache(max_size=10, persistent_store=PersistentQueryStore(self.path, flush_interval=60))
+        self.assertEqual(restarted.get("a", SCHEMA), "SELECT 1 FROM a;")
+        self.assertEqual(restarted.get_stats()["persistent_hits"], 1)
+        restarted.persistent_store.close()
+
+    def test_schema_change_misses_but_keeps_entries(self):
+        store = PersistentQueryStore(self.path, flush_interval=60)
+        QueryCache(max_size=10, persistent_store=store).set("a", SCHEMA, "SELECT 1 FROM a;")
+        store.close()
+
+        # A second process, or the same one after a schema change, on another schema version
+        store = PersistentQueryStore(self.path, flush_interval=60)
+        cache = QueryCache(max_size=10, persistent_store=store)
+        self.assertIsNone(cache.get("a", SCHEMA + "\n"))
+        cache.set("b", SCHEMA + "\n", "SELECT 1 FROM b;")
+        store.flush()
+        self.assertEqual(store.get_stats()["persistent_entries"], 2)
+        self.assertEqual(cache.get("a", SCHEMA), "SELECT 1 FROM a;")
+        store.close()
+
+    def test_entries_for_other_schemas_expire_with_age(self):
+        store = PersistentQueryStore(self.path, flush_interval=60, stale_schema_seconds=0)
+        cache = QueryCache(max_size=10, persistent_store=store)
+        cache.set("a", SCHEMA, "SELECT 1 FROM a;")
+        store.flush()
+        cache.set("b", SCHEMA + "\n", "SELECT 1 FROM b;")
+        store.flush()
+        self.assertEqual(store.get_stats()["persistent_entries"], 1)
+        self.assertEqual(store.get_stats()["persistent_invalidated"], 1)
+        store.close()
+
+    def test_oldest_entries_beyond_the_limit_are_dropped(self):
+        store = PersistentQueryStore(self.path, flush_interval=60, max_entries=2)
+        cache = QueryCache(max_size=10, persistent_store=store)
+        for name in ("a", "b", "c"):
+            cache.set(name, SCHEMA, f"SELECT 1 FROM {name};")
+            store.flush()
+        self.assertEqual(store.get_stats()["persistent_entries"], 2)
+        self.assertIsNone(store.get(cache.cache_key("a", SCHEMA), cache.schema_fingerprint(SCHEMA)))
+        store.close()
+        store.close()
+
+class TestGeneratedSQLCaching(unittest.TestCase):
+
+    def setUp(self):
+        from models import sql_generator
+        self.sql_generator = sql_generator
+        self.saved = sql_generator.query_cache
+        sql_generator.query_cache = QueryCache(max_size=10, ttl_seconds=0, persistent_store=None)
+
+    def tearDown(self):
+        self.sql_generator.query_cache = self.saved
+
+    def test_valid_sql_is_cached(self):
+        sql = self.sql_generator._postprocess_sql("How many employees?", SCHEMA, " COUNT(*) FROM employees;")
+        self.assertEqual(self.sql_generator.query_cache.get("How many employees?", SCHEMA), sql)
+
+    def test_invalid_sql_is_not_cached(self):
+        sql = self.sql_generator._postprocess_sql("How many employees?", SCHEMA, " COUNT(*) FROM (employees;")
+        self.assertTrue(sql.startswith("-- Error"))
+        self.assertIsNone(self.sql_generator.query_cache.get("How many employees?", SCHEMA))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from utils.query_formatter import format_query_results, format_result_stream
+
+ROWS = [
+    {"dept_no": "d001", "dept_name": "Marketing", "employees": 20211},
+    {"dept_no": "d002", "dept_name": "Finance", "employees": 17346},
+]
+
+class CountingRow(dict):
+    """Row that records every cell read from it"""
+
+    reads = 0
+
+    def __getitem__(self, key):
+        CountingRow.reads += 1
+        return super().__getitem__(key)
+
+class TestQueryFormatter(unittest.TestCase):
+
+    def test_columns_are_aligned(self):
+        lines = format_query_results(ROWS).splitlines()
+        self.assertEqual(lines[0], "dept_no | dept_name | employees")
+        self.assertEqual(lines[2], "d001    | Marketing | 20211")
+        self.assertEqual(lines[3], "d002    | Finance   | 17346")
+
+    def test_empty_and_error_results(self):
+        self.assertEqual(format_query_results([]), "No results found.")
+        self.assertEqual(format_query_results({"error": "boom"}), "Error: boom")
+
+    def test_renders_only_the_requested_page(self):
+        rows = [{"n": i} for i in range(10)]
+        formatted = format_query_results(rows, page=1, page_size=3)
+        self.assertEqual(formatted.splitlines()[2:5], ["3", "4", "5"])
+        self.assertIn("Showing rows 4-6 of 10", formatted)
+
+    def test_stream_matches_whole_render(self):
+        streamed = "".join(format_result_stream([ROWS[:1], ROWS[1:]]))
+        self.assertEqual(streamed.splitlines()[:3], format_query_results(ROWS).splitlines()[:3])
+        self.assertEqual(len(streamed.splitlines()), 4)
+
+    def test_large_result_reads_only_the_page(self):
+        rows = [CountingRow(emp_no=i, first_name="Georgi", salary=60117 + i) for i in range(100000)]
+        CountingRow.reads = 0
+        formatted = format_query_results(rows, page=2, page_size=50)
+        self.assertEqual(CountingRow.reads, 50 * 3)
+        self.assertIn("Showing rows 101-150 of 100000", formatted)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import unittest
+from utils.query_optimizer import (get_schema_model, optimize_schema_context, extract_table_names,
+                                   add_limit_clause, is_aggregate_query, has_top_level_order_by,
+                                   make_preview_query, extract_query_tables, outer_select_position)
+
+EMPLOYEES_SCHEMA = """CREATE TABLE departments (
+  dept_no char(4),
+  dept_name varchar(40),
+  PRIMARY KEY (dept_no)
+);
+
+CREATE TABLE dept_emp (
+  emp_no int,
+  dept_no char(4),
+  from_date date,
+  to_date date,
+  PRIMARY KEY (emp_no, dept_no),
+  FOREIGN KEY (emp_no) REFERENCES employees(emp_no),
+  FOREIGN KEY (dept_no) REFERENCES departments(dept_no)
+);
+
+CREATE TABLE dept_manager (
+  emp_no int,
+  dept_no char(4),
+  from_date date,
+  to_date date,
+  PRIMARY KEY (emp_no, dept_no),
+  FOREIGN KEY (emp_no) REFERENCES employees(emp_no),
+  FOREIGN KEY (dept_no) REFERENCES departments(dept_no)
+);
+
+CREATE TABLE employees (
+  emp_no int,
+  birth_date date,
+  first_name varchar(14),
+  last_name varchar(16),
+  gender enum('M','F'),
+  hire_date date,
+  PRIMARY KEY (emp_no)
+);
+
+CREATE TABLE salaries (
+  emp_no int,
+  salary int,
+  from_date date,
+  to_date date,
+  PRIMARY KEY (emp_no, from_date),
+  FOREIGN KEY (emp_no) REFERENCES employees(emp_no)
+);
+
+CREATE TABLE titles (
+  emp_no int,
+  title varchar(50),
+  from_date date,
+  to_date date,
+  PRIMARY KEY (emp_no, title, from_date),
+  FOREIGN KEY (emp_no) REFERENCES employees(emp_no)
+);"""
+
+def tables_for(question, schema=EMPLOYEES_SCHEMA):
+    return set(extract_table_names(optimize_schema_context(schema, question)))
+
+class TestSchemaPruning(unittest.TestCase):
+
+    def test_parses_columns_and_foreign_keys(self):
+        model = get_schema_model(EMPLOYEES_SCHEMA)
+        self.assertEqual(model.tables["employees"].columns[:2], ["emp_no", "birth_date"])
+        self.assertEqual(model.graph["dept_emp"], {"employees", "departments"})
+
+    def test_single_table_question(self):
+        self.assertEqual(tables_for("How many employees are there?"), {"employees"})
+
+    def test_column_match(self):
+        self.assertEqual(tables_for("Count people by gender"), {"employees"})
+
+    def test_join_path_closure(self):
+        self.assertEqual(tables_for("What is the average salary by department?"),
+                         {"departments", "dept_emp", "employees", "salaries"})
+
+    def test_join_tables_leave_out_referenced_tables(self):
+        model = get_schema_model(EMPLOYEES_SCHEMA)
+        self.assertEqual(model.join_tables("Find all managers"), {"dept_manager"})
+        self.assertEqual(model.join_tables("What is the average salary by department?"),
+                         {"departments", "dept_emp", "employees", "salaries"})
+
+    def test_referenced_tables_are_included(self):
+        self.assertEqual(tables_for("Find all managers"), {"dept_manager", "employees", "departments"})
+
+    def test_unmatched_question_falls_back_to_hub_table(self):
+        self.assertEqual(tables_for("Show me something interesting"), {"employees"})
+
+    def test_schema_without_declared_keys(self):
+        schema = "\n\n".join(block for block in EMPLOYEES_SCHEMA.split("\n\n"))
+        schema = "\n".join(line for line in schema.split("\n") if "KEY" not in line)
+        self.assertEqual(tables_for("List each title with the employee's first name", schema),
+                         {"titles", "employees"})
+
+    def test_ranked_tables_put_relevant_tables_first(self):
+        ranked = get_schema_model(EMPLOYEES_SCHEMA).ranked_tables("Find all managers")
+        self.assertEqual(set(ranked), set(get_schema_model(EMPLOYEES_SCHEMA).tables))
+        self.assertEqual(ranked[0], "dept_manager")
+        self.assertEqual(set(ranked[1:3]), {"employees", "departments"})
+
+class TestLimitClause(unittest.TestCase):
+
+    def test_adds_missing_limit(self):
+        self.assertEqual(add_limit_clause("SELECT * FROM salaries;", 1000), "SELECT * FROM salaries LIMIT 1000;")
+
+    def test_tightens_looser_limit_keeping_offset(self):
+        self.assertEqual(add_limit_clause("SELECT * FROM s LIMIT 10, 5000", 1000), "SELECT * FROM s LIMIT 1000 OFFSET 10;")
+        self.assertEqual(add_limit_clause("SELECT * FROM s LIMIT 5;", 1000), "SELECT * FROM s LIMIT 5;")
+
+    def test_subquery_limit_is_not_the_outer_limit(self):
+        self.assertEqual(add_limit_clause("SELECT a FROM (SELECT a FROM t LIMIT 5) x", 1000),
+                         "SELECT a FROM (SELECT a FROM t LIMIT 5) x LIMIT 1000;")
+
+    def test_outer_query_shape(self):
+        self.assertTrue(is_aggregate_query("SELECT dept_no, COUNT(*) FROM dept_emp GROUP BY dept_no"))
+        self.assertFalse(is_aggregate_query("SELECT * FROM e WHERE emp_no IN (SELECT MAX(emp_no) FROM s)"))
+        self.assertFalse(has_top_level_order_by("SELECT * FROM (SELECT * FROM s ORDER BY salary) x"))
+
+    def test_preview_query(self):
+        self.assertEqual(make_preview_query("SELECT * FROM employees;", 100),
+                         ("SELECT * FROM employees LIMIT 100;", True))
+        self.assertEqual(make_preview_query("SELECT COUNT(*) FROM employees;", 100),
+                         ("SELECT COUNT(*) FROM employees;", False))
+        self.assertEqual(make_preview_query("SELECT * FROM employees LIMIT 10;", 100),
+                         ("SELECT * FROM employees LIMIT 10;", False))
+
+    def test_outer_select_position(self):
+        self.assertEqual(outer_select_position("  SELECT * FROM employees"), 2)
+        self.assertEqual(outer_select_position("(SELECT emp_no FROM dept_emp) UNION (SELECT emp_no FROM titles)"), 1)
+        query = "WITH recent (emp_no) AS (SELECT emp_no FROM titles WHERE title = 'select') SELECT * FROM recent"
+        self.assertEqual(query[outer_select_position(query):], "SELECT * FROM recent")
+        self.assertIsNone(outer_select_position("SHOW TABLES"))
+
+    def test_extract_query_tables(self):
+        self.assertEqual(extract_query_tables(
+            "SELECT d.dept_name FROM departments d JOIN dept_emp de ON d.dept_no = de.dept_no "
+            "WHERE de.emp_no IN (SELECT emp_no FROM titles)"),
+            ["departments", "dept_emp", "titles"])
+        self.assertEqual(extract_query_tables("SELECT * FROM `employees`.salaries s, titles t"),
+                         ["salaries", "titles"])
+
+if __name__ == "__main__":
+    unittest.main()
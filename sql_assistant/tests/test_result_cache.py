@@ -0,0 +1,119 @@
+import importlib.util
+import unittest
+from contextlib import contextmanager
+from datetime import datetime
+from database.result_cache import ResultCache, normalize_sql
+
+HAS_MYSQL = importlib.util.find_spec("mysql") is not None
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.versions = {"employees": 1, "salaries": 1}
+        self.polls = []
+
+        def fetcher(tables):
+            self.polls.append(list(tables))
+            return {table: self.versions.get(table, 1) for table in tables}
+
+        self.cache = ResultCache(fetcher, max_entries=3, max_bytes=0, ttl_seconds=0, version_check_interval=0)
+        self.executions = 0
+
+    def run_query(self, sql, rows=None):
+        def compute():
+            self.executions += 1
+            return rows or [{"n": self.executions}]
+        return self.cache.get_or_compute(sql, "all", compute, lambda value: 10)
+
+    def test_normalized_sql_shares_an_entry(self):
+        self.run_query("SELECT * FROM employees;")
+        self.run_query("select *\n  FROM   employees")
+        self.assertEqual(self.executions, 1)
+        self.assertNotEqual(normalize_sql("SELECT 'A' FROM t"), normalize_sql("SELECT 'a' FROM t"))
+
+    def test_table_change_invalidates(self):
+        sql = "SELECT e.emp_no, s.salary FROM employees e JOIN salaries s ON e.emp_no = s.emp_no"
+        self.run_query(sql)
+        self.versions["salaries"] = 2
+        self.assertEqual(self.run_query(sql), [{"n": 2}])
+        self.assertEqual(self.cache.get_stats()["result_cache_invalidations"], 1)
+
+    def test_unrelated_table_change_keeps_entry(self):
+        self.run_query("SELECT * FROM employees")
+        self.versions["salaries"] = 2
+        self.run_query("SELECT * FROM employees")
+        self.assertEqual(self.executions, 1)
+
+    def test_version_polls_are_rate_limited(self):
+        self.cache.version_check_interval = 60
+        for _ in range(3):
+            self.run_query("SELECT * FROM employees")
+        self.assertEqual(self.polls, [["employees"]])
+
+    def test_queries_without_tables_are_not_cached(self):
+        self.run_query("SELECT NOW()")
+        self.run_query("SELECT NOW()")
+        self.assertEqual(self.executions, 2)
+        self.assertEqual(self.cache.size(), 0)
+
+    def test_tables_without_a_version_are_not_cached(self):
+        # A view, or a table updated within the current second
+        self.versions["salaries"] = None
+        self.run_query("SELECT * FROM salaries")
+        self.run_query("SELECT * FROM salaries")
+        self.assertEqual(self.executions, 2)
+        self.assertEqual(self.cache.size(), 0)
+
+    def test_lru_eviction(self):
+        for table in ("a", "b", "c", "d"):
+            self.run_query(f"SELECT * FROM {table}")
+        self.assertEqual(self.cache.size(), 3)
+        self.run_query("SELECT * FROM a")
+        self.assertEqual(self.executions, 5)
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+@unittest.skipUnless(HAS_MYSQL, "mysql-connector-python is required")
+class TestFetchTableVersions(unittest.TestCase):
+
+    def setUp(self):
+        from database import query_executor
+        self.executor = query_executor
+        self.saved_connection = query_executor.pooled_connection
+        self.saved_invalidation = query_executor.RESULT_CACHE_CONFIG['invalidation']
+        query_executor.RESULT_CACHE_CONFIG['invalidation'] = 'update_time'
+
+    def tearDown(self):
+        self.executor.pooled_connection = self.saved_connection
+        self.executor.RESULT_CACHE_CONFIG['invalidation'] = self.saved_invalidation
+
+    def test_null_and_current_second_update_times_have_no_version(self):
+        now = datetime(2024, 5, 1, 12, 0, 0)
+        rows = [("employees", datetime(2024, 5, 1, 11, 59, 59), now),
+                ("salaries", now, now),
+                ("current_dept_emp", None, now)]
+
+        @contextmanager
+        def pooled_connection():
+            class Connection:
+                def cursor(self):
+                    return FakeCursor(rows)
+            yield Connection()
+
+        self.executor.pooled_connection = pooled_connection
+        self.assertEqual(self.executor.fetch_table_versions(["employees", "salaries", "current_dept_emp"]),
+                         {"employees": datetime(2024, 5, 1, 11, 59, 59), "salaries": None, "current_dept_emp": None})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import importlib.util
+import json
+import os
+import tempfile
+import unittest
+from contextlib import contextmanager
+
+HAS_MYSQL = importlib.util.find_spec("mysql") is not None
+
+ROWS = [
+    ("departments", "dept_no", "char(4)", "PRI", None, None),
+    ("departments", "dept_name", "varchar(40)", "UNI", None, None),
+    ("dept_emp", "emp_no", "int", "PRI", "employees", "emp_no"),
+    ("dept_emp", "dept_no", "char(4)", "PRI", "departments", "dept_no"),
+    ("employees", "emp_no", "int", "PRI", None, None),
+]
+
+class FakeCursor:
+    def __init__(self, database):
+        self.database = database
+        self.query = None
+
+    def execute(self, query):
+        self.query = query
+        self.database.queries.append(query)
+
+    def fetchone(self):
+        return self.database.fingerprint
+
+    def fetchall(self):
+        return list(self.database.rows)
+
+    def close(self):
+        pass
+
+class FakeDatabase:
+    """Answers the fingerprint and schema queries from in-memory rows"""
+
+    def __init__(self):
+        self.fingerprint = (5, 1234, 99)
+        self.rows = list(ROWS)
+        self.queries = []
+
+    @contextmanager
+    def pooled_connection(self):
+        yield self
+
+    def cursor(self):
+        return FakeCursor(self)
+
+@unittest.skipUnless(HAS_MYSQL, "mysql-connector-python is required")
+class TestSchemaExtractor(unittest.TestCase):
+
+    def setUp(self):
+        from utils import schema_extractor
+        self.extractor = schema_extractor
+        self.database = FakeDatabase()
+        self.saved_connection = schema_extractor.pooled_connection
+        self.saved_config = dict(schema_extractor.SCHEMA_CACHE_CONFIG)
+        schema_extractor.pooled_connection = self.database.pooled_connection
+        schema_extractor.SCHEMA_CACHE_CONFIG.update(
+            enabled=True, path=os.path.join(tempfile.mkdtemp(), "schema_cache.json"), revalidate_interval_seconds=60)
+        schema_extractor._schema_cache.clear()
+
+    def tearDown(self):
+        self.extractor.pooled_connection = self.saved_connection
+        self.extractor.SCHEMA_CACHE_CONFIG.update(self.saved_config)
+        self.extractor._schema_cache.clear()
+
+    def schema_queries(self):
+        return [query for query in self.database.queries if query == self.extractor.SCHEMA_QUERY]
+
+    def test_tables_are_rendered_as_create_statements(self):
+        schema = self.extractor.get_database_schema()
+        self.assertEqual(schema.split("\n\n")[:2], [
+            "CREATE TABLE departments (\n  dept_no char(4),\n  dept_name varchar(40),\n  PRIMARY KEY (dept_no)\n);",
+            "CREATE TABLE dept_emp (\n  emp_no int,\n  dept_no char(4),\n  PRIMARY KEY (emp_no, dept_no),\n"
+            "  FOREIGN KEY (emp_no) REFERENCES employees(emp_no),\n"
+            "  FOREIGN KEY (dept_no) REFERENCES departments(dept_no)\n);",
+        ])
+        self.assertEqual(list(self.extractor.get_schema_tables()), ["departments", "dept_emp", "employees"])
+
+    def test_cached_schema_is_trusted_within_the_interval(self):
+        self.extractor.get_database_schema()
+        self.database.queries.clear()
+        self.extractor.get_database_schema()
+        self.assertEqual(self.database.queries, [])
+
+    def test_unchanged_fingerprint_keeps_the_same_schema(self):
+        self.extractor.SCHEMA_CACHE_CONFIG['revalidate_interval_seconds'] = 0
+        first = self.extractor.get_database_schema()
+        self.database.queries.clear()
+        self.assertIs(self.extractor.get_database_schema(), first)
+        self.assertEqual(self.database.queries, [self.extractor.FINGERPRINT_QUERY])
+
+    def test_changed_fingerprint_reextracts(self):
+        self.extractor.SCHEMA_CACHE_CONFIG['revalidate_interval_seconds'] = 0
+        self.extractor.get_database_schema()
+        self.database.fingerprint = (6, 5678, 99)
+        self.database.rows.append(("employees", "gender", "enum('M','F')", "", None, None))
+        self.assertIn("gender enum('M','F')", self.extractor.get_database_schema())
+        self.assertEqual(len(self.schema_queries()), 2)
+
+    def test_force_refresh_reextracts(self):
+        self.extractor.get_database_schema()
+        self.extractor.get_database_schema(force_refresh=True)
+        self.assertEqual(len(self.schema_queries()), 2)
+
+    def test_disk_cache_survives_a_restart(self):
+        schema = self.extractor.get_database_schema()
+        with open(self.extractor.SCHEMA_CACHE_CONFIG['path']) as f:
+            self.assertEqual(json.load(f)["fingerprint"], "5:1234:99")
+
+        self.extractor._schema_cache.clear()
+        self.database.queries.clear()
+        self.assertEqual(self.extractor.get_database_schema(), schema)
+        self.assertEqual(self.database.queries, [self.extractor.FINGERPRINT_QUERY])
+
+    def test_disk_cache_for_another_fingerprint_is_ignored(self):
+        self.extractor.get_database_schema()
+        self.extractor._schema_cache.clear()
+        self.database.fingerprint = (6, 5678, 99)
+        self.extractor.get_database_schema()
+        self.assertEqual(len(self.schema_queries()), 2)
+
+if __name__ == "__main__":
+    unittest.main()
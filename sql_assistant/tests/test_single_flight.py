@@ -0,0 +1,43 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from utils.single_flight import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def generate():
+            calls.append(1)
+            started.set()
+            release.wait(2)
+            return "SELECT COUNT(*) FROM employees;"
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            leader = executor.submit(flight.do, "key", generate)
+            started.wait(2)
+            followers = [executor.submit(flight.do, "key", generate) for _ in range(3)]
+            while flight.get_stats()["coalesced"] < 3:
+                time.sleep(0.001)
+            release.set()
+            results = [leader.result()] + [future.result() for future in followers]
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(set(results), {"SELECT COUNT(*) FROM employees;"})
+        self.assertEqual(flight.get_stats()["coalesced"], 3)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_exception_reaches_waiters_and_is_not_remembered(self):
+        flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do("key", lambda: (_ for _ in ()).throw(ValueError("boom")))
+        self.assertEqual(flight.do("key", lambda: 42), 42)
+        self.assertEqual(flight.get_stats()["executions"], 2)
+
+if __name__ == "__main__":
+    unittest.main()
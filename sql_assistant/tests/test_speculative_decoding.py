@@ -0,0 +1,50 @@
+import copy
+import importlib.util
+import unittest
+
+HAS_TORCH = (importlib.util.find_spec("torch") is not None and
+             importlib.util.find_spec("transformers") is not None)
+
+@unittest.skipUnless(HAS_TORCH, "torch and transformers are required")
+class TestSpeculativeDecoding(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        import torch
+        from transformers import GPT2Config, GPT2LMHeadModel
+        from models.sql_generator import assisted_generate, get_draft_model
+
+        cls.torch = torch
+        cls.assisted_generate = staticmethod(assisted_generate)
+        cls.get_draft_model = staticmethod(get_draft_model)
+
+        torch.manual_seed(0)
+        config = dict(vocab_size=64, n_positions=64, n_embd=16, n_head=2, bos_token_id=0, eos_token_id=1)
+        cls.main_model = GPT2LMHeadModel(GPT2Config(n_layer=2, **config)).eval()
+        cls.draft_model = GPT2LMHeadModel(GPT2Config(n_layer=1, **config)).eval()
+        cls.input_ids = torch.tensor([[5, 9, 12, 7, 3]])
+        cls.generation_kwargs = {"max_new_tokens": 12, "do_sample": False, "pad_token_id": 0}
+
+    def generate(self, assistant_model):
+        return self.assisted_generate(self.main_model, assistant_model, self.input_ids,
+                                      self.torch.ones_like(self.input_ids), **self.generation_kwargs)
+
+    def test_greedy_output_matches_standard_decoding(self):
+        generated_ids, proposed, accepted = self.generate(self.draft_model)
+        with self.torch.no_grad():
+            expected = self.main_model.generate(input_ids=self.input_ids, attention_mask=self.torch.ones_like(self.input_ids),
+                                                **self.generation_kwargs)
+        self.assertTrue(self.torch.equal(generated_ids, expected))
+        self.assertGreater(proposed, 0)
+        self.assertLessEqual(accepted, proposed)
+
+    def test_identical_draft_is_mostly_accepted(self):
+        generated_ids, proposed, accepted = self.generate(copy.deepcopy(self.main_model))
+        new_tokens = generated_ids.shape[1] - self.input_ids.shape[1]
+        self.assertGreater(accepted, new_tokens // 2)
+
+    def test_no_draft_model_configured(self):
+        self.assertIsNone(self.get_draft_model())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from utils.statement_scanner import SQLStatementScanner, find_statement_end, truncate_to_statement
+
+class TestStatementScanner(unittest.TestCase):
+
+    def test_stops_at_top_level_semicolon(self):
+        text = " COUNT(*) FROM employees;\n\n-- Question: next"
+        self.assertEqual(truncate_to_statement(text), " COUNT(*) FROM employees;")
+
+    def test_ignores_semicolon_in_strings(self):
+        text = " * FROM departments WHERE dept_name = 'R;D' AND note = \"a;b\";"
+        self.assertEqual(find_statement_end(text), len(text))
+
+    def test_handles_escaped_and_doubled_quotes(self):
+        text = " * FROM t WHERE a = 'it\\'s;' AND b = 'x'';y';"
+        self.assertEqual(find_statement_end(text), len(text))
+
+    def test_stops_at_blank_line(self):
+        text = " first_name\nFROM employees\n\nSELECT garbage"
+        self.assertEqual(truncate_to_statement(text), " first_name\nFROM employees\n")
+
+    def test_leading_blank_lines_do_not_stop(self):
+        text = "\n\n COUNT(*) FROM employees;"
+        self.assertEqual(find_statement_end(text), len(text))
+
+    def test_stops_before_question_marker(self):
+        text = " COUNT(*) FROM employees\n-- Question: How many departments?\nSELECT"
+        self.assertEqual(truncate_to_statement(text), " COUNT(*) FROM employees\n")
+
+    def test_no_end_returns_none(self):
+        self.assertIsNone(find_statement_end(" COUNT(*) FROM employees WHERE"))
+
+    def test_incremental_feed_matches_whole_text(self):
+        text = " e.first_name FROM employees e -- who's here\nWHERE e.emp_no IN (SELECT emp_no FROM salaries);\nextra"
+        scanner = SQLStatementScanner()
+        end = None
+        for char in text:
+            end = scanner.feed(char)
+            if end is not None:
+                break
+        self.assertEqual(end, find_statement_end(text))
+        self.assertTrue(text[:end].endswith("salaries);"))
+
+    def test_marker_split_across_chunks(self):
+        scanner = SQLStatementScanner()
+        for chunk in [" COUNT(*) FROM employees\n", "-", "- Quest", "ion: next"]:
+            end = scanner.feed(chunk)
+        self.assertEqual(end, len(" COUNT(*) FROM employees\n"))
+
+if __name__ == "__main__":
+    unittest.main()
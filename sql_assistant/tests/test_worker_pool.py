@@ -0,0 +1,98 @@
+import os
+import queue
+import stat
+import time
+import tempfile
+import unittest
+from models.worker_pool import InferenceRPCServer, InferenceWorkerPool, RemoteGenerationBackend, WorkerCrashedError
+
+def echo_worker(worker_key, request_queue, result_connection, device=None):
+    """Stand-in worker: answers with the prompt suffix and the worker slot, never answers, or dies"""
+    result_connection.send(("ready", worker_key, os.getpid()))
+    while True:
+        try:
+            message = request_queue.get(timeout=5)
+        except queue.Empty:
+            return
+        if message is None:
+            return
+        request_id, (prefix, suffix) = message
+        if suffix == "crash":
+            os._exit(1)
+        if suffix == "hold":
+            continue
+        result_connection.send(("result", worker_key, request_id, True, f"{suffix} from {worker_key[0]}"))
+
+class TestInferenceWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = InferenceWorkerPool(num_workers=2, worker_main=echo_worker, restart_backoff=0,
+                                        health_check_interval=0.05, max_attempts=2)
+        self.pool.start()
+        self.assertTrue(self.pool.wait_until_ready(timeout=30))
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_requests_are_answered(self):
+        futures = [self.pool.submit(("", f"q{i}")) for i in range(6)]
+        results = [future.result(timeout=10) for future in futures]
+        self.assertEqual([result.split()[0] for result in results], [f"q{i}" for i in range(6)])
+        self.assertEqual(self.pool.get_stats()["completed"], 6)
+
+    def test_dispatch_prefers_least_loaded_worker(self):
+        while self.pool.get_stats()["ready_workers"] < 2:
+            time.sleep(0.01)
+        for _ in range(4):
+            self.pool.submit(("", "hold"))
+        self.assertEqual([worker["in_flight"] for worker in self.pool.get_stats()["workers"]], [2, 2])
+
+    def test_dead_worker_is_restarted_and_request_fails_after_retries(self):
+        future = self.pool.submit(("", "crash"))
+        with self.assertRaises(WorkerCrashedError):
+            future.result(timeout=30)
+        self.assertTrue(self.pool.wait_until_ready(timeout=30))
+        self.assertEqual(self.pool.submit(("", "after")).result(timeout=30).split()[0], "after")
+        stats = self.pool.get_stats()
+        self.assertEqual(stats["crashes"], 2)
+        self.assertEqual(stats["redispatched"], 1)
+
+    def test_hung_worker_is_killed_and_request_fails_after_retries(self):
+        pool = InferenceWorkerPool(num_workers=1, worker_main=echo_worker, restart_backoff=0,
+                                   health_check_interval=0.05, max_attempts=2, request_timeout=0.3)
+        pool.start()
+        try:
+            self.assertTrue(pool.wait_until_ready(timeout=30))
+            future = pool.submit(("", "hold"))
+            with self.assertRaises(WorkerCrashedError):
+                future.result(timeout=30)
+            self.assertTrue(pool.wait_until_ready(timeout=30))
+            self.assertEqual(pool.submit(("", "after")).result(timeout=30).split()[0], "after")
+            stats = pool.get_stats()
+            self.assertEqual((stats["hangs"], stats["redispatched"]), (2, 1))
+        finally:
+            pool.shutdown()
+
+    def test_rpc_clients_share_the_pool(self):
+        path = os.path.join(tempfile.mkdtemp(), "inference.sock")
+        server = InferenceRPCServer(self.pool, path, authkey=b"test-key")
+        server.start()
+        client = RemoteGenerationBackend(path, authkey=b"test-key")
+        try:
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+            self.assertEqual(client.submit(("", "remote")).result(timeout=10).split()[0], "remote")
+        finally:
+            client.close()
+            server.close()
+        with self.assertRaises(OSError):
+            client.submit(("", "closed"))
+        self.assertEqual(client._pending, {})
+
+    def test_rpc_server_requires_an_authkey(self):
+        path = os.path.join(tempfile.mkdtemp(), "inference.sock")
+        with self.assertRaises(ValueError):
+            InferenceRPCServer(self.pool, path).start()
+        self.assertFalse(os.path.exists(path))
+
+if __name__ == "__main__":
+    unittest.main()
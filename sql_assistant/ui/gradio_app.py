@@ -1,26 +1,59 @@
 import gradio as gr
-from models.sql_generator import generate_sql, get_cache_stats, clear_cache
-from database.query_executor import execute_query
+from models.sql_generator import generate_sql, get_cache_stats, get_batch_stats, get_prefix_cache_stats, get_generation_stats, get_coalescing_stats, get_prompt_budget_stats, clear_cache
+from database.query_executor import fetch_result_page, get_result_cache_stats, result_cache
+from database.connector import get_pool_stats
+from database.cost_guard import guard_query
 from utils.schema_extractor import get_database_schema
 from utils.query_formatter import format_query_results
+from utils.query_optimizer import make_preview_query
+from config.config import PIPELINE_CONFIG, PREVIEW_CONFIG
+from ui.pipeline import get_pipeline_stats, run_db, run_inference
+from startup import startup_manager
+from models.worker_pool import get_worker_pool_stats
 from utils.few_shot_examples import get_examples, add_custom_example
+from utils.metrics import metrics, observe_stage, time_stage
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Get schema once at startup
-SCHEMA = get_database_schema()
+async def process_query(question, use_few_shot, show_examples):
+    """Process a natural language query with options
 
-def process_query(question, use_few_shot, show_examples):
-    """Process a natural language query with options"""
+    Generation and database work run on separate executors, so one user's slow
+    query never holds up another user's generation.
+    """
+    if not startup_manager.is_ready():
+        status = startup_manager.get_status()
+        message = f"The assistant is still starting up ({status['state']}, {status['elapsed_seconds']:.0f}s elapsed)."
+        if status["error"]:
+            message = f"Startup failed: {status['error']}"
+        return "", message, "", empty_page_state()
+    
+    start = time.perf_counter()
     try:
+        # Schema is cached in process and revalidated cheaply, so this is usually free
+        schema = await run_db(get_database_schema)
+        
         # Generate SQL query
-        sql_query = generate_sql(question, SCHEMA, use_few_shot=use_few_shot)
+        sql_query = await run_inference(generate_sql, question, schema, use_few_shot=use_few_shot)
         
-        # Execute the query if it doesn't contain errors
+        # Execute the query if it doesn't contain errors, showing only the first page
+        page_state = empty_page_state()
         if not sql_query.startswith("-- Error"):
-            results = execute_query(sql_query)
-            formatted_results = format_query_results(results)
+            # Check the plan estimate before letting the query near the database
+            guarded_sql, cost = await run_db(timed_guard_query, sql_query)
+            if guarded_sql is None:
+                formatted_results = f"Query not executed: {cost['message']}"
+            else:
+                # Show a LIMITed preview first; the full result is a separate request
+                preview_sql, is_preview = guarded_sql, False
+                if PREVIEW_CONFIG['enabled']:
+                    preview_sql, is_preview = make_preview_query(guarded_sql, PREVIEW_CONFIG['row_limit'])
+                page_state.update(sql=preview_sql, full_sql=guarded_sql, cost=cost, preview=is_preview)
+                formatted_results = await run_db(render_result_page, preview_sql, 0, cost)
+                if is_preview:
+                    formatted_results += "\n" + format_preview_note(cost)
         else:
             formatted_results = "Query not executed due to errors."
         
@@ -33,10 +66,83 @@ def process_query(question, use_few_shot, show_examples):
                 examples_text += f"{i}. Q: {example['question']}\n"
                 examples_text += f"   SQL: {example['sql']}\n\n"
         
-        return sql_query, formatted_results, examples_text
+        return sql_query, formatted_results, examples_text, page_state
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
-        return "", f"Error: {str(e)}", ""
+        return "", f"Error: {str(e)}", "", empty_page_state()
+    finally:
+        observe_stage("request", time.perf_counter() - start)
+
+def timed_guard_query(sql_query):
+    """Run the EXPLAIN cost check, recording it as its own stage"""
+    with time_stage("cost_check"):
+        return guard_query(sql_query)
+
+def empty_page_state():
+    """Results view state before any query has run"""
+    return {"sql": None, "full_sql": None, "page": 0, "cost": None, "preview": False}
+
+def format_preview_note(cost):
+    """Explain that the results are a preview, with the plan's total-row estimate"""
+    note = f"Preview: showing at most {PREVIEW_CONFIG['row_limit']} rows"
+    if cost and cost.get("estimated_result_rows") is not None:
+        note += f" of about {cost['estimated_result_rows']:,} estimated"
+    return note + ". Use 'Load Full Result' to fetch everything."
+
+def format_cost_line(cost, rows_fetched, elapsed_ms):
+    """Summarize estimated versus actual cost of a query"""
+    estimated = cost.get("estimated_rows") if cost else None
+    line = f"Cost: estimated {estimated:,} rows examined" if estimated is not None else "Cost: no estimate"
+    line += f", fetched {rows_fetched} rows in {elapsed_ms:.0f} ms"
+    if cost and cost.get("action") == "downscoped":
+        line += f"\nNote: {cost['message']}"
+    return line
+
+def render_result_page(sql_query, page, cost=None):
+    """Fetch and format one page of query results"""
+    start = time.perf_counter()
+    try:
+        rows, has_more = fetch_result_page(sql_query, page)
+    except Exception as e:
+        return format_query_results({"error": str(e)})
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    if not rows and page > 0:
+        return "No more results."
+    
+    with time_stage("format_results"):
+        formatted = format_query_results(rows)
+    footer = f"\nPage {page + 1}"
+    if has_more:
+        footer += " (more rows available)"
+    footer += "\n" + format_cost_line(cost, len(rows), elapsed_ms)
+    return formatted + footer
+
+async def change_result_page(page_state, step):
+    """Move the results view forward or back by one page"""
+    if not page_state or not page_state.get("sql"):
+        return "No query to page through.", page_state
+    page = max(page_state["page"] + step, 0)
+    new_state = dict(page_state, page=page)
+    formatted = await run_db(render_result_page, page_state["sql"], page, new_state["cost"])
+    if new_state.get("preview"):
+        formatted += "\n" + format_preview_note(new_state["cost"])
+    return formatted, new_state
+
+async def load_full_result(page_state):
+    """Replace the preview with the first page of the complete result"""
+    if not page_state or not page_state.get("full_sql"):
+        return "No query to load.", page_state
+    new_state = dict(page_state, sql=page_state["full_sql"], page=0, preview=False)
+    return await run_db(render_result_page, new_state["sql"], 0, new_state["cost"]), new_state
+
+async def next_result_page(page_state):
+    """Show the next page of results"""
+    return await change_result_page(page_state, 1)
+
+async def previous_result_page(page_state):
+    """Show the previous page of results"""
+    return await change_result_page(page_state, -1)
 
 def add_new_example(question, sql, keywords):
     """Add a new few-shot example"""
@@ -54,10 +160,37 @@ def get_system_stats():
     """Get system statistics"""
     try:
         cache_stats = get_cache_stats()
+        pool_stats = get_pool_stats()
+        batch_stats = get_batch_stats()
+        prefix_stats = get_prefix_cache_stats()
+        generation_stats = get_generation_stats()
+        result_stats = get_result_cache_stats()
+        pipeline_stats = get_pipeline_stats()
+        coalescing_stats = get_coalescing_stats()
+        budget_stats = get_prompt_budget_stats()
+        worker_stats = get_worker_pool_stats()
+        startup_status = startup_manager.get_status()
         stats_text = f"""System Statistics:
+Startup: {startup_status['state']} ({startup_manager.format_timings() or 'no timings yet'})
 Cache Size: {cache_stats['cache_size']}/{cache_stats['max_size']}
 Cache Enabled: {cache_stats['cache_enabled']}
+Cache Hits: {cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%}), {cache_stats['evictions']} evictions, {cache_stats['expirations']} expirations
+Cache Hit Types: {cache_stats['exact_hits']} exact, {cache_stats['normalized_hits']} normalized, {cache_stats['similar_hits']} similar, {cache_stats['persistent_hits']} persistent
+Persistent Cache: {cache_stats.get('persistent_entries', 0)} stored, {cache_stats['persistent_hits']} restored hits, {cache_stats.get('persistent_pending_writes', 0)} pending writes
+Result Cache: {result_stats['result_cache_size']}/{result_stats['result_cache_max_entries']} results ({result_stats['result_cache_bytes'] / 1024:.0f} KB), hit rate {result_stats['result_cache_hit_rate']:.0%}, {result_stats['result_cache_invalidations']} invalidated by table changes
 Available Examples: {len(get_examples())}
+Connection Pool: {pool_stats['in_use_connections']} in use, {pool_stats['idle_connections']} idle (max {pool_stats['pool_size']})
+Pool Waits: {pool_stats['waits']}/{pool_stats['checkouts']} checkouts, avg {pool_stats['avg_wait_ms']:.1f} ms, max {pool_stats['max_wait_ms']:.1f} ms, timeouts {pool_stats['timeouts']}
+Generation Batches: {batch_stats['batches']} (avg size {batch_stats['avg_batch_size']:.2f}, max {batch_stats['max_observed_batch_size']}/{batch_stats['max_batch_size']})
+Prefix KV Cache: {prefix_stats['prefix_cache_size']}/{prefix_stats['prefix_cache_max_entries']} prefixes, hit rate {prefix_stats['prefix_cache_hit_rate']:.0%}, {prefix_stats['prefix_tokens_reused']} prompt tokens reused
+Pipeline: inference {pipeline_stats['inference']['running']} running/{pipeline_stats['inference']['queued']} queued (avg wait {pipeline_stats['inference']['avg_queue_wait_ms']:.1f} ms), db {pipeline_stats['db-io']['running']} running/{pipeline_stats['db-io']['queued']} queued (avg wait {pipeline_stats['db-io']['avg_queue_wait_ms']:.1f} ms)
+Inference Workers: {worker_stats['ready_workers']}/{len(worker_stats['workers'])} ready, load {[worker['in_flight'] for worker in worker_stats['workers']]}, {worker_stats['backlog']} waiting, {worker_stats['crashes']} crashes ({worker_stats['hangs']} hung), {worker_stats['redispatched']} requests re-dispatched
+Request Coalescing: {coalescing_stats['generations_saved']} generations saved, {result_stats['executions_coalesced']} query executions saved
+Early Stopping: {generation_stats['early_stops']}/{generation_stats['requests']} stopped at end of statement, avg {generation_stats['avg_tokens_generated']:.1f} tokens generated, avg {generation_stats['avg_tokens_saved']:.1f} saved
+Prompt Budget: avg {budget_stats['avg_prompt_tokens']:.0f}/{budget_stats['prompt_budget_tokens']} tokens over {budget_stats['prompts_built']} prompts, {budget_stats['components_dropped']} tables/examples left out, {budget_stats['prompts_over_budget']} over budget, token count hit rate {budget_stats['token_cache_hit_rate']:.0%}
+Speculative Decoding: {'on' if generation_stats['speculative_decoding_enabled'] else 'off'}, {generation_stats['speculative_requests']} requests, {generation_stats['draft_tokens_accepted']}/{generation_stats['draft_tokens_proposed']} draft tokens accepted ({generation_stats['draft_acceptance_rate']:.0%})
+Stage Latency:
+{metrics.format_summary()}
 """
         return stats_text
     except Exception as e:
@@ -67,6 +200,7 @@ def clear_system_cache():
     """Clear the system cache"""
     try:
         clear_cache()
+        result_cache.clear()
         return "Cache cleared successfully!"
     except Exception as e:
         return f"Error clearing cache: {str(e)}"
@@ -107,6 +241,11 @@ def create_gradio_interface():
                         label="Query Results",
                         lines=10
                     )
+                    with gr.Row():
+                        prev_page_btn = gr.Button("Previous Page")
+                        next_page_btn = gr.Button("Next Page")
+                        load_full_btn = gr.Button("Load Full Result")
+                    result_page_state = gr.State(empty_page_state())
                     examples_output = gr.Textbox(
                         label="Available Examples",
                         lines=8
@@ -155,7 +294,26 @@ def create_gradio_interface():
         generate_btn.click(
             fn=process_query,
             inputs=[question_input, use_few_shot, show_examples],
-            outputs=[sql_output, results_output, examples_output]
+            outputs=[sql_output, results_output, examples_output, result_page_state],
+            api_name="process_query"
+        )
+        
+        prev_page_btn.click(
+            fn=previous_result_page,
+            inputs=[result_page_state],
+            outputs=[results_output, result_page_state]
+        )
+        
+        next_page_btn.click(
+            fn=next_result_page,
+            inputs=[result_page_state],
+            outputs=[results_output, result_page_state]
+        )
+        
+        load_full_btn.click(
+            fn=load_full_result,
+            inputs=[result_page_state],
+            outputs=[results_output, result_page_state]
         )
         
         add_btn.click(
@@ -174,4 +332,10 @@ def create_gradio_interface():
             outputs=[clear_result]
         )
     
+    # Bound how many events run at once and how many may wait, instead of one worker per click
+    interface.queue(
+        default_concurrency_limit=PIPELINE_CONFIG['queue_concurrency_limit'],
+        max_size=PIPELINE_CONFIG['queue_max_size']
+    )
+    
     return interface
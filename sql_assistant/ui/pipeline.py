@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict
+from config.config import PIPELINE_CONFIG
+from utils.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+class PipelineStage:
+    """A named executor that async request handlers hand blocking work to"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_queue_wait = 0.0
+        self._total_run_time = 0.0
+
+    def _run(self, fn: Callable, submitted_at: float):
+        """Execute one task on a worker thread, recording queue and run time"""
+        started_at = time.monotonic()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._total_queue_wait += started_at - submitted_at
+        observe_stage(f"{self.name}_queue", started_at - submitted_at)
+        failed = False
+        try:
+            return fn()
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._failed += failed
+                self._total_run_time += time.monotonic() - started_at
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Run a blocking call on this stage's workers without blocking the event loop"""
+        with self._lock:
+            self._queued += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._run, partial(fn, *args, **kwargs), time.monotonic())
+
+    def shutdown(self):
+        """Stop accepting work and wait for running tasks"""
+        self._executor.shutdown(wait=True)
+
+    def get_stats(self) -> Dict:
+        """Get queue depth, concurrency and timing for this stage"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_queue_wait_ms": (self._total_queue_wait / self._completed * 1000) if self._completed else 0.0,
+                "avg_run_ms": (self._total_run_time / self._completed * 1000) if self._completed else 0.0,
+            }
+
+# Inference gets its own workers so slow queries never hold up generation, and vice versa.
+# Several inference workers let concurrent requests meet in the batch scheduler.
+inference_stage = PipelineStage("inference", PIPELINE_CONFIG['inference_workers'])
+db_stage = PipelineStage("db-io", PIPELINE_CONFIG['db_workers'])
+
+async def run_inference(fn: Callable, *args, **kwargs):
+    """Run model work on the inference executor"""
+    return await inference_stage.run(fn, *args, **kwargs)
+
+async def run_db(fn: Callable, *args, **kwargs):
+    """Run database work on the I/O executor"""
+    return await db_stage.run(fn, *args, **kwargs)
+
+def get_pipeline_stats() -> Dict:
+    """Get per-stage pipeline statistics"""
+    return {stage.name: stage.get_stats() for stage in (inference_stage, db_stage)}
+
+def shutdown_pipeline():
+    """Shut down both stage executors"""
+    for stage in (inference_stage, db_stage):
+        stage.shutdown()
+    logger.info("Request pipeline shut down")
@@ -0,0 +1,284 @@
+import os
+import re
+import atexit
+import math
+import heapq
+import threading
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from config.config import FEW_SHOT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class ExampleEmbeddingIndex:
+    """Few-shot example embeddings held in one contiguous matrix for vectorized top-k
+
+    The sentence-transformers model is loaded once. Example embeddings are
+    L2-normalized, so cosine similarity is a single matrix-vector product.
+    Examples added at runtime are saved in the background, save_delay seconds
+    after the first unsaved one, so a burst of adds rewrites the file once.
+    """
+
+    def __init__(self, model_name: str = None, cache_path: str = None):
+        self.model_name = model_name or FEW_SHOT_CONFIG.get('embedding_model', 'all-MiniLM-L6-v2')
+        self.cache_path = cache_path if cache_path is not None else FEW_SHOT_CONFIG.get('embedding_cache_path')
+
+        self._model = None
+        self._matrix = None       # Capacity-doubling buffer; rows [:_count] are live
+        self._questions: List[str] = []
+        self._count = 0
+        self._lock = threading.RLock()
+
+        self.save_delay = FEW_SHOT_CONFIG.get('embedding_save_delay_seconds', 5.0)
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        self._flush_registered = False
+
+    def _get_model(self):
+        """Load the sentence-transformers model on first use"""
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            logger.info(f"Loading embedding model: {self.model_name}")
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def _encode(self, texts: List[str]):
+        """Encode texts to normalized float32 row vectors"""
+        import numpy as np
+        embeddings = self._get_model().encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def _append(self, embeddings, questions: List[str]):
+        """Append rows to the matrix, growing capacity geometrically; caller holds the lock"""
+        import numpy as np
+        needed = self._count + len(embeddings)
+        if self._matrix is None or needed > self._matrix.shape[0]:
+            capacity = max(needed, 2 * (self._matrix.shape[0] if self._matrix is not None else 0), 16)
+            grown = np.zeros((capacity, embeddings.shape[1]), dtype=np.float32)
+            if self._matrix is not None:
+                grown[:self._count] = self._matrix[:self._count]
+            self._matrix = grown
+        self._matrix[self._count:needed] = embeddings
+        self._questions.extend(questions)
+        self._count = needed
+
+    def _load_from_disk(self, examples: List[Dict]) -> bool:
+        """Load saved embeddings when they match the current examples; caller holds the lock"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        try:
+            import numpy as np
+            with np.load(self.cache_path, allow_pickle=False) as saved:
+                if str(saved["model_name"]) != self.model_name:
+                    return False
+                questions = [str(q) for q in saved["questions"]]
+                embeddings = saved["embeddings"]
+            current = [example["question"] for example in examples]
+            if current[:len(questions)] != questions:
+                return False
+            self._append(embeddings, questions)
+            logger.info(f"Loaded {len(questions)} example embeddings from {self.cache_path}")
+            return True
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable embedding cache {self.cache_path}: {e}")
+            return False
+
+    def save(self):
+        """Persist the embeddings so the next start skips re-encoding"""
+        if not self.cache_path:
+            return
+        import numpy as np
+        with self._lock:
+            if self._matrix is None:
+                return
+            directory = os.path.dirname(self.cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            np.savez(
+                self.cache_path,
+                model_name=np.array(self.model_name),
+                questions=np.array(self._questions),
+                embeddings=self._matrix[:self._count],
+            )
+            self._dirty = False
+
+    def _schedule_save(self):
+        """Mark the index unsaved and start the save timer if none is pending; caller holds the lock"""
+        self._dirty = True
+        if not self.cache_path or self._save_timer is not None:
+            return
+        if not self._flush_registered:
+            atexit.register(self.flush)
+            self._flush_registered = True
+        self._save_timer = threading.Timer(self.save_delay, self.flush)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def flush(self):
+        """Save now if examples were added since the last save"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if self._dirty:
+                try:
+                    self.save()
+                except Exception as e:
+                    logger.warning(f"Could not save example embeddings to {self.cache_path}: {e}")
+
+    def ensure_built(self, examples: List[Dict]):
+        """Encode any examples not yet in the index"""
+        with self._lock:
+            if self._count == 0 and examples:
+                self._load_from_disk(examples)
+            if self._count < len(examples):
+                missing = examples[self._count:]
+                self._append(self._encode([ex["question"] for ex in missing]), [ex["question"] for ex in missing])
+                logger.info(f"Encoded {len(missing)} example embeddings")
+                self.save()
+
+    def add(self, example: Dict, position: int):
+        """Index an example added at runtime at position in the example list
+
+        Skipped unless the index is built and holds exactly the examples before
+        it, so an ensure_built that already picked the example up is not doubled.
+        """
+        with self._lock:
+            if self._matrix is None or self._count != position:
+                return
+            self._append(self._encode([example["question"]]), [example["question"]])
+            self._schedule_save()
+
+    def top_k(self, question: str, k: int) -> List[int]:
+        """Return indices of the k most similar examples, best first"""
+        import numpy as np
+        query = self._encode([question])[0]
+        with self._lock:
+            scores = self._matrix[:self._count] @ query
+        if k <= 0 or scores.size == 0:
+            return []
+        if k < scores.size:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(scores.size)
+        return candidates[np.argsort(-scores[candidates], kind="stable")].tolist()
+
+    def size(self) -> int:
+        """Get the number of indexed examples"""
+        return self._count
+
+_TOKEN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens"""
+    return _TOKEN.findall(text.lower())
+
+class BM25ExampleIndex:
+    """Token-to-postings inverted index over example questions with BM25 scoring
+
+    Keyword phrases from each example keep the selector's original bonus: a
+    keyword that appears in the question adds keyword_weight to the score.
+    Phrases are indexed by their first token, and a question token matches any
+    indexed keyword token it starts with ("manager" matches "managers").
+
+    On large libraries, terms found in more than max_df_ratio of all examples
+    are skipped: their idf is near zero, and walking their postings would
+    dominate the lookup.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, keyword_weight: float = 2.0,
+                 max_df_ratio: float = 0.5, min_docs_for_pruning: int = 100):
+        self.k1 = k1
+        self.b = b
+        self.keyword_weight = keyword_weight
+        self.max_df_ratio = max_df_ratio
+        self.min_docs_for_pruning = min_docs_for_pruning
+
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._doc_lengths: List[int] = []
+        self._total_length = 0
+        self._keyword_phrases: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+        self._max_keyword_token = 0
+        self._lock = threading.RLock()
+
+    def _add_locked(self, example: Dict):
+        """Index one example under the next document id; caller holds the lock"""
+        doc_id = len(self._doc_lengths)
+        terms = tokenize(example["question"])
+        for keyword in example.get("keywords", []):
+            keyword_tokens = tokenize(keyword)
+            terms.extend(keyword_tokens)
+            if keyword_tokens:
+                self._keyword_phrases[keyword_tokens[0]].append((doc_id, keyword.lower()))
+                self._max_keyword_token = max(self._max_keyword_token, len(keyword_tokens[0]))
+
+        for term in terms:
+            postings = self._postings[term]
+            postings[doc_id] = postings.get(doc_id, 0) + 1
+        self._doc_lengths.append(len(terms))
+        self._total_length += len(terms)
+
+    def ensure_built(self, examples: List[Dict]):
+        """Index any examples not yet in the index"""
+        with self._lock:
+            for example in examples[len(self._doc_lengths):]:
+                self._add_locked(example)
+
+    def add(self, example: Dict, position: int):
+        """Index an example added at runtime at position in the example list, if the index is built"""
+        with self._lock:
+            if self._doc_lengths and len(self._doc_lengths) == position:
+                self._add_locked(example)
+
+    def top_k(self, question: str, k: int) -> List[int]:
+        """Return indices of the k best-scoring examples, best first
+
+        Ties keep example order, and examples with no match fill any remaining
+        slots, as the original linear scan did.
+        """
+        question_lower = question.lower()
+        query_terms = set(tokenize(question))
+
+        with self._lock:
+            num_docs = len(self._doc_lengths)
+            if num_docs == 0 or k <= 0:
+                return []
+            avg_length = self._total_length / num_docs
+            scores: Dict[int, float] = defaultdict(float)
+
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                if num_docs >= self.min_docs_for_pruning and df > self.max_df_ratio * num_docs:
+                    continue
+                idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            matched_phrases = set()
+            for term in query_terms:
+                for length in range(1, min(len(term), self._max_keyword_token) + 1):
+                    for doc_id, phrase in self._keyword_phrases.get(term[:length], ()):
+                        if (doc_id, phrase) not in matched_phrases and phrase in question_lower:
+                            matched_phrases.add((doc_id, phrase))
+                            scores[doc_id] += self.keyword_weight
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+        selected = [doc_id for doc_id, _ in best]
+        if len(selected) < k:
+            chosen = set(selected)
+            selected.extend(i for i in range(num_docs) if i not in chosen)
+            selected = selected[:k]
+        return selected
+
+    def size(self) -> int:
+        """Get the number of indexed examples"""
+        return len(self._doc_lengths)
+
+# Global indexes, built lazily on first selection
+embedding_index = ExampleEmbeddingIndex()
+keyword_index = BM25ExampleIndex()
@@ -1,38 +1,19 @@
 import logging
 from typing import List, Dict
-from utils.few_shot_examples import get_examples
+from utils.few_shot_examples import get_examples, register_example_listener
+from utils.example_index import embedding_index, keyword_index
 from config.config import FEW_SHOT_CONFIG
 
 logger = logging.getLogger(__name__)
 
 def select_examples_by_keywords(question: str, num_examples: int = None) -> List[Dict]:
-    """Select most relevant examples based on keyword matching"""
+    """Select most relevant examples using the BM25 keyword index"""
     if num_examples is None:
         num_examples = FEW_SHOT_CONFIG['num_examples']
     
     examples = get_examples()
-    question_lower = question.lower()
-    scored_examples = []
-    
-    for example in examples:
-        score = 0
-        
-        # Score based on keyword matches
-        for keyword in example.get('keywords', []):
-            if keyword.lower() in question_lower:
-                score += 2  # Higher weight for exact keyword matches
-        
-        # Score based on common words in questions
-        question_words = set(question_lower.split())
-        example_words = set(example["question"].lower().split())
-        common_words = question_words.intersection(example_words)
-        score += len(common_words)
-        
-        scored_examples.append((score, example))
-    
-    # Sort by score and return top examples
-    scored_examples.sort(key=lambda x: x[0], reverse=True)
-    selected = [example for _, example in scored_examples[:num_examples]]
+    keyword_index.ensure_built(examples)
+    selected = [examples[i] for i in keyword_index.top_k(question, num_examples)]
     
     logger.info(f"Selected {len(selected)} examples for question: {question}")
     return selected
@@ -41,23 +22,15 @@ def select_examples_by_keywords(question: str, num_examples: int = None) -> List
 def select_examples_by_similarity(question: str, num_examples: int = None) -> List[Dict]:
     """Select examples using semantic similarity (requires sentence-transformers)"""
     try:
-        from sentence_transformers import SentenceTransformer
-        
         if num_examples is None:
             num_examples = FEW_SHOT_CONFIG['num_examples']
         
-        # Load a lightweight sentence transformer
-        model = SentenceTransformer('all-MiniLM-L6-v2')
+        # The embedding model and example matrix are built once and reused
         examples = get_examples()
-        
-        question_embedding = model.encode([question])
-        example_embeddings = model.encode([ex["question"] for ex in examples])
-        
-        # Calculate cosine similarity
-        similarities = model.similarity(question_embedding, example_embeddings)[0]
+        embedding_index.ensure_built(examples)
         
         # Get top similar examples
-        top_indices = similarities.argsort(descending=True)[:num_examples]
+        top_indices = embedding_index.top_k(question, num_examples)
         selected = [examples[i] for i in top_indices]
         
         logger.info(f"Selected {len(selected)} examples using semantic similarity")
@@ -67,6 +40,16 @@ def select_examples_by_similarity(question: str, num_examples: int = None) -> Li
         logger.warning("sentence-transformers not installed, falling back to keyword matching")
         return select_examples_by_keywords(question, num_examples)
 
+def _index_new_example(example: Dict, position: int):
+    """Keep the example indexes in step with add_custom_example"""
+    keyword_index.add(example, position)
+    try:
+        embedding_index.add(example, position)
+    except ImportError:
+        pass
+
+register_example_listener(_index_new_example)
+
 def select_relevant_examples(question: str, num_examples: int = None) -> List[Dict]:
     """Main function to select examples based on configuration"""
     if FEW_SHOT_CONFIG['use_semantic_similarity']:
@@ -1,3 +1,5 @@
+import threading
+
 # Few-shot examples for the employee database
 EMPLOYEE_DB_EXAMPLES = [
     {
@@ -42,6 +44,14 @@ EMPLOYEE_DB_EXAMPLES = [
     }
 ]
 
+# Callbacks notified with each newly added example (e.g. selector indexes)
+_example_listeners = []
+_examples_lock = threading.Lock()
+
+def register_example_listener(callback):
+    """Register a callback invoked with every example added at runtime and its position"""
+    _example_listeners.append(callback)
+
 def get_examples():
     """Return the list of few-shot examples"""
     return EMPLOYEE_DB_EXAMPLES
@@ -53,5 +63,10 @@ def add_custom_example(question, sql, keywords):
         "sql": sql,
         "keywords": keywords
     }
-    EMPLOYEE_DB_EXAMPLES.append(new_example)
+    # Listeners see additions one at a time, in list order
+    with _examples_lock:
+        EMPLOYEE_DB_EXAMPLES.append(new_example)
+        position = len(EMPLOYEE_DB_EXAMPLES) - 1
+        for listener in _example_listeners:
+            listener(new_example, position)
     return True
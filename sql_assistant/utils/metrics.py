@@ -0,0 +1,271 @@
+import bisect
+import math
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence
+from config.config import METRICS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency buckets exported to Prometheus
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Upper bounds of the decode throughput buckets, in tokens per second
+THROUGHPUT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+# Request path stages, in the order they are shown
+STAGES = (
+    "request",
+    "inference_queue",
+    "db-io_queue",
+    "cache_lookup",
+    "schema_context",
+    "example_selection",
+    "prompt_budget",
+    "generation",
+    "tokenization",
+    "prefill",
+    "decode",
+    "validation",
+    "cost_check",
+    "execute_query",
+    "format_results",
+)
+
+def nearest_rank(ordered: Sequence[float], q: float) -> float:
+    """The q-th nearest-rank percentile of a sorted, non-empty sequence"""
+    # The epsilon keeps float error (0.07 * 100 == 7.000000000000001) from rounding up a rank
+    return ordered[min(max(math.ceil(q * len(ordered) - 1e-9), 1), len(ordered)) - 1]
+
+class Histogram:
+    """Cumulative bucket counts for export plus a window of recent samples for percentiles"""
+
+    def __init__(self, buckets: Sequence[float], window_size: int = None):
+        self.buckets = tuple(buckets)
+        self._bucket_counts = [0] * (len(self.buckets) + 1)
+        self._recent = deque(maxlen=window_size or METRICS_CONFIG['window_size'])
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """Record one sample"""
+        with self._lock:
+            self._bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._recent.append(value)
+            self._count += 1
+            self._sum += value
+
+    def percentiles(self, quantiles: Sequence[float] = (0.5, 0.95, 0.99)) -> Dict[float, Optional[float]]:
+        """Nearest-rank percentiles over the recent window"""
+        with self._lock:
+            samples = sorted(self._recent)
+        if not samples:
+            return {q: None for q in quantiles}
+        return {q: nearest_rank(samples, q) for q in quantiles}
+
+    def snapshot(self) -> Dict:
+        """Count, sum, cumulative bucket counts and p50/p95/p99"""
+        percentiles = self.percentiles()
+        with self._lock:
+            cumulative = []
+            running = 0
+            for count in self._bucket_counts:
+                running += count
+                cumulative.append(running)
+            return {
+                "count": self._count,
+                "sum": self._sum,
+                "buckets": list(zip(self.buckets + (float("inf"),), cumulative)),
+                "p50": percentiles[0.5],
+                "p95": percentiles[0.95],
+                "p99": percentiles[0.99],
+            }
+
+class MetricsRegistry:
+    """Latency histograms per request stage, plus decode throughput"""
+
+    def __init__(self, window_size: int = None):
+        self.window_size = window_size
+        self.enabled = METRICS_CONFIG['enabled']
+        self._stages: Dict[str, Histogram] = {}
+        self.decode_throughput = Histogram(THROUGHPUT_BUCKETS, window_size)
+        self._lock = threading.Lock()
+        # Samples awaiting export to the parent process; None unless forwarding
+        self._forward: Optional[List[tuple]] = None
+
+    def _histogram(self, stage: str) -> Histogram:
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = Histogram(LATENCY_BUCKETS, self.window_size)
+                self._stages[stage] = histogram
+            return histogram
+
+    def observe(self, stage: str, seconds: float):
+        """Record how long one run of a stage took"""
+        if not self.enabled:
+            return
+        self._histogram(stage).observe(seconds)
+        with self._lock:
+            if self._forward is not None:
+                self._forward.append(("stage", stage, seconds))
+
+    @contextmanager
+    def time_stage(self, stage: str):
+        """Time the enclosed block as one run of a stage, including when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe_decode(self, tokens: int, seconds: float):
+        """Record a decode phase: its duration and its tokens per second"""
+        if not self.enabled or seconds <= 0:
+            return
+        self.observe("decode", seconds)
+        self.decode_throughput.observe(tokens / seconds)
+        with self._lock:
+            if self._forward is not None:
+                self._forward.append(("throughput", tokens / seconds))
+
+    def start_forwarding(self):
+        """Buffer every new sample for drain_forwarded(), e.g. in an inference worker process"""
+        with self._lock:
+            if self._forward is None:
+                self._forward = []
+
+    def drain_forwarded(self) -> List[tuple]:
+        """Take the samples buffered since the last drain"""
+        with self._lock:
+            samples = self._forward or []
+            if self._forward is not None:
+                self._forward = []
+            return samples
+
+    def merge(self, samples: List[tuple]):
+        """Record samples drained from another process's registry"""
+        for sample in samples:
+            if sample[0] == "stage":
+                self.observe(sample[1], sample[2])
+            elif self.enabled:
+                self.decode_throughput.observe(sample[1])
+
+    def snapshot(self) -> Dict:
+        """Histogram snapshots per stage, ordered as the request path runs"""
+        with self._lock:
+            stages = dict(self._stages)
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        ordered = sorted(stages, key=lambda stage: (order.get(stage, len(order)), stage))
+        return {
+            "stages": {stage: stages[stage].snapshot() for stage in ordered},
+            "decode_tokens_per_second": self.decode_throughput.snapshot(),
+        }
+
+    def format_summary(self) -> str:
+        """One line per stage with p50/p95/p99 in milliseconds, for the System Info tab"""
+        snapshot = self.snapshot()
+        lines = []
+        for stage, stats in snapshot["stages"].items():
+            if stats["count"]:
+                lines.append(f"  {stage}: p50 {stats['p50'] * 1000:.1f} ms, p95 {stats['p95'] * 1000:.1f} ms, "
+                             f"p99 {stats['p99'] * 1000:.1f} ms ({stats['count']} samples)")
+        throughput = snapshot["decode_tokens_per_second"]
+        if throughput["count"]:
+            lines.append(f"  decode throughput: p50 {throughput['p50']:.1f}, p95 {throughput['p95']:.1f}, "
+                         f"p99 {throughput['p99']:.1f} tokens/s")
+        return "\n".join(lines) if lines else "  no samples yet"
+
+    def render_prometheus(self) -> str:
+        """All histograms in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP sql_assistant_stage_duration_seconds Time spent in each request stage.",
+            "# TYPE sql_assistant_stage_duration_seconds histogram",
+        ]
+        for stage, stats in snapshot["stages"].items():
+            lines.extend(_histogram_lines("sql_assistant_stage_duration_seconds", stats, f'stage="{stage}"'))
+        lines.extend([
+            "# HELP sql_assistant_decode_tokens_per_second Decode throughput of each generate call.",
+            "# TYPE sql_assistant_decode_tokens_per_second histogram",
+        ])
+        lines.extend(_histogram_lines("sql_assistant_decode_tokens_per_second", snapshot["decode_tokens_per_second"]))
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Drop every recorded sample"""
+        with self._lock:
+            self._stages.clear()
+        self.decode_throughput = Histogram(THROUGHPUT_BUCKETS, self.window_size)
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+def _histogram_lines(name: str, stats: Dict, labels: str = "") -> List[str]:
+    """Bucket, sum and count lines for one histogram"""
+    prefix = labels + "," if labels else ""
+    lines = [f'{name}_bucket{{{prefix}le="{_format_bound(bound)}"}} {count}' for bound, count in stats["buckets"]]
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {stats['sum']}")
+    lines.append(f"{name}_count{suffix} {stats['count']}")
+    return lines
+
+# Process-wide registry shared by the generator, executor and UI
+metrics = MetricsRegistry()
+
+def time_stage(stage: str):
+    """Context manager timing one run of a request stage"""
+    return metrics.time_stage(stage)
+
+def observe_stage(stage: str, seconds: float):
+    """Record a stage duration measured elsewhere"""
+    metrics.observe(stage, seconds)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serve GET /metrics"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Metrics request: {format % args}")
+
+_metrics_server: Optional[ThreadingHTTPServer] = None
+
+def start_metrics_server(host: str = None, port: int = None) -> Optional[ThreadingHTTPServer]:
+    """Serve the Prometheus endpoint from a daemon thread; returns the running server"""
+    global _metrics_server
+    if _metrics_server is not None:
+        return _metrics_server
+    host = host or METRICS_CONFIG['http_host']
+    port = METRICS_CONFIG['http_port'] if port is None else port
+    try:
+        _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.error(f"Could not start metrics endpoint on {host}:{port}: {str(e)}")
+        return None
+    _metrics_server.daemon_threads = True
+    threading.Thread(target=_metrics_server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Metrics endpoint at http://{host}:{_metrics_server.server_address[1]}/metrics")
+    return _metrics_server
+
+def stop_metrics_server():
+    """Stop the Prometheus endpoint if it is running"""
+    global _metrics_server
+    if _metrics_server is not None:
+        _metrics_server.shutdown()
+        _metrics_server.server_close()
+        _metrics_server = None
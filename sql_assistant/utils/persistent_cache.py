@@ -0,0 +1,219 @@
+import os
+import sqlite3
+import threading
+import time
+import atexit
+import logging
+from typing import Dict, Optional
+from config.config import PERSISTENT_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class PersistentQueryStore:
+    """SQLite-backed tier for generated SQL that survives restarts
+
+    Reads go straight to the database; writes are queued and flushed by a
+    background thread so the request path never waits on disk.
+
+    Lookups match on schema fingerprint, so entries for other schema versions
+    are never served. They are not deleted on a schema change either: another
+    process sharing the file may still use them, or the schema may switch
+    back. Each flush removes them once older than stale_schema_seconds, and
+    trims the oldest entries beyond max_entries.
+    """
+
+    def __init__(self, path: str = None, flush_interval: float = None, ttl_seconds: float = None,
+                 max_entries: int = None, stale_schema_seconds: float = None):
+        self.path = path or PERSISTENT_CACHE_CONFIG['path']
+        self.flush_interval = flush_interval if flush_interval is not None else PERSISTENT_CACHE_CONFIG['flush_interval_seconds']
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else PERSISTENT_CACHE_CONFIG.get('ttl_seconds')
+        self.max_entries = max_entries if max_entries is not None else PERSISTENT_CACHE_CONFIG.get('max_entries')
+        self.stale_schema_seconds = (stale_schema_seconds if stale_schema_seconds is not None
+                                     else PERSISTENT_CACHE_CONFIG.get('stale_schema_seconds'))
+
+        self._connection = None
+        self._lock = threading.RLock()
+        self._pending: Dict[str, tuple] = {}
+        self._wake = threading.Event()
+        self._writer = None
+        self._closed = False
+        self._current_fingerprint = None
+
+        # Metrics
+        self._reads = 0
+        self._read_hits = 0
+        self._writes = 0
+        self._invalidated = 0
+        self._errors = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use; caller holds the lock"""
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS query_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    schema_fingerprint TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    sql TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL
+                )"""
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_query_cache_fingerprint ON query_cache (schema_fingerprint)"
+            )
+            self._connection.commit()
+            logger.info(f"Opened persistent query cache at {self.path}")
+        return self._connection
+
+    def _ensure_writer(self):
+        """Start the write-behind thread on first write; caller holds the lock"""
+        if self._writer is None:
+            atexit.register(self.close)
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._run_writer, name="query-cache-writer", daemon=True)
+            self._writer.start()
+
+    def _run_writer(self):
+        """Flush queued writes every flush_interval seconds until closed"""
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def use_schema(self, fingerprint: str):
+        """Record the schema version in use; entries for others expire on later flushes"""
+        with self._lock:
+            self._current_fingerprint = fingerprint
+
+    def _expire_locked(self, connection: sqlite3.Connection) -> int:
+        """Delete expired, stale-schema and excess entries; caller holds the lock"""
+        now = time.time()
+        removed = connection.execute(
+            "DELETE FROM query_cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        ).rowcount
+        if self._current_fingerprint is not None and self.stale_schema_seconds is not None:
+            removed += connection.execute(
+                "DELETE FROM query_cache WHERE schema_fingerprint != ? AND created_at <= ?",
+                (self._current_fingerprint, now - self.stale_schema_seconds)
+            ).rowcount
+        if self.max_entries:
+            removed += connection.execute(
+                "DELETE FROM query_cache WHERE cache_key IN "
+                "(SELECT cache_key FROM query_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+        return removed
+
+    def get(self, cache_key: str, fingerprint: str) -> Optional[str]:
+        """Look up persisted SQL for a key under the given schema fingerprint"""
+        with self._lock:
+            self._reads += 1
+            pending = self._pending.get(cache_key)
+            if pending is not None:
+                row = (pending[3], pending[5])
+            else:
+                try:
+                    row = self._connect().execute(
+                        "SELECT sql, expires_at FROM query_cache WHERE cache_key = ? AND schema_fingerprint = ?",
+                        (cache_key, fingerprint)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    self._errors += 1
+                    logger.warning(f"Persistent cache read failed: {e}")
+                    return None
+
+            if row is None:
+                return None
+            sql, expires_at = row
+            if expires_at is not None and expires_at <= time.time():
+                return None
+            self._read_hits += 1
+            return sql
+
+    def put(self, cache_key: str, fingerprint: str, question: str, sql: str):
+        """Queue a write; it reaches disk on the next background flush"""
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            if self._closed:
+                return
+            self._pending[cache_key] = (cache_key, fingerprint, question, sql, now, expires_at)
+            self._ensure_writer()
+
+    def flush(self):
+        """Write every queued entry to disk in one transaction"""
+        with self._lock:
+            if not self._pending:
+                return
+            rows = list(self._pending.values())
+            try:
+                connection = self._connect()
+                connection.executemany(
+                    "INSERT OR REPLACE INTO query_cache "
+                    "(cache_key, schema_fingerprint, question, sql, created_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._invalidated += self._expire_locked(connection)
+                connection.commit()
+                self._pending.clear()
+                self._writes += len(rows)
+            except sqlite3.Error as e:
+                self._errors += 1
+                logger.warning(f"Persistent cache flush failed: {e}")
+
+    def clear(self):
+        """Delete every persisted entry"""
+        with self._lock:
+            self._pending.clear()
+            try:
+                self._connect().execute("DELETE FROM query_cache")
+                self._connection.commit()
+            except sqlite3.Error as e:
+                self._errors += 1
+                logger.warning(f"Persistent cache clear failed: {e}")
+
+    def close(self):
+        """Flush outstanding writes and close the database"""
+        with self._lock:
+            if self._closed:
+                return
+            self.flush()
+            self._closed = True
+            self._wake.set()
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def get_stats(self) -> Dict:
+        """Get persistent tier statistics"""
+        with self._lock:
+            stored = 0
+            if self._connection is not None:
+                try:
+                    stored = self._connection.execute("SELECT COUNT(*) FROM query_cache").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            return {
+                "persistent_path": self.path,
+                "persistent_entries": stored,
+                "persistent_pending_writes": len(self._pending),
+                "persistent_reads": self._reads,
+                "persistent_hits": self._read_hits,
+                "persistent_writes": self._writes,
+                "persistent_invalidated": self._invalidated,
+                "persistent_errors": self._errors,
+            }
+
+def create_persistent_store() -> Optional[PersistentQueryStore]:
+    """Build the configured persistent store, or None if the tier is disabled"""
+    if not PERSISTENT_CACHE_CONFIG['enabled']:
+        return None
+    return PersistentQueryStore()
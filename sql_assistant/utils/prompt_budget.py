@@ -0,0 +1,109 @@
+import threading
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+from config.config import PROMPT_BUDGET_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class TokenCounter:
+    """Token counts per prompt fragment, memoised since tables and examples recur across requests"""
+
+    def __init__(self, count_fn: Callable[[str], int], max_entries: int = None):
+        self.count_fn = count_fn
+        self.max_entries = max_entries or PROMPT_BUDGET_CONFIG['token_cache_size']
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+
+    def count(self, text: str) -> int:
+        """Number of tokens in text"""
+        with self._lock:
+            tokens = self._counts.get(text)
+            if tokens is not None:
+                self._counts.move_to_end(text)
+                self._hits += 1
+                return tokens
+            self._misses += 1
+
+        tokens = self.count_fn(text)
+        with self._lock:
+            self._counts[text] = tokens
+            if len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def get_stats(self) -> Dict:
+        """Get token-count cache statistics"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "token_cache_size": len(self._counts),
+                "token_cache_hit_rate": self._hits / lookups if lookups else 0.0,
+            }
+
+class PromptBudget:
+    """Greedily fit optional prompt components into a token budget
+
+    Required components (the question, the instruction text) are always kept,
+    even if they alone exceed the budget. Optional components are offered in
+    priority order and each is kept if it still fits, so a large low-priority
+    item never crowds out smaller ones after it. An optional keep_if(kept, i)
+    can rule an item out given the indices kept before it.
+    """
+
+    def __init__(self, counter: TokenCounter, max_tokens: int = None, margin_tokens: int = None):
+        self.counter = counter
+        self.max_tokens = max_tokens or PROMPT_BUDGET_CONFIG['max_prompt_tokens']
+        self.margin_tokens = margin_tokens if margin_tokens is not None else PROMPT_BUDGET_CONFIG['margin_tokens']
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._prompts = 0
+        self._total_tokens = 0
+        self._dropped = 0
+        self._over_budget = 0
+
+    def fit(self, required: List[str], optional: List[str],
+            keep_if: Callable[[List[int], int], bool] = None) -> Tuple[List[int], int]:
+        """Return the indices of optional components that fit, and the estimated prompt tokens
+
+        Fragments are counted separately; the margin absorbs the few tokens
+        that joining them can add or save.
+        """
+        budget = self.max_tokens - self.margin_tokens
+        used = sum(self.counter.count(text) for text in required)
+        kept = []
+        for i, text in enumerate(optional):
+            if keep_if is not None and not keep_if(kept, i):
+                continue
+            tokens = self.counter.count(text)
+            if used + tokens <= budget:
+                kept.append(i)
+                used += tokens
+
+        with self._lock:
+            self._prompts += 1
+            self._total_tokens += used
+            self._dropped += len(optional) - len(kept)
+            if used > budget:
+                self._over_budget += 1
+        if len(kept) < len(optional):
+            logger.info(f"Prompt budget: kept {len(kept)} of {len(optional)} optional components ({used}/{budget} tokens)")
+        return kept, used
+
+    def get_stats(self) -> Dict:
+        """Get prompt size statistics"""
+        with self._lock:
+            stats = {
+                "prompt_budget_tokens": self.max_tokens,
+                "prompts_built": self._prompts,
+                "avg_prompt_tokens": self._total_tokens / self._prompts if self._prompts else 0.0,
+                "components_dropped": self._dropped,
+                "prompts_over_budget": self._over_budget,
+            }
+        stats.update(self.counter.get_stats())
+        return stats
@@ -1,65 +1,233 @@
 import hashlib
+import threading
+import time
 import logging
+from collections import OrderedDict
 from typing import Dict, Optional
 from config.config import FEW_SHOT_CONFIG
+from utils.persistent_cache import PersistentQueryStore, create_persistent_store
+from utils.question_index import QuestionSimilarityIndex, normalize_question
 
 logger = logging.getLogger(__name__)
 
+# Rough per-entry bookkeeping cost (entry object, dict slot, key string header)
+ENTRY_OVERHEAD_BYTES = 200
+
+class _CacheEntry:
+    __slots__ = ("sql", "expires_at", "size", "fingerprint", "normalized")
+
+    def __init__(self, sql: str, expires_at: Optional[float], size: int, fingerprint: str, normalized: str):
+        self.sql = sql
+        self.expires_at = expires_at
+        self.size = size
+        self.fingerprint = fingerprint
+        self.normalized = normalized
+
 class QueryCache:
-    def __init__(self, max_size: int = None):
+    def __init__(self, max_size: int = None, ttl_seconds: float = None, max_bytes: int = None,
+                 persistent_store: PersistentQueryStore = None):
         self.max_size = max_size or FEW_SHOT_CONFIG['max_cache_size']
-        self.cache: Dict[str, str] = {}
-        self.access_order = []  # For LRU eviction
-    
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else FEW_SHOT_CONFIG.get('cache_ttl_seconds')
+        self.max_bytes = max_bytes if max_bytes is not None else FEW_SHOT_CONFIG.get('max_cache_bytes')
+        self.persistent_store = persistent_store
+        self.similarity_threshold = FEW_SHOT_CONFIG.get('similarity_threshold', 0.9)
+
+        # Ordered oldest-to-newest access, so LRU eviction is popitem(last=False)
+        self.cache: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+        # Second-level lookups: canonicalized question text, then trigram similarity
+        self._normalized_keys: Dict[tuple, str] = {}
+        self._similarity_index = QuestionSimilarityIndex()
+
+        # Schema text -> fingerprint; the schema only changes on DDL, so this stays tiny
+        self._schema_hashes: "OrderedDict[str, str]" = OrderedDict()
+        self._max_schema_versions = 8
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._persistent_hits = 0
+        self._normalized_hits = 0
+        self._similar_hits = 0
+
+    def schema_fingerprint(self, schema: str) -> str:
+        """Hash a schema once per version and reuse it for every later lookup"""
+        with self._lock:
+            fingerprint = self._schema_hashes.get(schema)
+            if fingerprint is None:
+                fingerprint = hashlib.md5(schema.encode()).hexdigest()
+                self._schema_hashes[schema] = fingerprint
+                if len(self._schema_hashes) > self._max_schema_versions:
+                    self._schema_hashes.popitem(last=False)
+                if self.persistent_store is not None:
+                    self.persistent_store.use_schema(fingerprint)
+            return fingerprint
+
     def _generate_key(self, question: str, schema: str) -> str:
         """Generate a cache key from question and schema"""
-        combined = f"{question}|{schema}"
+        combined = f"{question}|{self.schema_fingerprint(schema)}"
         return hashlib.md5(combined.encode()).hexdigest()
-    
+
+    def cache_key(self, question: str, schema: str) -> str:
+        """Key this question would be cached under for this schema"""
+        return self._generate_key(question, schema)
+
+    def _store(self, key: str, sql: str, fingerprint: str, normalized: str):
+        """Insert an entry into the in-memory tier and enforce bounds"""
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        size = len(key) + len(sql.encode()) + len(normalized) + ENTRY_OVERHEAD_BYTES
+
+        with self._lock:
+            if key in self.cache:
+                self._remove(key)
+            self.cache[key] = _CacheEntry(sql, expires_at, size, fingerprint, normalized)
+            self._bytes += size
+            self._normalized_keys[(fingerprint, normalized)] = key
+            if FEW_SHOT_CONFIG.get('similarity_cache_lookup', False):
+                self._similarity_index.add(key, fingerprint, normalized)
+            self._evict_if_needed()
+
+    def _remove(self, key: str) -> _CacheEntry:
+        """Drop an entry, its size accounting and its secondary index entries; caller holds the lock"""
+        entry = self.cache.pop(key)
+        self._bytes -= entry.size
+        normalized_key = (entry.fingerprint, entry.normalized)
+        if self._normalized_keys.get(normalized_key) == key:
+            del self._normalized_keys[normalized_key]
+        self._similarity_index.remove(key)
+        return entry
+
+    def _get_live_entry(self, key: str) -> Optional[_CacheEntry]:
+        """Return an unexpired entry and mark it recently used; caller holds the lock"""
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self._expirations += 1
+            return None
+        # Move to end for LRU
+        self.cache.move_to_end(key)
+        return entry
+
+    def _evict_if_needed(self):
+        """Evict least recently used entries until within count and byte bounds"""
+        while self.cache and (len(self.cache) > self.max_size or
+                              (self.max_bytes and self._bytes > self.max_bytes)):
+            oldest_key = next(iter(self.cache))
+            self._remove(oldest_key)
+            self._evictions += 1
+            logger.info("Evicted oldest cache entry")
+
     def get(self, question: str, schema: str) -> Optional[str]:
         """Get cached SQL query"""
         if not FEW_SHOT_CONFIG['cache_enabled']:
             return None
-        
+
         key = self._generate_key(question, schema)
-        
-        if key in self.cache:
-            # Move to end for LRU
-            self.access_order.remove(key)
-            self.access_order.append(key)
+        fingerprint = self.schema_fingerprint(schema)
+        normalized = normalize_question(question)
+
+        with self._lock:
+            entry = self._get_live_entry(key)
+            if entry is not None:
+                self._hits += 1
+
+        if entry is not None:
             logger.info(f"Cache hit for question: {question[:50]}...")
-            return self.cache[key]
-        
+            return entry.sql
+
+        # Read through to the persistent tier and promote what it has
+        if self.persistent_store is not None:
+            sql = self.persistent_store.get(key, fingerprint)
+            if sql is not None:
+                self._store(key, sql, fingerprint, normalized)
+                with self._lock:
+                    self._hits += 1
+                    self._persistent_hits += 1
+                logger.info(f"Persistent cache hit for question: {question[:50]}...")
+                return sql
+
+        with self._lock:
+            # Same question modulo case, whitespace and punctuation
+            if FEW_SHOT_CONFIG.get('normalized_cache_lookup', False):
+                normalized_key = self._normalized_keys.get((fingerprint, normalized))
+                entry = self._get_live_entry(normalized_key) if normalized_key else None
+                if entry is not None:
+                    self._hits += 1
+                    self._normalized_hits += 1
+                    logger.info(f"Normalized cache hit for question: {question[:50]}...")
+                    return entry.sql
+
+            # Near-duplicate question
+            if FEW_SHOT_CONFIG.get('similarity_cache_lookup', False):
+                match = self._similarity_index.find(fingerprint, normalized, self.similarity_threshold)
+                entry = self._get_live_entry(match[0]) if match else None
+                if entry is not None:
+                    self._hits += 1
+                    self._similar_hits += 1
+                    logger.info(f"Similar cache hit (score {match[1]:.2f}) for question: {question[:50]}...")
+                    return entry.sql
+
+            self._misses += 1
         return None
-    
+
     def set(self, question: str, schema: str, sql: str):
         """Cache a SQL query"""
         if not FEW_SHOT_CONFIG['cache_enabled']:
             return
-        
+
         key = self._generate_key(question, schema)
-        
-        # Evict oldest if cache is full
-        if len(self.cache) >= self.max_size and key not in self.cache:
-            oldest_key = self.access_order.pop(0)
-            del self.cache[oldest_key]
-            logger.info("Evicted oldest cache entry")
-        
-        self.cache[key] = sql
-        if key not in self.access_order:
-            self.access_order.append(key)
-        
+        fingerprint = self.schema_fingerprint(schema)
+        self._store(key, sql, fingerprint, normalize_question(question))
+        if self.persistent_store is not None:
+            self.persistent_store.put(key, fingerprint, question, sql)
+
         logger.info(f"Cached SQL for question: {question[:50]}...")
-    
+
     def clear(self):
         """Clear the cache"""
-        self.cache.clear()
-        self.access_order.clear()
+        with self._lock:
+            self.cache.clear()
+            self._bytes = 0
+            self._normalized_keys.clear()
+            self._similarity_index.clear()
+        if self.persistent_store is not None:
+            self.persistent_store.clear()
         logger.info("Cache cleared")
-    
+
     def size(self) -> int:
         """Get current cache size"""
         return len(self.cache)
 
+    def get_stats(self) -> Dict:
+        """Get hit, miss and eviction counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            stats = {
+                "cache_size": len(self.cache),
+                "max_size": self.max_size,
+                "cache_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / lookups) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "exact_hits": self._hits - self._persistent_hits - self._normalized_hits - self._similar_hits,
+                "persistent_hits": self._persistent_hits,
+                "normalized_hits": self._normalized_hits,
+                "similar_hits": self._similar_hits,
+                "similarity_threshold": self.similarity_threshold,
+            }
+        if self.persistent_store is not None:
+            stats.update(self.persistent_store.get_stats())
+        return stats
+
 # Global cache instance
-query_cache = QueryCache()
+query_cache = QueryCache(persistent_store=create_persistent_store())
@@ -1,20 +1,67 @@
-def format_query_results(results):
-    """Format query results for display"""
+from typing import Dict, Iterable, Iterator, List, Optional
+
+def _to_text(value) -> str:
+    """Render one cell; strings pass through without a str() call"""
+    return value if type(value) is str else str(value)
+
+def _render_rows(headers: List[str], rows: List[Dict], widths: Optional[List[int]] = None,
+                 include_header: bool = True) -> str:
+    """Format rows column-wise into aligned lines joined in one pass"""
+    # Convert each column in one sweep, then size it
+    columns = [[_to_text(row[header]) for row in rows] for header in headers]
+    if widths is None:
+        widths = [max(len(header), max(map(len, column), default=0)) for header, column in zip(headers, columns)]
+
+    # Last column is left unpadded so lines carry no trailing spaces
+    row_format = " | ".join([f"{{:<{width}}}" for width in widths[:-1]] + ["{}"])
+    lines = []
+    if include_header:
+        header_line = row_format.format(*headers)
+        lines.append(header_line)
+        lines.append("-" * len(header_line))
+    lines.extend(row_format.format(*cells) for cells in zip(*columns))
+    return "\n".join(lines) + "\n"
+
+def format_query_results(results, page: int = 0, page_size: int = None):
+    """Format query results for display
+
+    With page_size set, only that page of a result list is rendered.
+    """
     if isinstance(results, list):
         if len(results) == 0:
             return "No results found."
-        
-        # Create header row
-        headers = results[0].keys()
-        formatted = " | ".join(headers) + "\n"
-        formatted += "-" * len(formatted) + "\n"
-        
-        # Add data rows
-        for row in results:
-            formatted += " | ".join(str(value) for value in row.values()) + "\n"
-        
-        return formatted
+
+        headers = list(results[0].keys())
+        if page_size:
+            start = page * page_size
+            visible = results[start:start + page_size]
+            if not visible:
+                return "No results on this page."
+            formatted = _render_rows(headers, visible)
+            return formatted + f"Showing rows {start + 1}-{start + len(visible)} of {len(results)}\n"
+
+        return _render_rows(headers, results)
     elif isinstance(results, dict) and "error" in results:
         return f"Error: {results['error']}"
     else:
         return str(results)
+
+def format_result_stream(chunks: Iterable[List[Dict]]) -> Iterator[str]:
+    """Render a stream of row chunks incrementally
+
+    Column widths come from the first chunk; later values that are wider
+    simply extend their line rather than forcing a re-render.
+    """
+    headers = None
+    widths = None
+    for rows in chunks:
+        if not rows:
+            continue
+        if headers is None:
+            headers = list(rows[0].keys())
+            widths = [max(len(header), max(len(_to_text(row[header])) for row in rows)) for header in headers]
+            yield _render_rows(headers, rows, widths)
+        else:
+            yield _render_rows(headers, rows, widths, include_header=False)
+    if headers is None:
+        yield "No results found."
@@ -1,73 +1,231 @@
 import re
 import logging
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Question words mapped onto the vocabulary used in table and column names
+SCHEMA_SYNONYMS = {
+    'worker': 'employee', 'staff': 'employee', 'person': 'employee', 'people': 'employee',
+    'pay': 'salary', 'paid': 'salary', 'wage': 'salary', 'income': 'salary', 'earn': 'salary',
+    'earning': 'salary', 'money': 'salary',
+    'division': 'department', 'dept': 'department',
+    'position': 'title', 'job': 'title', 'role': 'title',
+    'head': 'manager', 'lead': 'manager', 'boss': 'manager', 'manage': 'manager', 'managed': 'manager',
+    'hired': 'hire', 'born': 'birth', 'birthday': 'birth', 'age': 'birth',
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+_CREATE_TABLE = re.compile(r'CREATE TABLE\s+`?(\w+)`?', re.IGNORECASE)
+_PRIMARY_KEY = re.compile(r'PRIMARY KEY\s*\(([^)]*)\)', re.IGNORECASE)
+_FOREIGN_KEY = re.compile(r'FOREIGN KEY\s*\(`?(\w+)`?\)\s*REFERENCES\s*`?(\w+)`?\s*\(`?(\w+)`?\)', re.IGNORECASE)
+_CONSTRAINT = re.compile(r'(PRIMARY\s+KEY|FOREIGN\s+KEY|UNIQUE|KEY|INDEX|CONSTRAINT)\b', re.IGNORECASE)
+
+def _stem(word: str) -> str:
+    """Very light plural stripping so 'salaries' and 'salary' compare equal"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+def _terms(text: str) -> List[str]:
+    """Stemmed word tokens of a question or identifier"""
+    return [_stem(word) for word in _WORD.findall(text.lower().replace('_', ' '))]
+
+class TableInfo:
+    """One table parsed out of the schema text"""
+
+    def __init__(self, name: str, block: str):
+        self.name = name
+        self.block = block
+        self.columns: List[str] = []
+        self.primary_key: List[str] = []
+        self.foreign_keys: List[Tuple[str, str, str]] = []
+
+class SchemaModel:
+    """Schema parsed once into tables, a term index and a foreign-key join graph"""
+
+    def __init__(self, schema: str):
+        self.tables: Dict[str, TableInfo] = {}
+        self._parse(schema)
+        self.graph: Dict[str, Set[str]] = {name: set() for name in self.tables}
+        self._build_graph()
+        self._build_term_index()
+
+    def _parse(self, schema: str):
+        """Split CREATE TABLE blocks and read columns and keys"""
+        current = None
+        lines: List[str] = []
+        for line in schema.split('\n') + ['']:
+            line_stripped = line.strip()
+            match = _CREATE_TABLE.match(line_stripped)
+            if match:
+                current, lines = match.group(1), [line]
+                continue
+            if current is None:
+                continue
+            lines.append(line)
+            if line_stripped.startswith(')'):
+                self._add_table(current, '\n'.join(lines))
+                current, lines = None, []
+
+    def _add_table(self, name: str, block: str):
+        """Record one table's columns, primary key and foreign keys"""
+        table = TableInfo(name, block)
+        for line in block.split('\n')[1:-1]:
+            definition = line.strip().rstrip(',')
+            if not definition:
+                continue
+            if _CONSTRAINT.match(definition):
+                primary = _PRIMARY_KEY.search(definition)
+                if primary:
+                    table.primary_key = [c.strip(' `') for c in primary.group(1).split(',')]
+                for column, ref_table, ref_column in _FOREIGN_KEY.findall(definition):
+                    table.foreign_keys.append((column, ref_table, ref_column))
+                continue
+            table.columns.append(definition.split()[0].strip('`'))
+        self.tables[name] = table
+
+    def _build_graph(self):
+        """Undirected join graph from declared foreign keys, or shared key columns if none are declared"""
+        declared = any(table.foreign_keys for table in self.tables.values())
+        if declared:
+            for table in self.tables.values():
+                for _, ref_table, _ in table.foreign_keys:
+                    if ref_table in self.graph and ref_table != table.name:
+                        self.graph[table.name].add(ref_table)
+                        self.graph[ref_table].add(table.name)
+            return
+
+        # No declared keys: link tables that share an id-like column name
+        owners: Dict[str, List[str]] = {}
+        for table in self.tables.values():
+            for column in table.columns:
+                if column == 'id' or column.endswith(('_id', '_no')):
+                    owners.setdefault(column, []).append(table.name)
+        for names in owners.values():
+            for a in names:
+                for b in names:
+                    if a != b:
+                        self.graph[a].add(b)
+                        self.graph[b].add(a)
+
+    def _build_term_index(self):
+        """Index table-name and column-name terms, skipping terms common to most tables"""
+        self.name_index: Dict[str, Set[str]] = {}
+        self.name_part_index: Dict[str, Set[str]] = {}
+        self.column_index: Dict[str, Set[str]] = {}
+        for table in self.tables.values():
+            self.name_index.setdefault(_stem(table.name.lower()), set()).add(table.name)
+            for term in _terms(table.name):
+                self.name_part_index.setdefault(term, set()).add(table.name)
+            for column in table.columns:
+                for term in _terms(column):
+                    self.column_index.setdefault(term, set()).add(table.name)
+
+        # Terms such as 'no', 'name' or 'date' that recur across tables say nothing about relevance
+        max_tables = max(1, min(len(self.tables) // 4, 5))
+        self.column_index = {term: names for term, names in self.column_index.items()
+                             if len(names) <= max_tables and len(term) > 2}
+
+    def match_tables(self, question: str) -> Set[str]:
+        """Tables named, or uniquely described, by words in the question"""
+        matched: Set[str] = set()
+        for term in _terms(question):
+            term = SCHEMA_SYNONYMS.get(term, term)
+            # Strongest signal wins: whole table name, then column name, then part of a table name
+            for index in (self.name_index, self.column_index, self.name_part_index):
+                names = index.get(term)
+                if names:
+                    matched.update(names)
+                    break
+        return matched
+
+    def _shortest_path(self, start: str, goal: str) -> List[str]:
+        """Breadth-first shortest join path between two tables"""
+        previous = {start: None}
+        frontier = [start]
+        while frontier and goal not in previous:
+            next_frontier = []
+            for name in frontier:
+                for neighbor in sorted(self.graph[name]):
+                    if neighbor not in previous:
+                        previous[neighbor] = name
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        if goal not in previous:
+            return []
+        path = [goal]
+        while previous[path[-1]] is not None:
+            path.append(previous[path[-1]])
+        return path
+
+    def join_tables(self, question: str) -> Set[str]:
+        """Matched tables and the join paths connecting them, without which they can't be queried together"""
+        matched = self.match_tables(question)
+        if not matched and self.tables:
+            # Nothing recognisable: fall back to the best-connected table
+            matched = {max(self.tables, key=lambda name: (len(self.graph[name]), -list(self.tables).index(name)))}
+
+        joined = set(matched)
+        ordered = [name for name in self.tables if name in matched]
+        for i, start in enumerate(ordered):
+            for goal in ordered[i + 1:]:
+                joined.update(self._shortest_path(start, goal))
+        return joined
+
+    def relevant_tables(self, question: str) -> Set[str]:
+        """Matched tables, the join paths connecting them, and the tables they reference"""
+        relevant = self.join_tables(question)
+
+        # Referenced tables carry the labels (names, titles) behind foreign-key ids
+        for name in list(relevant):
+            for _, ref_table, _ in self.tables[name].foreign_keys:
+                if ref_table in self.tables:
+                    relevant.add(ref_table)
+        return relevant
+
+    def ranked_tables(self, question: str) -> List[str]:
+        """Every table, most relevant first: matched, then joined or referenced, then by join distance"""
+        matched = self.match_tables(question)
+        relevant = self.relevant_tables(question)
+
+        # Breadth-first join distance from the tables the question is about
+        distance = {name: 0 for name in (matched or relevant)}
+        frontier = list(distance)
+        while frontier:
+            next_frontier = []
+            for name in frontier:
+                for neighbor in sorted(self.graph[name]):
+                    if neighbor not in distance:
+                        distance[neighbor] = distance[name] + 1
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+
+        position = {name: i for i, name in enumerate(self.tables)}
+        unreachable = len(self.tables) + 1
+        return sorted(self.tables, key=lambda name: (
+            0 if name in matched else 1 if name in relevant else 2,
+            distance.get(name, unreachable),
+            position[name],
+        ))
+
+    def render(self, table_names: Set[str]) -> str:
+        """Schema text for the given tables, in original order"""
+        return '\n\n'.join(table.block for table in self.tables.values() if table.name in table_names)
+
+@lru_cache(maxsize=8)
+def get_schema_model(schema: str) -> SchemaModel:
+    """Parse a schema once per version"""
+    return SchemaModel(schema)
+
 def optimize_schema_context(schema: str, question: str) -> str:
     """Reduce schema size by including only relevant tables"""
-    question_lower = question.lower()
-    
-    # Keywords that suggest which tables might be relevant
-    table_keywords = {
-        'employees': ['employee', 'worker', 'staff', 'person', 'name', 'first', 'last', 'gender', 'birth', 'hire'],
-        'departments': ['department', 'dept', 'division'],
-        'salaries': ['salary', 'pay', 'wage', 'income', 'earn', 'money'],
-        'titles': ['title', 'position', 'job', 'role'],
-        'dept_emp': ['department', 'work', 'assign', 'belong'],
-        'dept_manager': ['manager', 'head', 'lead', 'boss', 'manage']
-    }
-    
-    relevant_tables = set()
-    
-    # Check which tables are relevant based on keywords
-    for table, keywords in table_keywords.items():
-        if any(keyword in question_lower for keyword in keywords):
-            relevant_tables.add(table)
-    
-    # Always include employees as it's central to most queries
-    relevant_tables.add('employees')
-    
-    # If asking about relationships, include junction tables
-    if any(word in question_lower for word in ['department', 'manager', 'title', 'salary']):
-        if 'department' in question_lower:
-            relevant_tables.update(['departments', 'dept_emp'])
-        if 'manager' in question_lower:
-            relevant_tables.add('dept_manager')
-        if 'title' in question_lower:
-            relevant_tables.add('titles')
-        if 'salary' in question_lower:
-            relevant_tables.add('salaries')
-    
-    # Filter schema to include only relevant tables
-    schema_lines = schema.split('\n')
-    filtered_schema = []
-    include_line = False
-    current_table = None
-    
-    for line in schema_lines:
-        line_stripped = line.strip()
-        
-        if line_stripped.startswith('CREATE TABLE'):
-            # Extract table name - handle different formats
-            match = re.search(r'CREATE TABLE\s+(\w+)', line, re.IGNORECASE)
-            if match:
-                current_table = match.group(1)
-                include_line = current_table in relevant_tables
-            else:
-                include_line = False
-        elif line_stripped.startswith(');') or line_stripped == ')':
-            # End of table definition
-            if include_line:
-                filtered_schema.append(line)
-            include_line = False
-            current_table = None
-            continue
-        
-        if include_line or line_stripped == '':
-            filtered_schema.append(line)
-    
-    result = '\n'.join(filtered_schema)
+    model = get_schema_model(schema)
+    relevant_tables = model.relevant_tables(question)
+    result = model.render(relevant_tables)
     logger.info(f"Schema optimized: included tables {relevant_tables}")
     return result
 
@@ -145,6 +303,27 @@ def extract_table_names(schema: str) -> List[str]:
                 tables.append(match.group(1))
     return tables
 
+_FROM_CLAUSE = re.compile(
+    r'\bFROM\s+(.*?)(?=\b(?:WHERE|GROUP|ORDER|HAVING|LIMIT|UNION|JOIN|INNER|LEFT|RIGHT|CROSS|'
+    r'STRAIGHT_JOIN|NATURAL|ON|USING|WINDOW|FOR)\b|[();]|$)',
+    re.IGNORECASE | re.DOTALL)
+_JOIN_TABLE = re.compile(r'\bJOIN\s+([`\w.$]+)', re.IGNORECASE)
+
+def _bare_table_name(reference: str) -> str:
+    """Strip backticks and any database qualifier from a table reference"""
+    return reference.replace('`', '').split('.')[-1].lower()
+
+def extract_query_tables(sql_query: str) -> List[str]:
+    """Extract the tables a query reads from its FROM and JOIN clauses"""
+    tables = []
+    for match in _FROM_CLAUSE.finditer(sql_query):
+        for reference in match.group(1).split(','):
+            reference = reference.strip()
+            if reference and reference[0] not in '(\'"':
+                tables.append(_bare_table_name(reference.split()[0]))
+    tables.extend(_bare_table_name(name) for name in _JOIN_TABLE.findall(sql_query))
+    return sorted(set(tables))
+
 def clean_generated_sql(sql_text: str) -> str:
     """Clean up generated SQL text"""
     if not sql_text:
@@ -162,3 +341,106 @@ def clean_generated_sql(sql_text: str) -> str:
     sql_text = ' '.join(sql_text.split())
     
     return sql_text.strip()
+
+_AGGREGATE = re.compile(r'\b(COUNT|SUM|AVG|MIN|MAX|GROUP_CONCAT|STD|STDDEV|VARIANCE)\s*\(|\bGROUP\s+BY\b|\bDISTINCT\b', re.IGNORECASE)
+_TRAILING_LIMIT = re.compile(r'\bLIMIT\s+(\d+)(?:\s*,\s*(\d+))?(?:\s+OFFSET\s+(\d+))?\s*;?\s*$', re.IGNORECASE)
+
+def _top_level_sql(sql_query: str) -> str:
+    """SQL with string literals and parenthesized contents blanked out"""
+    result = []
+    depth = 0
+    quote = None
+    for char in sql_query:
+        if quote:
+            if char == quote:
+                quote = None
+            continue
+        if char in ("'", '"', '`'):
+            quote = char
+            result.append(' ')
+        elif char == '(':
+            if depth == 0:
+                result.append('(')
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                result.append(')')
+        elif depth == 0:
+            result.append(char)
+    return ''.join(result)
+
+def outer_select_position(sql_query: str) -> Optional[int]:
+    """Index of the SELECT keyword opening the outer query block, or None if there is none
+
+    Leading parentheses (as in a parenthesized UNION) are skipped, and for a WITH
+    query it is the SELECT following the common table expressions.
+    """
+    start = re.match(r'[\s(]*', sql_query).end()
+    if re.match(r'SELECT\b', sql_query[start:], re.IGNORECASE):
+        return start
+    if not re.match(r'WITH\b', sql_query[start:], re.IGNORECASE):
+        return None
+
+    base_depth = sql_query.count('(', 0, start)
+    depth = base_depth
+    quote = None
+    for i in range(start, len(sql_query)):
+        char = sql_query[i]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"', '`'):
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif (depth == base_depth and char in 'sS' and re.match(r'SELECT\b', sql_query[i:], re.IGNORECASE)
+              and not (sql_query[i - 1].isalnum() or sql_query[i - 1] == '_')):
+            return i
+    return None
+
+def is_aggregate_query(sql_query: str) -> bool:
+    """Whether the outer query aggregates or de-duplicates its rows"""
+    return bool(_AGGREGATE.search(_top_level_sql(sql_query)))
+
+def has_top_level_order_by(sql_query: str) -> bool:
+    """Whether the outer query sorts its rows"""
+    return bool(re.search(r'\bORDER\s+BY\b', _top_level_sql(sql_query), re.IGNORECASE))
+
+def get_limit(sql_query: str) -> Tuple[Optional[int], int]:
+    """Return (row_count, offset) of the outer LIMIT clause, or (None, 0) if there is none"""
+    match = _TRAILING_LIMIT.search(sql_query.strip())
+    if not match:
+        return None, 0
+    first, second, offset = match.groups()
+    if second is not None:
+        # LIMIT offset, row_count
+        return int(second), int(first)
+    return int(first), int(offset or 0)
+
+def add_limit_clause(sql_query: str, limit: int) -> str:
+    """Add a LIMIT to the outer query, or tighten an existing looser one"""
+    sql_stripped = sql_query.strip().rstrip(';').rstrip()
+    row_count, offset = get_limit(sql_stripped)
+    if row_count is None:
+        return f"{sql_stripped} LIMIT {limit};"
+    if row_count <= limit:
+        return f"{sql_stripped};"
+    match = _TRAILING_LIMIT.search(sql_stripped)
+    limit_clause = f"LIMIT {limit}" + (f" OFFSET {offset}" if offset else "")
+    return f"{sql_stripped[:match.start()]}{limit_clause};"
+
+def make_preview_query(sql_query: str, limit: int) -> Tuple[str, bool]:
+    """Rewrite a query to return at most `limit` rows for a quick preview
+
+    Aggregates are left alone since their result is already small, as are queries
+    whose own LIMIT is within the preview size. Returns (sql, is_preview).
+    """
+    if is_aggregate_query(sql_query):
+        return sql_query, False
+    row_count, _ = get_limit(sql_query.strip().rstrip(';').rstrip())
+    if row_count is not None and row_count <= limit:
+        return sql_query, False
+    return add_limit_clause(sql_query, limit), True
@@ -0,0 +1,96 @@
+import math
+import re
+from collections import defaultdict
+from typing import Dict, FrozenSet, Optional, Set, Tuple
+
+# Numbers (decimals kept whole), words, and symbols that change a question's
+# meaning: "> 60000" and "< 60000", or "-5" and "5", must stay distinct
+_TOKEN = re.compile(r"\d+(?:\.\d+)?|\w+|[<>=!+\-*/%]")
+
+# Words that never change what a question asks for. Everything else is content,
+# so negations (not, without), comparatives (more, older), sort direction
+# (ascending, descending), numbers and words like male/female must all match.
+_FILLER_WORDS = frozenset([
+    "a", "an", "the", "all", "please", "me", "us", "i", "you", "can", "could", "would",
+    "show", "list", "give", "display", "get", "tell",
+])
+
+def normalize_question(question: str) -> str:
+    """Canonicalize a question: lowercase tokens separated by single spaces
+
+    Punctuation is dropped, but comparison operators, signs and other
+    arithmetic symbols are kept as tokens of their own.
+    """
+    return " ".join(_TOKEN.findall(question.lower()))
+
+def _shingles(normalized: str, n: int = 3) -> FrozenSet[str]:
+    """Character n-grams of a normalized question, padded at the edges"""
+    padded = f" {normalized} "
+    if len(padded) < n:
+        return frozenset([padded])
+    return frozenset(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+def content_tokens(normalized: str) -> FrozenSet[str]:
+    """Words of a normalized question that carry meaning"""
+    return frozenset(word for word in normalized.split() if word not in _FILLER_WORDS)
+
+class QuestionSimilarityIndex:
+    """Inverted index of character trigrams for near-duplicate question lookup"""
+
+    def __init__(self):
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._entries: Dict[str, Tuple[str, FrozenSet[str], FrozenSet[str]]] = {}
+
+    def add(self, key: str, fingerprint: str, normalized: str):
+        """Index a cached question under its cache key"""
+        if key in self._entries:
+            self.remove(key)
+        grams = _shingles(normalized)
+        self._entries[key] = (fingerprint, grams, content_tokens(normalized))
+        for gram in grams:
+            self._postings[gram].add(key)
+
+    def remove(self, key: str):
+        """Drop a question from the index"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for gram in entry[1]:
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del self._postings[gram]
+
+    def find(self, fingerprint: str, normalized: str, threshold: float) -> Optional[Tuple[str, float]]:
+        """Return (key, score) of the most similar question at or above threshold
+
+        Similarity is the cosine of the two trigram sets, but only candidates with
+        exactly the same content words qualify: trigram overlap alone would match
+        "managers" with "not managers", or "male" with "female".
+        """
+        grams = _shingles(normalized)
+        content = content_tokens(normalized)
+
+        overlaps: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for key in self._postings.get(gram, ()):
+                overlaps[key] += 1
+
+        best = None
+        for key, overlap in overlaps.items():
+            entry_fingerprint, entry_grams, entry_content = self._entries[key]
+            if entry_fingerprint != fingerprint or entry_content != content:
+                continue
+            score = overlap / math.sqrt(len(grams) * len(entry_grams))
+            if score >= threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+    def clear(self):
+        """Drop every indexed question"""
+        self._postings.clear()
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
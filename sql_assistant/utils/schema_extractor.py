@@ -1,34 +1,160 @@
-from database.connector import get_connection
-
-def get_database_schema():
-    """Extract and format the database schema"""
-    connection = get_connection()
-    cursor = connection.cursor()
-    
-    # Get all tables
-    cursor.execute("SHOW TABLES")
-    tables = [table[0] for table in cursor.fetchall()]
-    
+import os
+import json
+import threading
+import time
+import logging
+from typing import Dict, Optional
+from config.config import DB_CONFIG, SCHEMA_CACHE_CONFIG
+from database.connector import pooled_connection
+
+logger = logging.getLogger(__name__)
+
+# Columns, primary keys and foreign keys for every table in one round trip
+SCHEMA_QUERY = """
+SELECT c.TABLE_NAME, c.COLUMN_NAME, c.COLUMN_TYPE, c.COLUMN_KEY,
+       k.REFERENCED_TABLE_NAME, k.REFERENCED_COLUMN_NAME
+FROM information_schema.COLUMNS c
+LEFT JOIN information_schema.KEY_COLUMN_USAGE k
+  ON k.TABLE_SCHEMA = c.TABLE_SCHEMA
+ AND k.TABLE_NAME = c.TABLE_NAME
+ AND k.COLUMN_NAME = c.COLUMN_NAME
+ AND k.REFERENCED_TABLE_NAME IS NOT NULL
+WHERE c.TABLE_SCHEMA = DATABASE()
+ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION
+"""
+
+# Cheap checksum that changes whenever a column, key or foreign key changes
+FINGERPRINT_QUERY = """
+SELECT COUNT(*),
+       COALESCE(SUM(CRC32(CONCAT_WS('|', TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, COLUMN_KEY, ORDINAL_POSITION))), 0),
+       (SELECT COALESCE(SUM(CRC32(CONCAT_WS('|', TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME))), 0)
+          FROM information_schema.KEY_COLUMN_USAGE
+         WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL)
+FROM information_schema.COLUMNS
+WHERE TABLE_SCHEMA = DATABASE()
+"""
+
+# In-process cache: the rendered schema, its structure and fingerprint
+_schema_cache: Dict = {}
+_schema_lock = threading.Lock()
+
+def _fetch_fingerprint(cursor) -> str:
+    """Compute the schema-version fingerprint on the server"""
+    cursor.execute(FINGERPRINT_QUERY)
+    column_count, column_checksum, key_checksum = cursor.fetchone()
+    return f"{column_count}:{column_checksum}:{key_checksum}"
+
+def _fetch_tables(cursor) -> Dict[str, Dict]:
+    """Extract columns, primary keys and foreign keys for every table"""
+    cursor.execute(SCHEMA_QUERY)
+    tables: Dict[str, Dict] = {}
+    for table, column, data_type, column_key, ref_table, ref_column in cursor.fetchall():
+        info = tables.setdefault(table, {"columns": [], "primary_key": [], "foreign_keys": []})
+        if not info["columns"] or info["columns"][-1][0] != column:
+            info["columns"].append([column, data_type])
+            if column_key == "PRI":
+                info["primary_key"].append(column)
+        if ref_table:
+            info["foreign_keys"].append([column, ref_table, ref_column])
+    return tables
+
+def render_schema(tables: Dict[str, Dict]) -> str:
+    """Format extracted tables as CREATE TABLE statements"""
     schema = []
-    
-    for table in tables:
-        # Get columns for each table
-        cursor.execute(f"DESCRIBE {table}")
-        columns = cursor.fetchall()
-        
-        column_definitions = []
-        for column in columns:
-            column_name = column[0]
-            data_type = column[1]
-            column_definitions.append(f"{column_name} {data_type}")
-        
+    for table, info in tables.items():
+        definitions = [f"{column} {data_type}" for column, data_type in info["columns"]]
+        if info["primary_key"]:
+            definitions.append(f"PRIMARY KEY ({', '.join(info['primary_key'])})")
+        for column, ref_table, ref_column in info["foreign_keys"]:
+            definitions.append(f"FOREIGN KEY ({column}) REFERENCES {ref_table}({ref_column})")
+
         table_schema = f"CREATE TABLE {table} (\n  "
-        table_schema += ",\n  ".join(column_definitions)
+        table_schema += ",\n  ".join(definitions)
         table_schema += "\n);"
-        
+
         schema.append(table_schema)
-    
-    cursor.close()
-    connection.close()
-    
+
     return "\n\n".join(schema)
+
+def _load_disk_cache(fingerprint: str) -> Optional[Dict]:
+    """Read the on-disk schema cache if it matches this database and fingerprint"""
+    path = SCHEMA_CACHE_CONFIG['path']
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable schema cache {path}: {e}")
+        return None
+    if cached.get("database") != DB_CONFIG['database'] or cached.get("fingerprint") != fingerprint:
+        return None
+    return cached
+
+def _save_disk_cache(entry: Dict):
+    """Write the schema cache to disk, replacing the file atomically"""
+    path = SCHEMA_CACHE_CONFIG['path']
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "database": DB_CONFIG['database'],
+                "fingerprint": entry["fingerprint"],
+                "tables": entry["tables"],
+                "schema": entry["schema"],
+            }, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write schema cache {path}: {e}")
+
+def get_database_schema(force_refresh: bool = False) -> str:
+    """Extract and format the database schema
+
+    The result is cached in process and on disk. After revalidate_interval_seconds
+    a single fingerprint query decides whether the cached schema is still current,
+    so DDL changes are picked up without a restart.
+    """
+    with _schema_lock:
+        now = time.monotonic()
+        if (SCHEMA_CACHE_CONFIG['enabled'] and not force_refresh and _schema_cache and
+                now - _schema_cache["checked_at"] < SCHEMA_CACHE_CONFIG['revalidate_interval_seconds']):
+            return _schema_cache["schema"]
+
+        with pooled_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                fingerprint = _fetch_fingerprint(cursor)
+
+                if SCHEMA_CACHE_CONFIG['enabled'] and not force_refresh:
+                    # Unchanged: keep the same schema string so downstream caches keep hitting
+                    if _schema_cache.get("fingerprint") == fingerprint:
+                        _schema_cache["checked_at"] = now
+                        return _schema_cache["schema"]
+
+                    cached = _load_disk_cache(fingerprint)
+                    if cached is not None:
+                        _schema_cache.update(cached, checked_at=now)
+                        logger.info(f"Loaded schema for {len(cached['tables'])} tables from disk cache")
+                        return _schema_cache["schema"]
+
+                tables = _fetch_tables(cursor)
+            finally:
+                cursor.close()
+
+        _schema_cache.update({
+            "fingerprint": fingerprint,
+            "tables": tables,
+            "schema": render_schema(tables),
+            "checked_at": now,
+        })
+        _save_disk_cache(_schema_cache)
+        logger.info(f"Extracted schema for {len(tables)} tables (fingerprint {fingerprint})")
+        return _schema_cache["schema"]
+
+def get_schema_tables() -> Dict[str, Dict]:
+    """Return the structured form of the most recently extracted schema"""
+    get_database_schema()
+    return _schema_cache["tables"]
@@ -0,0 +1,68 @@
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for and share its result (or exception). Nothing is
+    remembered once the call finishes, so this complements a cache rather
+    than replacing one.
+    """
+
+    def __init__(self, name: str = "single-flight"):
+        self.name = name
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._executions = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable):
+        """Run fn for this key, or wait on the identical call already running"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self._executions += 1
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            logger.info(f"{self.name}: waiting on in-flight call")
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        """Number of keys currently executing"""
+        with self._lock:
+            return len(self._calls)
+
+    def get_stats(self) -> Dict:
+        """Get execution and coalescing counts"""
+        with self._lock:
+            calls = self._executions + self._coalesced
+            return {
+                "executions": self._executions,
+                "coalesced": self._coalesced,
+                "coalesced_rate": self._coalesced / calls if calls else 0.0,
+                "in_flight": len(self._calls),
+            }
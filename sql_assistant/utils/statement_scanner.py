@@ -0,0 +1,105 @@
+from typing import Optional
+
+QUESTION_MARKER = "--Question:"
+
+class SQLStatementScanner:
+    """Incrementally find where the first SQL statement in generated text ends
+
+    The statement ends at the first top-level ';', at a blank line, or before a
+    line starting a new '-- Question:' block. Quoted strings, quoted identifiers
+    and '--' comments are tracked so terminators inside them are ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.end: Optional[int] = None
+        self._pos = 0
+        self._quote = None          # Active quote character, if inside a string/identifier
+        self._escaped = False       # Previous character was a backslash inside a string
+        self._in_comment = False    # Inside a '--' line comment
+        self._depth = 0             # Parenthesis depth
+        self._line_start = 0        # Index where the current line starts
+        self._line_has_content = False
+        self._seen_content = False  # Any non-whitespace outside the current line
+
+    def _check_marker(self, line_end: int) -> bool:
+        """Check whether the line starting at _line_start opens a new question block"""
+        line = "".join(self.text[self._line_start:line_end].split())
+        return line.startswith(QUESTION_MARKER)
+
+    def feed(self, chunk: str) -> Optional[int]:
+        """Add newly generated text; return the statement end index once known"""
+        if self.end is not None:
+            return self.end
+
+        self.text += chunk
+        text = self.text
+
+        while self._pos < len(text):
+            i = self._pos
+            char = text[i]
+            self._pos += 1
+
+            if self._quote:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\" and self._quote != "`":
+                    self._escaped = True
+                elif char == self._quote:
+                    self._quote = None
+                elif char == "\n":
+                    self._line_start = i + 1
+                continue
+
+            if char == "\n":
+                if self._check_marker(i):
+                    self.end = self._line_start
+                    return self.end
+                if not self._line_has_content and self._seen_content and self._depth <= 0:
+                    # Blank line after the statement body
+                    self.end = self._line_start
+                    return self.end
+                if self._line_has_content:
+                    self._seen_content = True
+                self._in_comment = False
+                self._line_start = i + 1
+                self._line_has_content = False
+                continue
+
+            if self._in_comment or char.isspace():
+                continue
+
+            self._line_has_content = True
+            if char == "-" and text[i + 1:i + 2] == "-":
+                self._in_comment = True
+            elif char in ("'", '"', "`"):
+                self._quote = char
+            elif char == "(":
+                self._depth += 1
+            elif char == ")":
+                self._depth -= 1
+            elif char == ";" and self._depth <= 0:
+                self.end = i + 1
+                return self.end
+
+        # A partial line may already be recognisable as a new question block
+        if not self._quote and len(text) - self._line_start >= len(QUESTION_MARKER) and self._check_marker(len(text)):
+            self.end = self._line_start
+            return self.end
+
+        # A trailing '-' could still become a comment once the next chunk arrives
+        if text.endswith("-") and not self._quote and not self._in_comment:
+            self._pos -= 1
+            if self._line_has_content and text[self._line_start:self._pos].strip() == "":
+                self._line_has_content = False
+
+        return None
+
+def find_statement_end(text: str) -> Optional[int]:
+    """Return the index just past the first SQL statement in text, if it ends"""
+    return SQLStatementScanner().feed(text)
+
+def truncate_to_statement(text: str) -> str:
+    """Cut generated text down to its first complete SQL statement"""
+    end = find_statement_end(text)
+    return text if end is None else text[:end]